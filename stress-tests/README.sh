@@ -45,6 +45,51 @@ echo "   sudo apt-get install apache2-utils jq"
 echo ""
 echo "   Config: 50 concurrent, 1000 requests per endpoint"
 echo ""
+echo "   Per-route Python benchmarks (authenticated POSTs, parameter pools,"
+echo "   percentiles saved as JSON), from stress-tests/:"
+echo "   python3 -m loadgen.bench                       # every route"
+echo "   python3 -m loadgen.bench leaderboard_global submit_result --duration 60"
+echo "   Output: results/bench-<time>.json"
+echo ""
+echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+echo ""
+
+echo "4️⃣  Scenario Runner"
+echo "   Stages (ramp-up, steady, spike, soak), action mixes, think times"
+echo "   and rates declared in a JSON file instead of script constants"
+echo ""
+echo "   Command (from stress-tests/):"
+echo "   python3 -m loadgen.runner scenarios/capacity-sweep.json"
+echo ""
+echo "   Scenarios: stress-test, comprehensive, users, capacity-sweep, behaviour, capacity"
+echo "   Validate:  python3 -m loadgen.scenario scenarios/*.json"
+echo ""
+echo "   Markov user behaviour, fitted from a captured run:"
+echo "   python3 -m loadgen.runner scenarios/behaviour.json --capture results/run.qhc"
+echo "   python3 -m loadgen.behaviour fit results/run.qhc -o results/behaviour.json"
+echo ""
+echo "   Browser-cached quiz fetches (5 min TTL, 50 quizzes per user):"
+echo "   python3 stress-test.py --quiz-cache 300 --quiz-cache-size 50"
+echo ""
+echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+echo ""
+
+echo "5️⃣  Capacity Search"
+echo "   Highest sustainable rate within the scenario's SLO (e.g. submit_result"
+echo "   p99 < 500ms, errors < 0.1%), with the latency curve and its knee"
+echo ""
+echo "   Command (from stress-tests/):"
+echo "   python3 -m loadgen.capacity scenarios/capacity.json"
+echo "   python3 -m loadgen.capacity scenarios/capacity.json --slo 'submit_result:p99<300ms' --max-rate 500"
+echo ""
+echo "   Output: results/capacity-<time>.json (capacity, knee and every probe)"
+echo ""
+echo "   Regression gate (exits 1 on a significant regression past the thresholds):"
+echo "   python3 -m loadgen.compare --baseline results/base-1.qts results/base-2.qts \\"
+echo "       --candidate results/stress-test-<time>.qts results/stress-test-<time>.qts"
+echo "   (name each run; its .workerN.qts files are merged into it)"
+echo "   python3 -m loadgen.compare --baseline results/bench-old*.json --candidate results/bench-new*.json"
+echo ""
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
 echo ""
 
@@ -6,15 +6,20 @@ Removes incomplete quizzes and replaces with realistic, diverse data
 """
 
 import requests
+import argparse
 import json
 import time
 import random
 from typing import List, Dict, Tuple
 
+from loadgen import cleanup, client, engine
+
 # Configuration
 GATEWAY_URL = "http://quizhub.172.189.52.147.nip.io"
 ADMIN_EMAIL = "admin@quizhub.com"
 ADMIN_PASSWORD = "Admin123Pass!"
+DELETE_CONCURRENCY = 16
+PER_ITEM_LOG_LIMIT = 100  # Log every deleted quiz up to this many
 
 # Question Types
 SINGLE = 0      # Single choice (one correct answer)
@@ -730,39 +735,32 @@ def login_admin() -> str:
         log(f"Admin login error: {str(e)}", "ERROR")
         return ""
 
-def get_all_quizzes(token: str) -> List[Dict]:
-    """Get all quizzes"""
-    try:
-        response = requests.get(
-            f"{GATEWAY_URL}/api/quizzes?page=1&pageSize=100",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            # Handle both paginated and non-paginated responses
-            if isinstance(data, dict):
-                return data.get("quizzes", data.get("items", []))
-            elif isinstance(data, list):
-                return data
-        return []
-    except Exception as e:
-        log(f"Error fetching quizzes: {str(e)}", "ERROR")
-        return []
+def should_delete(quiz: Dict, title_prefixes: List[str]) -> bool:
+    """Incomplete quizzes (TimeLimitSeconds = 0) and quizzes left behind by stress tests"""
+    if quiz.get("timeLimitSeconds", 0) == 0:
+        return True
+    return any(quiz.get("title", "").startswith(prefix) for prefix in title_prefixes)
 
-def delete_quiz(token: str, quiz_id: str) -> bool:
-    """Delete a quiz"""
+async def remove_quizzes(token: str, args: argparse.Namespace) -> cleanup.CleanupStats:
+    """Stream every page of quizzes and delete the matching ones in parallel"""
+    http_pool = client.AsyncSessionPool(pool_size=args.concurrency + 1)
+    logged = 0
+    
+    def quiz_deleted(quiz):
+        nonlocal logged
+        logged += 1
+        if logged <= PER_ITEM_LOG_LIMIT:
+            log(f"  ✓ Deleted: {quiz.get('title', 'Unknown')}", "SUCCESS")
+    
     try:
-        response = requests.delete(
-            f"{GATEWAY_URL}/api/quizzes/{quiz_id}",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=10
-        )
-        return response.status_code in [200, 204]
-    except Exception as e:
-        log(f"Error deleting quiz {quiz_id}: {str(e)}", "ERROR")
-        return False
+        return await cleanup.cleanup(
+            http_pool.session, f"{GATEWAY_URL}/api/quizzes",
+            lambda quiz: f"{GATEWAY_URL}/api/quizzes/{quiz.get('id')}",
+            lambda quiz: should_delete(quiz, args.title_prefix),
+            args.concurrency, headers={"Authorization": f"Bearer {token}"}, label="Quizzes",
+            on_deleted=quiz_deleted, progress=log)
+    finally:
+        await http_pool.close()
 
 def create_quiz(token: str, template: Dict) -> str:
     """Create a quiz from template with proper question types"""
@@ -805,7 +803,17 @@ def create_quiz(token: str, template: Dict) -> str:
         log(f"Quiz creation error: {str(e)}", "ERROR")
         return ""
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Remove incomplete quizzes and seed complete ones")
+    parser.add_argument("--concurrency", type=int, default=DELETE_CONCURRENCY,
+                        help=f"Maximum deletes in flight (default: {DELETE_CONCURRENCY})")
+    parser.add_argument("--title-prefix", action="append", default=[],
+                        help="Also delete quizzes whose title starts with this (repeatable), "
+                             "e.g. 'Stress Test Quiz'")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("=" * 70)
     print("      QuizHub Cleanup and Complete Data Seeding")
     print("=" * 70)
@@ -818,25 +826,15 @@ def main():
         log("Failed to login as admin. Exiting.", "ERROR")
         return
     
-    # Step 2: Get existing quizzes
-    log("\nStep 2: Fetching existing quizzes...")
-    existing_quizzes = get_all_quizzes(admin_token)
-    log(f"Found {len(existing_quizzes)} existing quizzes")
-    
-    # Step 3: Delete incomplete quizzes (TimeLimitSeconds = 0)
-    log("\nStep 3: Removing incomplete quizzes (TimeLimitSeconds = 0)...")
-    deleted_count = 0
-    for quiz in existing_quizzes:
-        if quiz.get("timeLimitSeconds", 0) == 0:
-            quiz_id = quiz.get("id")
-            if delete_quiz(admin_token, quiz_id):
-                deleted_count += 1
-                log(f"  ✓ Deleted: {quiz.get('title', 'Unknown')}", "SUCCESS")
-            else:
-                log(f"  ✗ Failed to delete: {quiz.get('title', 'Unknown')}", "ERROR")
-            time.sleep(0.3)
+    # Step 2-3: Stream existing quizzes and delete incomplete ones as they are found
+    log("\nStep 2: Scanning existing quizzes...")
+    log("Step 3: Removing incomplete quizzes (TimeLimitSeconds = 0)...")
+    for prefix in args.title_prefix:
+        log(f"  ...and quizzes titled '{prefix}...'")
+    stats = engine.run(lambda: remove_quizzes(admin_token, args))
+    deleted_count = stats.deleted
     
-    log(f"\n✓ Deleted {deleted_count} incomplete quizzes", "SUCCESS")
+    log(f"\n✓ {stats.summary()}", "SUCCESS")
     
     # Step 4: Create new complete quizzes
     log(f"\nStep 4: Creating {len(QUIZ_TEMPLATES)} complete and realistic quizzes...")
@@ -858,7 +856,7 @@ def main():
     print("=" * 70)
     print()
     print(f"📊 Summary:")
-    print(f"   • Deleted incomplete quizzes: {deleted_count}")
+    print(f"   • Deleted quizzes: {deleted_count}")
     print(f"   • Created new quizzes: {len(created_quiz_ids)}")
     print(f"   • Question types used: Single, Multiple, True/False, Fill-in")
     print(f"   • Categories covered: History, Technology, Science, Geography,")
@@ -6,8 +6,9 @@ Simulates realistic user behavior with random endpoint access patterns
 Includes admin operations for quiz/user management
 """
 
-import requests
+import argparse
 import json
+import os
 import time
 import random
 import string
@@ -15,15 +16,27 @@ import concurrent.futures
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 import sys
-from collections import defaultdict
 import threading
 
-# Configuration
+from loadgen import behaviour, client, engine, manifest, payloads, teardown, tokens
+from loadgen.metrics import MetricsStore, format_latency
+from loadgen.prometheus import PrometheusExporter
+from loadgen.scenario import ScenarioError, gateway_for, load_scenario
+
+# Configuration (defaults: --gateway or $GATEWAY_URL, --scenario and the other options override them)
 GATEWAY_URL = "http://localhost:8888"   # Update as needed
 NUM_REGULAR_USERS = 40
 NUM_USERS_TO_PROMOTE = 10  # Promote some users to Admin/Teacher
 MAX_WORKERS = 15
+POOL_SIZE_PER_HOST = 10  # Keep-alive connections per worker session
 ACTIONS_PER_USER = 20  # Random actions each user will perform
+CORRECT_RATIO = 0.70  # Share of questions answered correctly in submissions
+QUIZ_TEMPLATES = 64  # Pre-encoded quizzes that create_quiz picks from
+LOGIN_STORM = None  # (share of users, seconds into phase 4) that log in again at once; registration gave them a token
+BEHAVIOUR_MODEL = None  # Markov model file (python -m loadgen.behaviour fit ...), None = built-in model
+METRICS_PORT = 0  # Serve live Prometheus metrics on this port (e.g. 9464), 0 = off
+TEARDOWN_CONCURRENCY = 32  # Parallel deletes when removing the run's test data
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
 
 # Categories
 CATEGORIES = [
@@ -31,36 +44,34 @@ CATEGORIES = [
     "Literature", "Sports", "Music", "Art", "General Knowledge"
 ]
 
-# Metrics
-metrics = {
-    "register_success": 0,
-    "register_fail": 0,
-    "login_success": 0,
-    "login_fail": 0,
-    "create_quiz_success": 0,
-    "create_quiz_fail": 0,
-    "update_quiz_success": 0,
-    "update_quiz_fail": 0,
-    "delete_quiz_success": 0,
-    "delete_quiz_fail": 0,
-    "quiz_fetch_success": 0,
-    "quiz_fetch_fail": 0,
-    "get_users_success": 0,
-    "get_users_fail": 0,
-    "submit_result_success": 0,
-    "submit_result_fail": 0,
-    "leaderboard_success": 0,
-    "leaderboard_fail": 0,
-    "profile_success": 0,
-    "profile_fail": 0,
-    "response_times": defaultdict(list),
+# Metrics (per-thread recorders, merged for reporting)
+metrics = MetricsStore()
+
+# Response-time operation -> "<prefix>_success" / "<prefix>_fail" counters
+OPERATION_COUNTERS = {
+    "register": "register",
+    "login": "login",
+    "create_quiz": "create_quiz",
+    "update_quiz": "update_quiz",
+    "delete_quiz": "delete_quiz",
+    "get_quiz": "quiz_fetch",
+    "submit_result": "submit_result",
+    "leaderboard": "leaderboard",
+    "profile": "profile",
+    "get_users": "get_users",
 }
-metrics_lock = threading.Lock()
+quiz_ids_lock = threading.Lock()
 
 # Data storage
+http_pool = client.SessionPool(pool_size=POOL_SIZE_PER_HOST)
 users = []
 quizzes = []
 quiz_ids = []
+run_manifest = None  # Every created user, quiz and result, for teardown
+quiz_pool: Optional[payloads.QuizPool] = None  # Pre-encoded create-quiz bodies
+submissions = payloads.SubmissionPool(CORRECT_RATIO)  # Pre-encoded result bodies per quiz
+token_cache = tokens.TokenCache()  # Every user's token and its expiry
+behaviour_model = None  # Compiled Markov model the user simulations walk
 
 
 def generate_random_string(length=8):
@@ -83,22 +94,22 @@ def log(message, level="INFO"):
 
 
 def update_metric(metric_name, value=1):
-    """Thread-safe metric update"""
-    with metrics_lock:
-        if metric_name in metrics:
-            if isinstance(metrics[metric_name], int):
-                metrics[metric_name] += value
+    """Count an outcome on the calling thread's recorder"""
+    metrics.incr(metric_name, value)
 
 
-def record_response_time(operation, duration):
-    """Record response time for an operation"""
-    with metrics_lock:
-        metrics["response_times"][operation].append(duration)
+def record_response_time(operation, duration, response=None):
+    """Record response time, status code and size for an operation"""
+    if response is None:
+        metrics.record(operation, int(duration * 1e9), status=0)
+    else:
+        metrics.record(operation, int(duration * 1e9), received=len(response.content),
+                       status=response.status_code)
 
 
 def add_quiz_id(quiz_id):
     """Thread-safe quiz ID storage"""
-    with metrics_lock:
+    with quiz_ids_lock:
         if quiz_id and quiz_id not in quiz_ids:
             quiz_ids.append(quiz_id)
 
@@ -107,13 +118,13 @@ def promote_to_admin(token: str, user_id: str) -> bool:
     """Promote a user to Admin role"""
     start_time = time.time()
     try:
-        response = requests.put(
+        response = http_pool.session().put(
             f"{GATEWAY_URL}/api/users/{user_id}/promote",
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("promote", duration)
+        record_response_time("promote", duration, response)
         
         if response.status_code == 200:
             return True
@@ -143,13 +154,13 @@ def register_user(role: str = "User") -> Tuple[bool, Dict]:
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/users/register",
             files=payload,
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("register", duration)
+        record_response_time("register", duration, response)
         
         if response.status_code in [200, 201]:
             data = response.json()
@@ -166,6 +177,8 @@ def register_user(role: str = "User") -> Tuple[bool, Dict]:
                 "id": user_id,
                 "role": actual_role
             }
+            run_manifest.add(manifest.USER, user_id, username=username, password=password, role=actual_role)
+            token_cache.put(user_data)
             update_metric("register_success")
             return True, user_data
         else:
@@ -187,14 +200,14 @@ def login_user(username: str, password: str) -> Tuple[bool, str]:
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/users/login",
             json=payload,
             headers={"Content-Type": "application/json"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("login", duration)
+        record_response_time("login", duration, response)
         
         if response.status_code == 200:
             data = response.json()
@@ -211,8 +224,8 @@ def login_user(username: str, password: str) -> Tuple[bool, str]:
         return False, ""
 
 
-def create_quiz(token: str) -> Optional[str]:
-    """Create a quiz (Admin/Teacher only)"""
+def quiz_template() -> Dict:
+    """A random quiz to create; its title gets a unique suffix when sent"""
     category = random.choice(CATEGORIES)
     difficulty = random.randint(1, 3)
     num_questions = random.randint(3, 7)
@@ -234,30 +247,43 @@ def create_quiz(token: str) -> Optional[str]:
         }
         questions.append(question)
     
-    payload = {
-        "title": f"Stress Quiz - {category} {generate_random_string(4)}",
+    return {
+        "title": f"Stress Quiz - {category}",
         "description": f"Automated test quiz for {category}",
         "category": category,
         "difficulty": difficulty,
         "timeLimitSeconds": 600,
         "questions": questions
     }
+
+
+def relogin(user: Dict) -> Optional[str]:
+    """Log a known user in again for a fresh token"""
+    success, token = login_user(user["username"], user["password"])
+    return token if success else None
+
+
+def create_quiz(token: str) -> Optional[str]:
+    """Create a quiz (Admin/Teacher only)"""
+    payload = quiz_pool.body()
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/quizzes",
-            json=payload,
-            headers={"Authorization": f"Bearer {token}"},
+            data=payload,
+            headers={"Authorization": f"Bearer {token}", **payloads.JSON_HEADERS},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("create_quiz", duration)
+        record_response_time("create_quiz", duration, response)
         
         if response.status_code in [200, 201]:
             quiz_data = response.json()
             quiz_id = quiz_data.get("id")
+            submissions.add(quiz_data)  # The response carries the questions and the answer key
             add_quiz_id(quiz_id)
+            run_manifest.add(manifest.QUIZ, quiz_id)
             update_metric("create_quiz_success")
             return quiz_id
         else:
@@ -275,13 +301,13 @@ def get_quizzes(token: Optional[str] = None, page: int = 1) -> bool:
     start_time = time.time()
     try:
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes?page={page}&pageSize=10",
             headers=headers,
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("get_quizzes", duration)
+        record_response_time("get_quizzes", duration, response)
         
         if response.status_code == 200:
             update_metric("quiz_fetch_success")
@@ -301,13 +327,13 @@ def get_quiz_by_id(quiz_id: str, token: Optional[str] = None) -> bool:
     start_time = time.time()
     try:
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes/{quiz_id}",
             headers=headers,
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("get_quiz", duration)
+        record_response_time("get_quiz", duration, response)
         
         if response.status_code == 200:
             update_metric("quiz_fetch_success")
@@ -322,22 +348,22 @@ def get_quiz_by_id(quiz_id: str, token: Optional[str] = None) -> bool:
         return False
 
 
-def get_quiz_with_questions(quiz_id: str, token: str) -> Optional[Dict]:
-    """Get quiz with questions"""
+def get_quiz_with_questions(quiz_id: str, token: str) -> Optional[bytes]:
+    """Get quiz with questions (the undecoded body)"""
     start_time = time.time()
     try:
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes/{quiz_id}/with-questions",
             headers=headers,
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("get_quiz", duration)
+        record_response_time("get_quiz", duration, response)
         
         if response.status_code == 200:
             update_metric("quiz_fetch_success")
-            return response.json()
+            return response.content
         else:
             update_metric("quiz_fetch_fail")
             return None
@@ -353,13 +379,13 @@ def get_quiz_by_category(category: str, token: Optional[str] = None) -> bool:
     start_time = time.time()
     try:
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes/category/{category}?page=1&pageSize=10",
             headers=headers,
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("get_quizzes", duration)
+        record_response_time("get_quizzes", duration, response)
         
         if response.status_code == 200:
             update_metric("quiz_fetch_success")
@@ -374,58 +400,29 @@ def get_quiz_by_category(category: str, token: Optional[str] = None) -> bool:
         return False
 
 
-def submit_quiz_result(token: str, quiz_id: str, quiz_data: Dict) -> bool:
-    """Submit quiz result"""
-    questions = quiz_data.get("questions", [])
-    if not questions:
-        return False
-    
-    answers = []
-    correct_count = 0
-    for question in questions:
-        question_id = question.get("id")
-        question_answers = question.get("answers", [])
-        
-        # 70% chance of correct answer
-        if random.random() < 0.70 and question_answers:
-            correct_answer = next((a["text"] for a in question_answers if a.get("isCorrect")), None)
-            if correct_answer:
-                given_answer = correct_answer
-                correct_count += 1
-            else:
-                given_answer = random.choice(question_answers)["text"] if question_answers else "Wrong"
-        else:
-            wrong_answers = [a["text"] for a in question_answers if not a.get("isCorrect")]
-            given_answer = random.choice(wrong_answers) if wrong_answers else "Wrong"
-        
-        answers.append({
-            "questionId": question_id,
-            "givenAnswer": given_answer
-        })
-    
-    # Calculate score
-    score = (correct_count / len(questions)) * 100 if questions else 0
-    time_taken = random.randint(60, min(600, len(questions) * 60))
-    
-    payload = {
-        "quizId": quiz_id,
-        "score": float(score),
-        "timeTakenSeconds": time_taken,
-        "answers": answers
-    }
+def submit_quiz_result(token: str, quiz_id: str, quiz_body: bytes) -> bool:
+    """Submit a pre-encoded quiz result"""
+    payload = submissions.body(quiz_id)
+    if payload is None:
+        # Quizzes this run did not create get their answer key from the first fetch
+        if not submissions.add_body(quiz_body):
+            return False
+        payload = submissions.body(quiz_id)
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/results",
-            json=payload,
-            headers={"Authorization": f"Bearer {token}"},
+            data=payload,
+            headers={"Authorization": f"Bearer {token}", **payloads.JSON_HEADERS},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("submit_result", duration)
+        record_response_time("submit_result", duration, response)
         
         if response.status_code in [200, 201]:
+            result_id = response.json().get("id")
+            run_manifest.add(manifest.RESULT, result_id, quiz=quiz_id)
             update_metric("submit_result_success")
             return True
         else:
@@ -449,9 +446,9 @@ def access_leaderboard(category: Optional[str] = None, quiz_id: Optional[str] =
         else:
             url = f"{GATEWAY_URL}/api/results/leaderboard/global?top=10"
         
-        response = requests.get(url, timeout=30)
+        response = http_pool.session().get(url, timeout=30)
         duration = time.time() - start_time
-        record_response_time("leaderboard", duration)
+        record_response_time("leaderboard", duration, response)
         
         if response.status_code == 200:
             update_metric("leaderboard_success")
@@ -470,13 +467,13 @@ def get_user_profile(token: str) -> bool:
     """Get current user profile"""
     start_time = time.time()
     try:
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/users/auth/currentUser",
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("profile", duration)
+        record_response_time("profile", duration, response)
         
         if response.status_code == 200:
             update_metric("profile_success")
@@ -495,13 +492,13 @@ def get_user_stats(user_id: str, token: str) -> bool:
     """Get user statistics"""
     start_time = time.time()
     try:
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/results/stats/{user_id}",
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("profile", duration)
+        record_response_time("profile", duration, response)
         
         if response.status_code == 200:
             update_metric("profile_success")
@@ -520,13 +517,13 @@ def get_all_users(token: str) -> bool:
     """Get all users (Admin only)"""
     start_time = time.time()
     try:
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/users/",
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("get_users", duration)
+        record_response_time("get_users", duration, response)
         
         if response.status_code == 200:
             update_metric("get_users_success")
@@ -551,14 +548,14 @@ def update_quiz(token: str, quiz_id: str) -> bool:
     
     start_time = time.time()
     try:
-        response = requests.put(
+        response = http_pool.session().put(
             f"{GATEWAY_URL}/api/quizzes/{quiz_id}",
             json=payload,
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("update_quiz", duration)
+        record_response_time("update_quiz", duration, response)
         
         if response.status_code == 200:
             update_metric("update_quiz_success")
@@ -577,13 +574,13 @@ def delete_quiz(token: str, quiz_id: str) -> bool:
     """Delete a quiz (Admin/Teacher only)"""
     start_time = time.time()
     try:
-        response = requests.delete(
+        response = http_pool.session().delete(
             f"{GATEWAY_URL}/api/quizzes/{quiz_id}",
             headers={"Authorization": f"Bearer {token}"},
             timeout=30
         )
         duration = time.time() - start_time
-        record_response_time("delete_quiz", duration)
+        record_response_time("delete_quiz", duration, response)
         
         if response.status_code in [200, 204]:
             update_metric("delete_quiz_success")
@@ -600,134 +597,110 @@ def delete_quiz(token: str, quiz_id: str) -> bool:
 
 def user_simulation(user_data: Dict):
     """Simulate a user's random activity"""
-    username = user_data.get("username")
-    password = user_data.get("password")
     role = user_data.get("role", "User")
     user_id = user_data.get("id")
     
-    # Login to refresh token
-    success, token = login_user(username, password)
-    if not success:
+    if not token_cache.ensure_sync(user_data, relogin):
         return
+    token = user_data["token"]
+    
+    def refresh_token():
+        nonlocal token
+        new_token = relogin(user_data)
+        if new_token:
+            token_cache.put(user_data, new_token)
+            token = new_token
+        return bool(new_token)
     
-    # Define available actions based on role
-    regular_actions = [
-        ("browse_quizzes", lambda: get_quizzes(token, random.randint(1, 3))),
-        ("browse_category", lambda: get_quiz_by_category(random.choice(CATEGORIES), token)),
-        ("view_quiz", lambda: get_quiz_by_id(random.choice(quiz_ids), token) if quiz_ids else False),
-        ("view_profile", lambda: get_user_profile(token)),
-        ("view_stats", lambda: get_user_stats(user_id, token) if user_id else False),
-        ("global_leaderboard", lambda: access_leaderboard()),
-        ("category_leaderboard", lambda: access_leaderboard(category=random.choice(CATEGORIES))),
-        ("quiz_leaderboard", lambda: access_leaderboard(quiz_id=random.choice(quiz_ids)) if quiz_ids else False),
-    ]
-    
-    # Add quiz submission action
     def take_quiz():
         if not quiz_ids:
             return False
         quiz_id = random.choice(quiz_ids)
-        quiz_data = get_quiz_with_questions(quiz_id, token)
-        if quiz_data:
-            return submit_quiz_result(token, quiz_id, quiz_data)
+        quiz_body = get_quiz_with_questions(quiz_id, token)
+        if quiz_body:
+            return submit_quiz_result(token, quiz_id, quiz_body)
         return False
     
-    regular_actions.append(("take_quiz", take_quiz))
-    
-    admin_actions = [
-        ("create_quiz", lambda: create_quiz(token) is not None),
-        ("get_all_users", lambda: get_all_users(token)),
-        ("update_quiz", lambda: update_quiz(token, random.choice(quiz_ids)) if quiz_ids else False),
-    ]
-    
-    # Select actions based on role
-    if role in ["Admin", "Teacher"]:
-        available_actions = regular_actions + admin_actions
-    else:
-        available_actions = regular_actions
+    # Actions the behaviour model moves between
+    actions = {
+        "login": refresh_token,
+        "browse_quizzes": lambda: get_quizzes(token, random.randint(1, 3)),
+        "browse_category": lambda: get_quiz_by_category(random.choice(CATEGORIES), token),
+        "view_quiz": lambda: get_quiz_by_id(random.choice(quiz_ids), token) if quiz_ids else False,
+        "take_quiz": take_quiz,
+        "view_profile": lambda: get_user_profile(token),
+        "view_stats": lambda: get_user_stats(user_id, token) if user_id else False,
+        "global_leaderboard": lambda: access_leaderboard(),
+        "category_leaderboard": lambda: access_leaderboard(category=random.choice(CATEGORIES)),
+        "quiz_leaderboard": lambda: access_leaderboard(quiz_id=random.choice(quiz_ids)) if quiz_ids else False,
+        "create_quiz": lambda: create_quiz(token) is not None,
+        "get_all_users": lambda: get_all_users(token),
+        "update_quiz": lambda: update_quiz(token, random.choice(quiz_ids)) if quiz_ids else False,
+    }
     
-    # Perform random actions
-    for _ in range(ACTIONS_PER_USER):
-        action_name, action_func = random.choice(available_actions)
+    # Walk the model, starting a new session after each exit; admin states are skipped for regular users
+    admin = role in ["Admin", "Teacher"]
+    for action_name, think_ms in behaviour_model.walk(random, admin, ACTIONS_PER_USER, restart=True):
+        # A token about to expire is renewed before the request instead of being rejected by it
+        if token_cache.ensure_sync(user_data, relogin):
+            token = user_data["token"]
         try:
-            action_func()
-            time.sleep(random.uniform(0.05, 0.2))  # Random delay between actions
+            actions[action_name]()
+            time.sleep(think_ms / 1000)
         except Exception as e:
             pass
 
 
+def login_storm(fraction: float, at: float):
+    """Log a share of the users in again, all at once, some seconds into phase 4"""
+    time.sleep(at)
+    chosen = random.sample(users, max(1, round(len(users) * fraction)))
+    log(f"⚡ Login storm: {fraction:.0%} of {len(users)} users logging in again...", "WARNING")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        new_tokens = list(executor.map(relogin, chosen))
+    for user, token in zip(chosen, new_tokens):
+        if token:
+            token_cache.put(user, token)
+    succeeded = sum(1 for token in new_tokens if token)
+    log(f"✓ Login storm: {succeeded}/{len(chosen)} logins succeeded",
+        "SUCCESS" if succeeded == len(chosen) else "WARNING")
+
+
 def cleanup_test_data():
-    """Clean up all test data created during the stress test"""
+    """Delete all users and quizzes created during the stress test"""
     log("\n🧹 Phase 5: Cleaning up test data...", "INFO")
-    
-    cleanup_stats = {
-        "quizzes_deleted": 0,
-        "quizzes_failed": 0,
-        "users_deleted": 0,
-        "users_failed": 0
-    }
-    
-    # Delete quizzes created during test
-    if quiz_ids:
-        log(f"Deleting {len(quiz_ids)} quizzes...", "INFO")
-        admin_users = [u for u in users if u.get("role") == "Admin"]
-        
-        if admin_users:
-            admin_token = admin_users[0]["token"]
-            for quiz_id in quiz_ids:
-                try:
-                    response = requests.delete(
-                        f"{GATEWAY_URL}/api/quizzes/{quiz_id}",
-                        headers={"Authorization": f"Bearer {admin_token}"},
-                        timeout=5
-                    )
-                    if response.status_code in [200, 204]:
-                        cleanup_stats["quizzes_deleted"] += 1
-                    else:
-                        cleanup_stats["quizzes_failed"] += 1
-                except Exception:
-                    cleanup_stats["quizzes_failed"] += 1
-                time.sleep(0.1)
-    
-    # Delete test users (Note: This requires admin endpoint or cascade delete)
-    # For now, we'll just log that users should be cleaned up manually or via database
-    log(f"Note: {len(users)} test users created (cleanup via database if needed)", "WARNING")
-    
-    log(f"✓ Cleanup complete: Deleted {cleanup_stats['quizzes_deleted']} quizzes " +
-        f"({cleanup_stats['quizzes_failed']} failed)", "SUCCESS")
-    
-    return cleanup_stats
+    run_manifest.close()
+    stats = engine.run(lambda: teardown.teardown(run_manifest.path, TEARDOWN_CONCURRENCY))
+    log(f"Manifest kept at {run_manifest.path} (rerun: python -m loadgen.teardown <manifest>)", "INFO")
+    return stats
 
 
 def print_metrics():
     """Print final metrics"""
+    snapshot = metrics.snapshot()
+    counters = snapshot.counters
     print("\n" + "="*75)
     print("                  COMPREHENSIVE STRESS TEST RESULTS")
     print("="*75)
     
     print("\n📊 Operation Metrics:")
-    print(f"  Registration:    ✓ {metrics['register_success']:4d}  ✗ {metrics['register_fail']:4d}")
-    print(f"  Login:           ✓ {metrics['login_success']:4d}  ✗ {metrics['login_fail']:4d}")
-    print(f"  Create Quiz:     ✓ {metrics['create_quiz_success']:4d}  ✗ {metrics['create_quiz_fail']:4d}")
-    print(f"  Update Quiz:     ✓ {metrics['update_quiz_success']:4d}  ✗ {metrics['update_quiz_fail']:4d}")
-    print(f"  Delete Quiz:     ✓ {metrics['delete_quiz_success']:4d}  ✗ {metrics['delete_quiz_fail']:4d}")
-    print(f"  Quiz Fetch:      ✓ {metrics['quiz_fetch_success']:4d}  ✗ {metrics['quiz_fetch_fail']:4d}")
-    print(f"  Submit Result:   ✓ {metrics['submit_result_success']:4d}  ✗ {metrics['submit_result_fail']:4d}")
-    print(f"  Leaderboard:     ✓ {metrics['leaderboard_success']:4d}  ✗ {metrics['leaderboard_fail']:4d}")
-    print(f"  Profile/Stats:   ✓ {metrics['profile_success']:4d}  ✗ {metrics['profile_fail']:4d}")
-    print(f"  Get Users:       ✓ {metrics['get_users_success']:4d}  ✗ {metrics['get_users_fail']:4d}")
+    print(f"  Registration:    ✓ {counters['register_success']:4d}  ✗ {counters['register_fail']:4d}")
+    print(f"  Login:           ✓ {counters['login_success']:4d}  ✗ {counters['login_fail']:4d}")
+    print(f"  Create Quiz:     ✓ {counters['create_quiz_success']:4d}  ✗ {counters['create_quiz_fail']:4d}")
+    print(f"  Update Quiz:     ✓ {counters['update_quiz_success']:4d}  ✗ {counters['update_quiz_fail']:4d}")
+    print(f"  Delete Quiz:     ✓ {counters['delete_quiz_success']:4d}  ✗ {counters['delete_quiz_fail']:4d}")
+    print(f"  Quiz Fetch:      ✓ {counters['quiz_fetch_success']:4d}  ✗ {counters['quiz_fetch_fail']:4d}")
+    print(f"  Submit Result:   ✓ {counters['submit_result_success']:4d}  ✗ {counters['submit_result_fail']:4d}")
+    print(f"  Leaderboard:     ✓ {counters['leaderboard_success']:4d}  ✗ {counters['leaderboard_fail']:4d}")
+    print(f"  Profile/Stats:   ✓ {counters['profile_success']:4d}  ✗ {counters['profile_fail']:4d}")
+    print(f"  Get Users:       ✓ {counters['get_users_success']:4d}  ✗ {counters['get_users_fail']:4d}")
     
     print("\n⏱️  Response Times:")
-    for operation, times in sorted(metrics["response_times"].items()):
-        if times:
-            avg_time = sum(times) / len(times)
-            min_time = min(times)
-            max_time = max(times)
-            p95_time = sorted(times)[int(len(times) * 0.95)] if len(times) > 1 else max_time
-            print(f"  {operation:15s}: avg={avg_time:6.3f}s  min={min_time:.3f}s  max={max_time:.3f}s  p95={p95_time:.3f}s")
-    
-    total_success = sum(v for k, v in metrics.items() if k.endswith('_success'))
-    total_fail = sum(v for k, v in metrics.items() if k.endswith('_fail'))
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.histograms[operation])}")
+    
+    total_success = sum(v for k, v in counters.items() if k.endswith('_success'))
+    total_fail = sum(v for k, v in counters.items() if k.endswith('_fail'))
     total = total_success + total_fail
     
     if total > 0:
@@ -735,13 +708,60 @@ def print_metrics():
         print(f"\n✅ Overall Success Rate: {success_rate:.2f}%")
     
     print(f"📈 Total Requests: {total}")
+    print(f"🔌 Connections: {http_pool.stats().summary()}")
     print(f"📝 Quizzes Created: {len(quiz_ids)}")
     
     print("\n" + "="*75)
 
 
+def configure(argv: Optional[List[str]] = None):
+    """Apply --gateway (or $GATEWAY_URL), the options and the sizes of a --scenario file to the configuration"""
+    global GATEWAY_URL, NUM_REGULAR_USERS, NUM_USERS_TO_PROMOTE, MAX_WORKERS, ACTIONS_PER_USER
+    global BEHAVIOUR_MODEL, behaviour_model, LOGIN_STORM, METRICS_PORT, TEARDOWN_CONCURRENCY
+    parser = argparse.ArgumentParser(description="QuizHub comprehensive stress test")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL, the scenario's, or {GATEWAY_URL})")
+    parser.add_argument("--scenario", metavar="PATH",
+                        help="Take users, admins, workers, actions per user and the behaviour model from a "
+                             "scenario file (e.g. scenarios/comprehensive.json)")
+    parser.add_argument("--behaviour", metavar="PATH",
+                        help="Markov model the users walk (python -m loadgen.behaviour fit ...; default: the "
+                             "scenario's, or the built-in model)")
+    parser.add_argument("--login-storm", type=tokens.parse_storm, metavar="FRACTION[@SECONDS]",
+                        help="Log this share of the users in again at once, SECONDS into phase 4 (e.g. 0.5@30); "
+                             "otherwise users only log in to refresh expiring tokens")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve live Prometheus metrics on this port (e.g. 9464)")
+    parser.add_argument("--teardown-concurrency", type=int, default=TEARDOWN_CONCURRENCY,
+                        help=f"Maximum deletes in flight when removing the test data (default: {TEARDOWN_CONCURRENCY})")
+    args = parser.parse_args(argv)
+    if args.teardown_concurrency < 1:
+        parser.error("--teardown-concurrency must be at least 1")
+    try:
+        scenario = load_scenario(args.scenario) if args.scenario else None
+    except (OSError, ScenarioError) as e:
+        parser.error(str(e))
+    GATEWAY_URL = gateway_for(args.gateway, scenario, GATEWAY_URL)
+    if scenario is not None:
+        NUM_REGULAR_USERS = scenario.setup.users
+        NUM_USERS_TO_PROMOTE = scenario.setup.admins
+        MAX_WORKERS = scenario.setup.concurrency
+        ACTIONS_PER_USER = next((stage.actions for stage in scenario.stages if stage.actions), ACTIONS_PER_USER)
+        # The scenario loaded its model already; a stage with a mix leaves the built-in one
+        stage = next((stage for stage in scenario.stages if stage.behaviour), None)
+        if stage is not None:
+            BEHAVIOUR_MODEL, behaviour_model = stage.behaviour_path, stage.behaviour
+    if args.behaviour:
+        BEHAVIOUR_MODEL, behaviour_model = args.behaviour, None
+    if args.login_storm:
+        LOGIN_STORM = args.login_storm
+    METRICS_PORT = args.metrics_port
+    TEARDOWN_CONCURRENCY = args.teardown_concurrency
+
+
 def main():
     """Main stress test execution"""
+    global run_manifest, behaviour_model, quiz_pool
+    configure()
     print("\n╔═══════════════════════════════════════════════════════════════════╗")
     print("║     QuizHub Comprehensive Stress Test - Random Patterns          ║")
     print("╚═══════════════════════════════════════════════════════════════════╝\n")
@@ -751,9 +771,31 @@ def main():
     print(f"  Regular Users: {NUM_REGULAR_USERS}")
     print(f"  Users to Promote: {NUM_USERS_TO_PROMOTE}")
     print(f"  Actions per user: {ACTIONS_PER_USER}")
-    print(f"  Max concurrent workers: {MAX_WORKERS}\n")
+    if LOGIN_STORM:
+        print(f"  Login storm: {LOGIN_STORM[0]:.0%} of users log in again after {LOGIN_STORM[1]:g}s")
+    print(f"  Behaviour model: {BEHAVIOUR_MODEL or 'built-in'}")
+    print(f"  Max concurrent workers: {MAX_WORKERS}")
+    print(f"  Connection pool per host: {POOL_SIZE_PER_HOST}\n")
+    
+    try:
+        if behaviour_model is None:
+            behaviour_model = (behaviour.load_model(BEHAVIOUR_MODEL) if BEHAVIOUR_MODEL
+                               else behaviour.default_model())
+    except (OSError, behaviour.ModelError) as e:
+        log(f"Cannot load behaviour model: {e}", "ERROR")
+        return
+    
+    # Request bodies are encoded before any timing starts
+    quiz_pool = payloads.QuizPool(quiz_template() for _ in range(QUIZ_TEMPLATES))
     
     start_time = time.time()
+    run_manifest = manifest.Manifest(
+        os.path.join(RESULTS_DIR, f"comprehensive-{datetime.now():%Y%m%d-%H%M%S}.manifest"), GATEWAY_URL)
+    log(f"Recording created test data in {run_manifest.path}", "INFO")
+    exporter = None
+    if METRICS_PORT:
+        exporter = PrometheusExporter(metrics.snapshot, OPERATION_COUNTERS, port=METRICS_PORT).start()
+        log(f"Serving Prometheus metrics on :{METRICS_PORT}/metrics", "INFO")
     
     # Phase 1: Register users
     log(f"Phase 1: Registering {NUM_REGULAR_USERS} users...", "INFO")
@@ -783,7 +825,11 @@ def main():
     for user in users[:NUM_USERS_TO_PROMOTE]:
         if promote_to_admin(user["token"], user["id"]):
             user["role"] = "Admin"
+            run_manifest.add(manifest.USER, user["id"], role="Admin")
             promoted_count += 1
+            # The role is a token claim, so admins log in once more for a token carrying it
+            token_cache.invalidate(user)
+            token_cache.ensure_sync(user, relogin)
     
     log(f"✓ Promoted {promoted_count} users to Admin", "SUCCESS")
     
@@ -799,9 +845,15 @@ def main():
     
     # Phase 4: Simulate realistic user activity with random patterns
     log(f"\nPhase 4: Simulating random user activity ({ACTIONS_PER_USER} actions each)...", "INFO")
+    storm = None
+    if LOGIN_STORM:
+        storm = threading.Thread(target=login_storm, args=LOGIN_STORM, daemon=True)
+        storm.start()
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         futures = [executor.submit(user_simulation, user) for user in users]
         concurrent.futures.wait(futures)
+    if storm is not None:
+        storm.join()
     
     log(f"✓ Completed user activity simulation", "SUCCESS")
     
@@ -809,12 +861,14 @@ def main():
     
     # Phase 5: Cleanup
     cleanup_test_data()
+    if exporter:
+        exporter.stop()
     
     # Print results
     print_metrics()
     print(f"\n⏰ Total execution time: {elapsed_time:.2f} seconds")
     
-    total_requests = sum(v for k, v in metrics.items() if k.endswith('_success'))
+    total_requests = sum(v for k, v in metrics.snapshot().counters.items() if k.endswith('_success'))
     if elapsed_time > 0:
         rps = total_requests / elapsed_time
         print(f"⚡ Requests per second: {rps:.2f}")
@@ -0,0 +1,3 @@
+"""
+QuizHub load generation helpers shared by the stress test scripts
+"""
@@ -0,0 +1,271 @@
+"""
+Virtual user actions for scenario runs
+Each action is one user-visible step (browse, take a quiz, check a
+leaderboard...) made of one or more requests; every request is timed under
+its operation name and counted as "<prefix>_success" / "<prefix>_fail",
+the same names the stress scripts report
+"""
+
+import asyncio
+import json
+import random
+import string
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from loadgen import capture, client, corpus, manifest, payloads, scheduler, tokens
+from loadgen.metrics import MetricsStore
+
+PASSWORD = "StressTest123Pass!"
+CORRECT_RATIO = 0.7  # Share of questions answered correctly by take_quiz
+PAGE_SIZE = 10
+
+# Response-time operation -> "<prefix>_success" / "<prefix>_fail" counters
+OPERATION_COUNTERS = {
+    "register": "register",
+    "login": "login",
+    "promote": "promote",
+    "create_quiz": "create_quiz",
+    "update_quiz": "update_quiz",
+    "get_quizzes": "quiz_list",
+    "get_quiz": "quiz_fetch",
+    "submit_result": "submit_result",
+    "leaderboard": "leaderboard",
+    "profile": "profile",
+    "get_users": "get_users",
+}
+
+
+class Context:
+    """What the actions of one run share: session, gateway, metrics and the test data"""
+
+    def __init__(self, session: aiohttp.ClientSession, gateway: str, metrics: MetricsStore,
+                 run_manifest: Optional[manifest.Manifest] = None, corpus_seed: int = 0,
+                 recorder: Optional[capture.TrafficRecorder] = None):
+        self.session = session
+        self.gateway = gateway.rstrip("/")
+        self.metrics = metrics
+        self.manifest = run_manifest
+        self.recorder = recorder  # Captures the traffic when set
+        self.users: List[Dict] = []
+        self.quiz_ids: List[str] = []
+        self.categories = list(corpus.CATEGORIES)
+        self.quiz_corpus = corpus.generate_quizzes(seed=corpus_seed)
+        self.submissions = payloads.SubmissionPool(CORRECT_RATIO, seed=corpus_seed)
+        self.tokens = tokens.TokenCache(seed=corpus_seed)
+
+    async def call(self, operation: str, method: str, path: str, token: Optional[str] = None,
+                   ok=(200, 201), **kwargs) -> Tuple[int, bytes]:
+        """Send one timed request; status 0 when no response arrived"""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if isinstance(kwargs.get("data"), bytes):
+            headers.update(payloads.JSON_HEADERS)  # Pre-encoded bodies are JSON
+        self.metrics.begin(operation)
+        start_ns = time.perf_counter_ns()
+        status, body = 0, b""
+        try:
+            async with self.session.request(method, self.gateway + path, headers=headers, **kwargs) as response:
+                body = await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            # Corrected latency counts from the intended send time of an open-model arrival
+            self.metrics.record(operation, duration_ns, duration_ns + scheduler.current_send_lag_ns(),
+                                len(body), status)
+            self.metrics.end(operation)
+            if self.recorder is not None:
+                self.recorder.complete(operation, status, body, duration_ns)
+        self.metrics.incr(f"{OPERATION_COUNTERS[operation]}_{'success' if status in ok else 'fail'}")
+        return status, body
+
+
+def parse_json(body: bytes):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return {}
+
+
+def _user_field(data: Dict, name: str):
+    user = data.get("user") or data.get("User") or {}
+    return user.get(name)
+
+
+async def register(ctx: Context) -> Optional[Dict]:
+    """Register a new user (multipart form, as UserService binds it)"""
+    username = f"stress_{''.join(random.choices(string.ascii_lowercase + string.digits, k=8))}"
+    email = f"{username}@stress-test.com"
+    status, body = await ctx.call("register", "POST", "/api/users/register", data=client.multipart_form({
+        "username": username, "email": email, "password": PASSWORD,
+        "firstName": "Stress", "lastName": "Test",
+    }))
+    if status not in (200, 201):
+        return None
+    data = parse_json(body)
+    user = {
+        "username": username,
+        "email": email,
+        "password": PASSWORD,
+        "token": data.get("token") or data.get("Token"),
+        "id": _user_field(data, "id"),
+        "role": _user_field(data, "role") or "User",
+    }
+    if ctx.manifest:
+        ctx.manifest.add(manifest.USER, user["id"], username=username, password=PASSWORD, role=user["role"])
+    ctx.tokens.put(user)
+    return user
+
+
+async def promote(ctx: Context, user: Dict) -> bool:
+    """Promote a user to Admin and log in again for a token carrying the role"""
+    status, _ = await ctx.call("promote", "PUT", f"/api/users/{user['id']}/promote", user["token"])
+    if status != 200:
+        return False
+    user["role"] = "Admin"
+    if ctx.manifest:
+        ctx.manifest.add(manifest.USER, user["id"], role="Admin")
+    return await login(ctx, user)
+
+
+async def create_quiz(ctx: Context, user: Dict) -> bool:
+    """Create the next corpus quiz (Admin only)"""
+    payload = corpus.quiz_payload(next(ctx.quiz_corpus))
+    payload["title"] = f"Stress Test Quiz - {payload['title']}"
+    status, body = await ctx.call("create_quiz", "POST", "/api/quizzes", user["token"], json=payload)
+    if status not in (200, 201):
+        return False
+    data = parse_json(body)
+    quiz_id = data.get("id")
+    if quiz_id:
+        ctx.quiz_ids.append(quiz_id)
+        ctx.submissions.add(data)  # The response carries the questions and the answer key
+        if ctx.manifest:
+            ctx.manifest.add(manifest.QUIZ, quiz_id)
+    return True
+
+
+async def login(ctx: Context, user: Dict) -> bool:
+    status, body = await ctx.call("login", "POST", "/api/users/login",
+                                  json={"usernameOrEmail": user["username"], "password": user["password"]})
+    if status != 200:
+        return False
+    data = parse_json(body)
+    ctx.tokens.put(user, data.get("token") or data.get("Token") or user["token"])
+    return True
+
+
+async def relogin(ctx: Context, user: Dict) -> Optional[str]:
+    """Fresh token for a user, for the token refresh scheduler"""
+    return user["token"] if await login(ctx, user) else None
+
+
+async def browse_quizzes(ctx: Context, user: Dict) -> bool:
+    status, _ = await ctx.call("get_quizzes", "GET", f"/api/quizzes?page={random.randint(1, 3)}&pageSize={PAGE_SIZE}",
+                               user["token"])
+    return status == 200
+
+
+async def browse_category(ctx: Context, user: Dict) -> bool:
+    category = random.choice(ctx.categories)
+    status, _ = await ctx.call("get_quizzes", "GET", f"/api/quizzes/category/{category}?page=1&pageSize={PAGE_SIZE}",
+                               user["token"])
+    return status == 200
+
+
+async def view_quiz(ctx: Context, user: Dict) -> bool:
+    if not ctx.quiz_ids:
+        return False
+    status, _ = await ctx.call("get_quiz", "GET", f"/api/quizzes/{random.choice(ctx.quiz_ids)}", user["token"])
+    return status == 200
+
+
+async def take_quiz(ctx: Context, user: Dict) -> bool:
+    """Fetch a quiz with its questions and submit a pre-encoded answer sheet, CORRECT_RATIO of it right"""
+    if not ctx.quiz_ids:
+        return False
+    quiz_id = random.choice(ctx.quiz_ids)
+    status, body = await ctx.call("get_quiz", "GET", f"/api/quizzes/{quiz_id}/with-questions", user["token"])
+    if status != 200:
+        return False
+    payload = ctx.submissions.body(quiz_id)
+    if payload is None:
+        # Quizzes the run did not create get their answer key from the first fetch
+        if not ctx.submissions.add_body(body):
+            return False
+        payload = ctx.submissions.body(quiz_id)
+    status, body = await ctx.call("submit_result", "POST", "/api/results", user["token"], data=payload)
+    if status not in (200, 201):
+        return False
+    if ctx.manifest:
+        ctx.manifest.add(manifest.RESULT, parse_json(body).get("id"), quiz=quiz_id)
+    return True
+
+
+async def view_profile(ctx: Context, user: Dict) -> bool:
+    status, _ = await ctx.call("profile", "GET", "/api/users/auth/currentUser", user["token"])
+    return status == 200
+
+
+async def view_stats(ctx: Context, user: Dict) -> bool:
+    status, _ = await ctx.call("profile", "GET", f"/api/results/stats/{user['id']}", user["token"])
+    return status == 200
+
+
+async def global_leaderboard(ctx: Context, user: Dict) -> bool:
+    status, _ = await ctx.call("leaderboard", "GET", "/api/results/leaderboard/global?top=10", user["token"])
+    return status == 200
+
+
+async def category_leaderboard(ctx: Context, user: Dict) -> bool:
+    category = random.choice(ctx.categories)
+    status, _ = await ctx.call("leaderboard", "GET", f"/api/results/leaderboard/category/{category}?top=10",
+                               user["token"])
+    return status == 200
+
+
+async def quiz_leaderboard(ctx: Context, user: Dict) -> bool:
+    if not ctx.quiz_ids:
+        return False
+    status, _ = await ctx.call("leaderboard", "GET",
+                               f"/api/results/leaderboard/quiz/{random.choice(ctx.quiz_ids)}?top=10", user["token"])
+    return status == 200
+
+
+async def get_all_users(ctx: Context, user: Dict) -> bool:
+    status, _ = await ctx.call("get_users", "GET", "/api/users/", user["token"])
+    return status == 200
+
+
+async def update_quiz(ctx: Context, user: Dict) -> bool:
+    if not ctx.quiz_ids:
+        return False
+    status, _ = await ctx.call("update_quiz", "PUT", f"/api/quizzes/{random.choice(ctx.quiz_ids)}", user["token"],
+                               ok=(200,), json={
+                                   "title": f"Updated Quiz {random.randrange(1 << 16):04x}",
+                                   "description": "Updated description",
+                                   "difficulty": random.randint(1, 3),
+                               })
+    return status == 200
+
+
+# Actions a scenario mix can name; ADMIN_ACTIONS only run for users with the Admin role
+ACTIONS = {
+    "login": login,
+    "browse_quizzes": browse_quizzes,
+    "browse_category": browse_category,
+    "view_quiz": view_quiz,
+    "take_quiz": take_quiz,
+    "view_profile": view_profile,
+    "view_stats": view_stats,
+    "global_leaderboard": global_leaderboard,
+    "category_leaderboard": category_leaderboard,
+    "quiz_leaderboard": quiz_leaderboard,
+    "create_quiz": create_quiz,
+    "update_quiz": update_quiz,
+    "get_all_users": get_all_users,
+}
+ADMIN_ACTIONS = {"create_quiz", "update_quiz", "get_all_users"}
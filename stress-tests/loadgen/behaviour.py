@@ -0,0 +1,361 @@
+"""
+Markov-chain user behaviour
+A virtual user moves between actions (browse, view a quiz, take it, check
+a leaderboard...) by weighted transitions and thinks for a per-state time
+before its next action; "exit" ends the session. A model is a small JSON
+document, either written by hand or fitted from captured traffic, and is
+compiled into alias tables so every step costs two random draws however
+many states there are: a virtual user is nothing more than its current
+state index
+
+Fit a model:   python -m loadgen.behaviour fit results/run.qhc [...] -o results/behaviour.json
+Show a model:  python -m loadgen.behaviour show results/behaviour.json
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loadgen.actions import ACTIONS, ADMIN_ACTIONS
+from loadgen.capture import NO_ACTOR, Exchange, open_capture
+from loadgen.corpus import Distribution, parse_distribution
+
+EXIT = "exit"
+THINK_QUANTILES = 20  # Points of a fitted think-time distribution
+
+# Browse -> view -> take a quiz -> check how it went, with think times in milliseconds
+DEFAULT_MODEL = {
+    "start": {"browse_quizzes": 5, "browse_category": 3, "global_leaderboard": 1, "view_profile": 1},
+    "states": {
+        "browse_quizzes": {"think_time": "uniform:50:150",
+                           "next": {"view_quiz": 4, "browse_category": 2, "browse_quizzes": 2, "take_quiz": 1,
+                                    "create_quiz": 0.5, "exit": 0.5}},
+        "browse_category": {"think_time": "uniform:50:150",
+                            "next": {"view_quiz": 4, "browse_category": 1, "browse_quizzes": 1,
+                                     "category_leaderboard": 1, "exit": 0.5}},
+        "view_quiz": {"think_time": "uniform:100:250",
+                      "next": {"take_quiz": 5, "quiz_leaderboard": 1, "browse_quizzes": 2, "browse_category": 1,
+                               "update_quiz": 0.5, "exit": 0.5}},
+        "take_quiz": {"think_time": "uniform:100:300",
+                      "next": {"quiz_leaderboard": 3, "global_leaderboard": 2, "view_stats": 2, "browse_quizzes": 2,
+                               "take_quiz": 1, "exit": 1}},
+        "quiz_leaderboard": {"think_time": "uniform:50:200",
+                             "next": {"global_leaderboard": 1, "browse_quizzes": 2, "view_quiz": 1, "exit": 1}},
+        "global_leaderboard": {"think_time": "uniform:50:200",
+                               "next": {"category_leaderboard": 1, "view_stats": 1, "browse_quizzes": 2, "exit": 1}},
+        "category_leaderboard": {"think_time": "uniform:50:200",
+                                 "next": {"browse_category": 2, "global_leaderboard": 1, "exit": 1}},
+        "view_stats": {"think_time": "uniform:50:200",
+                       "next": {"view_profile": 1, "global_leaderboard": 1, "browse_quizzes": 2, "exit": 1}},
+        "view_profile": {"think_time": "uniform:50:150",
+                         "next": {"view_stats": 2, "browse_quizzes": 2, "get_all_users": 0.5, "exit": 0.5}},
+        "create_quiz": {"think_time": "uniform:200:500", "next": {"view_quiz": 1, "browse_quizzes": 1, "exit": 0.5}},
+        "update_quiz": {"think_time": "uniform:100:300", "next": {"view_quiz": 1, "browse_quizzes": 1, "exit": 0.5}},
+        "get_all_users": {"think_time": "uniform:50:200", "next": {"view_profile": 1, "browse_quizzes": 1, "exit": 0.5}},
+    },
+}
+
+
+class ModelError(ValueError):
+    """A behaviour model that cannot be run"""
+
+
+class AliasTable:
+    """Walker's alias method: O(1) draws from a fixed discrete distribution"""
+
+    __slots__ = ("probability", "alias")
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.probability = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.probability[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng) -> int:
+        column = int(rng.random() * len(self.probability))
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+class BehaviourModel:
+    """Transition weights and think times over named actions"""
+
+    def __init__(self, start: Dict[str, float], states: Dict[str, Dict]):
+        self.start = start
+        self.states = states
+        self.names = sorted(states)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._think: List[Distribution] = []
+        for name in self.names:
+            try:
+                self._think.append(parse_distribution(states[name].get("think_time", "const:0"), low=0))
+            except ValueError as e:
+                raise ModelError(f"states.{name}.think_time: {e}") from None
+        self._compiled: Dict[bool, Tuple[Optional[AliasTable], List[Optional[AliasTable]], List[List[int]]]] = {
+            True: self._compile(admin=True),
+            False: self._compile(admin=False),
+        }
+
+    def _compile(self, admin: bool):
+        """Alias tables for the chain, leaving out admin states for regular users"""
+        allowed = [admin or name not in ADMIN_ACTIONS for name in self.names]
+
+        def table(weights: Dict[str, float]):
+            targets = [(EXIT if name == EXIT else self._index[name], weight) for name, weight in weights.items()
+                       if weight > 0 and (name == EXIT or allowed[self._index[name]])]
+            if not targets:
+                return None, []
+            return AliasTable([weight for _, weight in targets]), [target for target, _ in targets]
+
+        start, start_targets = table(self.start)
+        tables, targets = [], []
+        for name in self.names:
+            t, s = table(self.states[name].get("next", {}))
+            tables.append(t)
+            targets.append(s)
+        return (start, start_targets), tables, targets
+
+    def walk(self, rng, admin: bool = False, steps: Optional[int] = None,
+             restart: bool = False) -> Iterator[Tuple[str, int]]:
+        """(action, think time in ms after it) for one session; restart begins a new one after "exit" """
+        (start, start_targets), tables, targets = self._compiled[admin]
+        if start is None:
+            return
+        taken = 0
+        state = start_targets[start.draw(rng)]
+        while steps is None or taken < steps:
+            if state == EXIT:
+                if not restart:
+                    return
+                state = start_targets[start.draw(rng)]
+                continue
+            yield self.names[state], self._think[state].sample(rng)
+            taken += 1
+            table = tables[state]
+            state = targets[state][table.draw(rng)] if table else EXIT
+
+    def stationary(self, admin: bool = False, iterations: int = 200) -> Dict[str, float]:
+        """Long-run share of each action for users that start a new session after every exit"""
+        start_weights = self._normalised(self.start, admin)
+        share = dict(start_weights)
+        for _ in range(iterations):
+            following: Dict[str, float] = defaultdict(float)
+            for name, p in share.items():
+                for target, q in self._normalised(self.states[name].get("next", {}), admin).items():
+                    if target == EXIT:
+                        for first, r in start_weights.items():
+                            following[first] += p * q * r
+                    else:
+                        following[target] += p * q
+            share = following
+        total = sum(share.values()) or 1.0
+        return {name: p / total for name, p in sorted(share.items(), key=lambda item: -item[1])}
+
+    def _normalised(self, weights: Dict[str, float], admin: bool) -> Dict[str, float]:
+        kept = {name: w for name, w in weights.items()
+                if w > 0 and (name == EXIT or admin or name not in ADMIN_ACTIONS)}
+        total = sum(kept.values())
+        return {name: w / total for name, w in kept.items()} if total else {}
+
+    def to_dict(self) -> Dict:
+        return {"start": self.start, "states": self.states}
+
+
+def parse_model(data, where: str = "model") -> BehaviourModel:
+    """Validate a decoded model document"""
+    if not isinstance(data, dict) or not isinstance(data.get("states"), dict) or not isinstance(data.get("start"), dict):
+        raise ModelError(f"{where}: expected an object with \"start\" and \"states\"")
+    states = data["states"]
+    if not data["start"]:
+        raise ModelError(f"{where}.start: no start state")
+    for name, state in states.items():
+        if name not in ACTIONS:
+            raise ModelError(f"{where}.states.{name}: unknown action (actions: {', '.join(ACTIONS)})")
+        if not isinstance(state, dict) or set(state) - {"think_time", "next"}:
+            raise ModelError(f"{where}.states.{name}: expected {{\"think_time\": ..., \"next\": {{...}}}}")
+    for field, weights in [("start", data["start"])] + [(f"states.{n}.next", s.get("next", {})) for n, s in states.items()]:
+        if not isinstance(weights, dict):
+            raise ModelError(f"{where}.{field}: expected an object of weights")
+        for target, weight in weights.items():
+            if target != EXIT and target not in states:
+                raise ModelError(f"{where}.{field}.{target}: not a state of the model")
+            if field == "start" and target == EXIT:
+                raise ModelError(f"{where}.start.exit: a session cannot start by exiting")
+            if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight < 0:
+                raise ModelError(f"{where}.{field}.{target}: weight must be a number >= 0")
+    return BehaviourModel(data["start"], states)
+
+
+def load_model(path: str) -> BehaviourModel:
+    """Read and validate a model file"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ModelError(f"{path}: not valid JSON ({e})") from None
+    return parse_model(data, path)
+
+
+def default_model() -> BehaviourModel:
+    """The built-in model, DEFAULT_MODEL"""
+    return parse_model(DEFAULT_MODEL)
+
+
+# Fitting from captured traffic
+
+# (method, route) -> action; a quiz fetched with its questions and then submitted is one take_quiz
+ROUTE_ACTIONS = {
+    ("GET", "/api/quizzes"): "browse_quizzes",
+    ("GET", "/api/quizzes/category/{category}"): "browse_category",
+    ("GET", "/api/quizzes/{id}"): "view_quiz",
+    ("GET", "/api/quizzes/{id}/with-questions"): "take_quiz",
+    ("POST", "/api/results"): "take_quiz",
+    ("GET", "/api/users/auth/currentUser"): "view_profile",
+    ("GET", "/api/results/stats/{id}"): "view_stats",
+    ("GET", "/api/results/leaderboard/global"): "global_leaderboard",
+    ("GET", "/api/results/leaderboard/category/{category}"): "category_leaderboard",
+    ("GET", "/api/results/leaderboard/quiz/{id}"): "quiz_leaderboard",
+    ("POST", "/api/quizzes"): "create_quiz",
+    ("PUT", "/api/quizzes/{id}"): "update_quiz",
+    ("GET", "/api/users/"): "get_all_users",
+    ("GET", "/api/users"): "get_all_users",
+    ("POST", "/api/users/login"): "login",
+    ("POST", "/api/users/auth/login"): "login",
+}
+SESSION_GAP_MS = 30 * 60 * 1000  # A longer pause starts a new session
+CONTINUES = {("take_quiz", "POST", "/api/results")}  # Requests that finish the action before them
+
+
+def _login_name(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    name = data.get("usernameOrEmail") or data.get("username") if isinstance(data, dict) else None
+    return name.partition("@")[0] if name else None
+
+
+def user_actions(paths: List[str]) -> Dict[Tuple[int, str], List[Tuple[str, float, float]]]:
+    """(action, started ms, finished ms) per captured user, in issue order
+
+    Tokens are tied to users through the registrations and logins that
+    handed them out, so a user who logs in again stays one user
+    """
+    actions: Dict[Tuple[int, str], List[Tuple[str, float, float]]] = defaultdict(list)
+    for source, path in enumerate(paths):
+        _, exchanges = open_capture(path)
+        owners: Dict[int, str] = {}
+        records: List[Exchange] = sorted(exchanges, key=lambda exchange: exchange.offset_ns)
+        for exchange in records:
+            if exchange.grants != NO_ACTOR:
+                name = exchange.identity or _login_name(exchange.body)
+                if name:
+                    owners[exchange.grants] = name
+        for exchange in records:
+            action = ROUTE_ACTIONS.get((exchange.method, exchange.route))
+            if action is None or exchange.status == 0:
+                continue
+            if action == "login":
+                name = owners.get(exchange.grants)
+            elif exchange.actor != NO_ACTOR:
+                name = owners.get(exchange.actor, f"token-{exchange.actor}")
+            else:
+                continue  # Anonymous requests belong to no user
+            if not name:
+                continue
+            started = exchange.offset_ns / 1e6
+            finished = started + exchange.latency_ns / 1e6
+            steps = actions[source, name]
+            if steps and (action, exchange.method, exchange.route) in CONTINUES and steps[-1][0] == action:
+                steps[-1] = (action, steps[-1][1], finished)
+            else:
+                steps.append((action, started, finished))
+    return actions
+
+
+def _think_spec(samples: List[float]) -> str:
+    if not samples:
+        return "const:0"
+    samples = sorted(samples)
+    if samples[0] == samples[-1]:
+        return f"const:{round(samples[0])}"
+    points = [samples[min(int((i + 0.5) * len(samples) / THINK_QUANTILES), len(samples) - 1)]
+              for i in range(THINK_QUANTILES)]
+    return "choice:" + ",".join(str(round(p)) for p in points)
+
+
+def fit(paths: List[str], session_gap_ms: float = SESSION_GAP_MS) -> BehaviourModel:
+    """Maximum-likelihood transition weights and empirical think times from captures"""
+    start: Dict[str, int] = defaultdict(int)
+    transitions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    think: Dict[str, List[float]] = defaultdict(list)
+    for steps in user_actions(paths).values():
+        previous = None
+        for action, started, finished in steps:
+            if previous is None:
+                start[action] += 1
+            else:
+                gap = started - previous[2]
+                if gap > session_gap_ms:
+                    transitions[previous[0]][EXIT] += 1
+                    start[action] += 1
+                else:
+                    transitions[previous[0]][action] += 1
+                    think[previous[0]].append(max(gap, 0.0))
+            previous = (action, started, finished)
+        if previous is not None:
+            transitions[previous[0]][EXIT] += 1
+    if not start:
+        raise ModelError("No user actions found in the captures (are the requests authenticated?)")
+    states = {name: {"think_time": _think_spec(think[name]), "next": dict(transitions[name])}
+              for name in sorted(set(start) | set(transitions))}
+    return BehaviourModel(dict(start), states)
+
+
+def describe(model: BehaviourModel) -> str:
+    lines = []
+    for name in model.names:
+        state = model.states[name]
+        weights = state.get("next", {})
+        total = sum(weights.values()) or 1
+        following = ", ".join(f"{target} {w / total:.0%}"
+                              for target, w in sorted(weights.items(), key=lambda item: -item[1]))
+        think = state.get("think_time", "const:0")
+        lines.append(f"  {name:22s} think {think if len(think) <= 24 else think[:21] + '...':24s} -> {following}")
+    lines.append("  Long-run action shares: " + ", ".join(
+        f"{name} {share:.0%}" for name, share in model.stationary(admin=True).items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit or inspect Markov-chain user behaviour models")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fit_parser = commands.add_parser("fit", help="Fit a model from traffic captures")
+    fit_parser.add_argument("captures", nargs="+")
+    fit_parser.add_argument("-o", "--output", required=True, help="Model file to write")
+    fit_parser.add_argument("--session-gap", type=float, default=SESSION_GAP_MS / 1000,
+                            help=f"Seconds of inactivity that end a session (default: {SESSION_GAP_MS // 1000})")
+    show_parser = commands.add_parser("show", help="Print a model (default: the built-in one)")
+    show_parser.add_argument("model", nargs="?")
+    args = parser.parse_args()
+    if args.command == "fit":
+        model = fit(args.captures, args.session_gap * 1000)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f, indent=2)
+        print(f"✓ Fitted {len(model.names)} states from {len(args.captures)} capture(s) into {args.output}")
+    else:
+        model = load_model(args.model) if args.model else default_model()
+    print(describe(model))
+
+
+if __name__ == "__main__":
+    main()
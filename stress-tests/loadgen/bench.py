@@ -0,0 +1,303 @@
+"""
+Per-endpoint benchmark suite
+One isolated micro-scenario per route: every benchmark hammers a single
+endpoint, alone, with parameters drawn from pools built during setup
+(users and their tokens, quiz ids, categories, pages, pre-encoded login
+and result bodies). Each benchmark runs a warm-up that is not measured and
+then a fixed measured window, either with a fixed number of concurrent
+workers (closed loop) or at a fixed arrival rate (--rate). Results are
+printed and written as JSON, histograms included, which loadgen.compare
+reads like a time-series file
+
+Usage:  python -m loadgen.bench [BENCHMARK ...] [--duration 30] [--warmup 5] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import base64
+import copy
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from loadgen import actions, client, engine, manifest, payloads, scheduler, teardown, tokens
+from loadgen.metrics import MetricsStore, Snapshot
+from loadgen.runner import DEFAULT_GATEWAY, RESULTS_DIR, log, set_up, stage_delta
+from loadgen.scenario import Scenario, Setup, gateway_for
+from loadgen.slo import error_counts
+
+USERS = 50  # Parameter pool of registered users
+QUIZZES = 20  # Quizzes created for the pool (0 uses the gateway's)
+RESULTS_PER_USER = 2  # Results submitted per user in setup, so stats and leaderboards have data
+DURATION = 30.0  # Measured seconds per benchmark
+WARMUP = 5.0  # Unmeasured seconds before each measured window
+CONCURRENCY = 50  # Closed-loop workers (or in-flight cap with --rate)
+PAUSE = 2.0  # Idle seconds between benchmarks
+TOP = 10
+
+
+class Pools:
+    """Request parameters drawn by the benchmarks"""
+
+    def __init__(self, ctx: actions.Context):
+        self.users = [user for user in ctx.users if user.get("id")]
+        self.quiz_ids = [quiz_id for quiz_id in ctx.quiz_ids if quiz_id in ctx.submissions]
+        self.categories = list(ctx.categories)
+        self.pages = list(range(1, max(len(ctx.quiz_ids) // actions.PAGE_SIZE, 1) + 1))
+        self.login_bodies = [payloads.encode({"usernameOrEmail": user["username"], "password": user["password"]})
+                             for user in self.users]
+
+
+Request = Callable[[actions.Context, Pools, random.Random], Awaitable]
+
+
+async def leaderboard_global(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("leaderboard", "GET", f"/api/results/leaderboard/global?top={TOP}", rng.choice(pools.users)["token"])
+
+
+async def leaderboard_category(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("leaderboard", "GET", f"/api/results/leaderboard/category/{rng.choice(pools.categories)}?top={TOP}",
+                   rng.choice(pools.users)["token"])
+
+
+async def leaderboard_quiz(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("leaderboard", "GET", f"/api/results/leaderboard/quiz/{rng.choice(pools.quiz_ids)}?top={TOP}",
+                   rng.choice(pools.users)["token"])
+
+
+async def user_stats(ctx: actions.Context, pools: Pools, rng: random.Random):
+    user = rng.choice(pools.users)
+    await ctx.call("profile", "GET", f"/api/results/stats/{user['id']}", user["token"])
+
+
+async def quizzes_page(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("get_quizzes", "GET", f"/api/quizzes?page={rng.choice(pools.pages)}&pageSize={actions.PAGE_SIZE}",
+                   rng.choice(pools.users)["token"])
+
+
+async def quizzes_category(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("get_quizzes", "GET",
+                   f"/api/quizzes/category/{rng.choice(pools.categories)}?page=1&pageSize={actions.PAGE_SIZE}",
+                   rng.choice(pools.users)["token"])
+
+
+async def quiz_with_questions(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("get_quiz", "GET", f"/api/quizzes/{rng.choice(pools.quiz_ids)}/with-questions",
+                   rng.choice(pools.users)["token"])
+
+
+async def login(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await ctx.call("login", "POST", "/api/users/login", data=rng.choice(pools.login_bodies))
+
+
+async def register(ctx: actions.Context, pools: Pools, rng: random.Random):
+    await actions.register(ctx)
+
+
+async def submit_result(ctx: actions.Context, pools: Pools, rng: random.Random):
+    quiz_id = rng.choice(pools.quiz_ids)
+    await ctx.call("submit_result", "POST", "/api/results", rng.choice(pools.users)["token"],
+                   data=ctx.submissions.body(quiz_id, rng))
+
+
+# Benchmark -> (route, operation it records, request); every request is one call to the route
+BENCHMARKS: Dict[str, Tuple[str, str, Request]] = {
+    "leaderboard_global": ("GET /api/results/leaderboard/global", "leaderboard", leaderboard_global),
+    "leaderboard_category": ("GET /api/results/leaderboard/category/{category}", "leaderboard",
+                             leaderboard_category),
+    "leaderboard_quiz": ("GET /api/results/leaderboard/quiz/{quizId}", "leaderboard", leaderboard_quiz),
+    "user_stats": ("GET /api/results/stats/{userId}", "profile", user_stats),
+    "quizzes_page": ("GET /api/quizzes?page={page}", "get_quizzes", quizzes_page),
+    "quizzes_category": ("GET /api/quizzes/category/{category}", "get_quizzes", quizzes_category),
+    "quiz_with_questions": ("GET /api/quizzes/{id}/with-questions", "get_quiz", quiz_with_questions),
+    "login": ("POST /api/users/login", "login", login),
+    "register": ("POST /api/users/register", "register", register),
+    "submit_result": ("POST /api/results", "submit_result", submit_result),
+}
+QUIZ_BENCHMARKS = {"leaderboard_quiz", "quiz_with_questions", "submit_result"}  # Need quizzes in the pool
+
+
+async def prepare(ctx: actions.Context, args: argparse.Namespace) -> Pools:
+    """Register the user pool, create quizzes and submit results so every route has data"""
+    await set_up(ctx, Scenario("bench", "", None, Setup(args.users, 1, args.quizzes, CONCURRENCY, False), []))
+    # Quizzes already on the gateway get their answer keys from one fetch each
+    for quiz_id in [quiz_id for quiz_id in ctx.quiz_ids if quiz_id not in ctx.submissions]:
+        status, body = await ctx.call("get_quiz", "GET", f"/api/quizzes/{quiz_id}/with-questions",
+                                      ctx.users[0]["token"])
+        if status == 200:
+            ctx.submissions.add_body(body)
+    if ctx.quiz_ids and args.results_per_user:
+        sessions = [actions.take_quiz(ctx, user) for user in ctx.users for _ in range(args.results_per_user)]
+        done = await asyncio.gather(*sessions)
+        log(f"✓ Submitted {sum(done)} results for stats and leaderboards", "SUCCESS")
+    return Pools(ctx)
+
+
+async def drive(ctx: actions.Context, request: Request, pools: Pools, args: argparse.Namespace,
+                rng: random.Random) -> Tuple[Snapshot, float]:
+    """Warm up, then measure; returns what happened in the measured window and its seconds"""
+    async def after_warmup() -> Tuple[Snapshot, float]:
+        await asyncio.sleep(args.warmup)
+        return ctx.metrics.snapshot(), time.monotonic()
+
+    warmed = asyncio.create_task(after_warmup())
+    total = args.warmup + args.duration
+    if args.rate:
+        await scheduler.run_open_model(scheduler.ConstantRate(args.rate, total), lambda: request(ctx, pools, rng),
+                                       max_in_flight=args.concurrency)
+    else:
+        deadline = time.monotonic() + total
+
+        async def worker():
+            while time.monotonic() < deadline:
+                await request(ctx, pools, rng)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    before, measured_from = await warmed
+    return stage_delta(before, ctx.metrics.snapshot()), time.monotonic() - measured_from
+
+
+def summarize(route: str, operation: str, window: Snapshot, seconds: float) -> Dict:
+    """Machine-readable result of one benchmark's operation (latency from the intended send time)"""
+    histogram = window.corrected.get(operation)
+    if histogram is None or not histogram.count:
+        return {"route": route, "operation": operation, "seconds": seconds, "count": 0, "errors": 0}
+    errors = error_counts(window).get(operation, 0)
+    result = {
+        "route": route,
+        "operation": operation,
+        "seconds": seconds,
+        "count": histogram.count,
+        "throughput": histogram.count / seconds if seconds else 0.0,
+        "errors": errors,
+        "error_rate": errors / histogram.count,
+        "received": window.received.get(operation, 0),
+        "mean_ms": histogram.mean_ns / 1e6,
+    }
+    for name, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("p99.9", 99.9)):
+        result[f"{name}_ms"] = histogram.percentile_ns(q) / 1e6
+    result["max_ms"] = histogram.max_ns / 1e6
+    result["histogram"] = base64.b64encode(histogram.to_bytes()).decode("ascii")
+    return result
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"\n  {'benchmark':22s} {'count':>7s} {'req/s':>8s} {'errors':>7s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'max ms':>8s}")
+    for name, result in results.items():
+        if not result["count"]:
+            print(f"  {name:22s} {0:7d}  (no requests completed)")
+            continue
+        print(f"  {name:22s} {result['count']:7d} {result['throughput']:8.1f} {result['errors']:7d} "
+              f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f} {result['p99_ms']:8.1f} {result['max_ms']:8.1f}")
+
+
+async def run_suite(gateway: str, names: List[str], args: argparse.Namespace) -> Dict[str, Dict]:
+    rng = random.Random(args.seed)
+    run_manifest = None
+    if args.teardown:
+        run_manifest = manifest.Manifest(
+            os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.manifest"), gateway, scenario="bench")
+    http_pool = client.AsyncSessionPool(pool_size=max(args.concurrency, CONCURRENCY))
+    ctx = actions.Context(http_pool.session, gateway, MetricsStore(), run_manifest,
+                          corpus_seed=args.seed if args.seed is not None else random.randrange(1 << 31))
+    results: Dict[str, Dict] = {}
+    refresher = None
+    try:
+        pools = await prepare(ctx, args)
+        if not pools.users:
+            log("No users registered successfully. Exiting.", "ERROR")
+            return results
+        # Refresh logins are recorded apart, so they never land in a benchmark's window
+        refresh_ctx = copy.copy(ctx)
+        refresh_ctx.metrics = MetricsStore()
+        refresher = tokens.RefreshScheduler(ctx.tokens, lambda user: actions.relogin(refresh_ctx, user)).start()
+        for i, name in enumerate(names, 1):
+            route, operation, request = BENCHMARKS[name]
+            if name in QUIZ_BENCHMARKS and not pools.quiz_ids:
+                log(f"Skipping {name}: no quizzes in the pool", "WARNING")
+                continue
+            if i > 1:
+                await asyncio.sleep(args.pause)
+            log(f"\nBenchmark {i}/{len(names)}: {name} ({route})", "INFO")
+            ctx.metrics = MetricsStore()  # Each benchmark is measured on its own
+            window, seconds = await drive(ctx, request, pools, args, rng)
+            results[name] = summarize(route, operation, window, seconds)
+            result = results[name]
+            if result["count"]:
+                log(f"✓ {result['throughput']:.1f} req/s, p99 {result['p99_ms']:.1f}ms, "
+                    f"{result['errors']} errors", "SUCCESS" if not result["errors"] else "WARNING")
+    finally:
+        if refresher:
+            await refresher.stop()
+        await http_pool.close()
+    if run_manifest:
+        run_manifest.close()
+        await teardown.teardown(run_manifest.path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark QuizHub routes one at a time")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL or {DEFAULT_GATEWAY})")
+    parser.add_argument("--duration", type=float, default=DURATION,
+                        help=f"Measured seconds per benchmark (default: {DURATION:g})")
+    parser.add_argument("--warmup", type=float, default=WARMUP,
+                        help=f"Unmeasured seconds before each measurement (default: {WARMUP:g})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Concurrent workers, or in-flight cap with --rate (default: {CONCURRENCY})")
+    parser.add_argument("--rate", type=float, help="Fixed requests/s instead of a closed loop")
+    parser.add_argument("--pause", type=float, default=PAUSE,
+                        help=f"Idle seconds between benchmarks (default: {PAUSE:g})")
+    parser.add_argument("--users", type=int, default=USERS, help=f"Users in the parameter pool (default: {USERS})")
+    parser.add_argument("--quizzes", type=int, default=QUIZZES,
+                        help=f"Quizzes created for the pool, 0 to use the gateway's (default: {QUIZZES})")
+    parser.add_argument("--results-per-user", type=int, default=RESULTS_PER_USER,
+                        help=f"Results each pool user submits in setup (default: {RESULTS_PER_USER})")
+    parser.add_argument("--teardown", action="store_true",
+                        help="Delete the users, quizzes and results the suite created when it is done")
+    parser.add_argument("--seed", type=int, help="Seed for parameter draws and the quiz corpus")
+    parser.add_argument("--output", metavar="PATH",
+                        default=os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"),
+                        help="Results file (default: results/bench-<time>.json)")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(unknown)} (benchmarks: {', '.join(BENCHMARKS)})")
+    if args.duration <= 0 or args.warmup < 0 or args.concurrency < 1 or args.users < 1:
+        parser.error("--duration, --concurrency and --users must be positive and --warmup >= 0")
+    names = args.benchmarks or list(BENCHMARKS)
+    gateway = gateway_for(args.gateway, None, DEFAULT_GATEWAY)
+    load = f"{args.rate:g} req/s (max {args.concurrency} in flight)" if args.rate else f"{args.concurrency} workers"
+    print(f"\nBenchmark suite: {len(names)} routes, {args.warmup:g}s warm-up + {args.duration:g}s each, {load}")
+    print(f"  Gateway URL: {gateway}")
+    print(f"  Pool: {args.users} users, {args.quizzes or 'existing'} quizzes\n")
+
+    started = datetime.now()
+    results = engine.run(lambda: run_suite(gateway, names, args))
+    print("\n" + "=" * 70)
+    print("                    BENCHMARK RESULTS")
+    print("=" * 70)
+    print_results(results)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "gateway": gateway,
+            "started": started.isoformat(timespec="seconds"),
+            "config": {"duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency,
+                       "rate": args.rate, "users": args.users, "quizzes": args.quizzes, "seed": args.seed},
+            "benchmarks": results,
+        }, f, indent=2)
+    print()
+    log(f"📄 Results written to {args.output}", "INFO")
+    print("=" * 70)
+    raise SystemExit(0 if results and all(result["count"] for result in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
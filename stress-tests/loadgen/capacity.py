@@ -0,0 +1,298 @@
+"""
+Capacity search
+Finds the highest arrival rate at which every operation still meets the
+scenario's service level objectives. The scenario's first stage is the
+probe: its mix (or behaviour model), think time and concurrency are run at
+one steady rate after another, each probe a warm-up that is not judged
+followed by a measured window that is. The rate grows geometrically until
+an objective is missed, then a binary search narrows the bracket between
+the last passing and the first failing rate down to the precision asked
+for. The report is the capacity, every probe with a latency-against-rate
+curve and the knee of that curve, also written as JSON
+
+Usage:  python -m loadgen.capacity scenarios/capacity.json [--slo "submit_result:p99<500ms"] [--max-rate 2000]
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from loadgen import actions, client, engine, manifest, slo, teardown, tokens
+from loadgen.metrics import MetricsStore, Snapshot
+from loadgen.runner import DEFAULT_GATEWAY, RESULTS_DIR, log, print_stage_report, run_stage, set_up, stage_delta
+from loadgen.scenario import Scenario, ScenarioError, Stage, gateway_for, load_scenario
+
+DEFAULT_OBJECTIVES = ["submit_result:p99<500ms", "*:errors<0.1%"]  # When neither the scenario nor --slo sets any
+GROWTH = 2.0  # Rate multiplier between probes until an objective is missed
+PRECISION = 0.05  # Search stops once the failing rate is within this share of the passing one
+MAX_PROBES = 12
+MAX_RATE = 5000.0  # Sessions per second the search never goes beyond
+WARMUP = 10.0  # Seconds of every probe that are not judged
+MEASURE = 30.0  # Judged seconds of every probe
+COOLDOWN = 5.0  # Idle seconds between probes so queues drain
+LATE_SHARE = 0.05  # Arrivals sent late above which a probe measured the load generator, not the gateway
+GRAPH_WIDTH = 40
+
+
+class Probe:
+    """One steady rate and how the gateway held up under it"""
+
+    def __init__(self, rate: float, seconds: float, snapshot: Snapshot, verdicts: List[slo.Verdict],
+                 sessions: int, late: int):
+        self.rate = rate  # Sessions started per second
+        self.seconds = seconds  # Measured window
+        self.requests = sum(histogram.count for histogram in snapshot.corrected.values())
+        self.errors = sum(slo.error_counts(snapshot).values())
+        self.verdicts = verdicts
+        self.sessions = sessions
+        self.late = late
+
+    @property
+    def passed(self) -> bool:
+        return all(verdict.met for verdict in self.verdicts)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    @property
+    def load(self) -> float:
+        """Worst latency as a share of its limit (1.0 is on the limit)"""
+        return max((verdict.load for verdict in self.verdicts if verdict.objective.latency), default=0.0)
+
+    @property
+    def generator_bound(self) -> bool:
+        return self.sessions > 0 and self.late / self.sessions > LATE_SHARE
+
+    def to_dict(self) -> Dict:
+        return {
+            "rate": self.rate, "seconds": self.seconds, "requests": self.requests, "errors": self.errors,
+            "throughput": self.throughput, "passed": self.passed, "load": self.load,
+            "sessions": self.sessions, "late": self.late, "verdicts": [v.to_dict() for v in self.verdicts],
+        }
+
+
+def next_rate(probes: List[Probe], start: float, growth: float, max_rate: float,
+              precision: float) -> Optional[float]:
+    """Rate of the next probe, None once the capacity is bracketed closely enough
+
+    A failing rate below the highest passing one is taken as noise and ignored
+    """
+    if not probes:
+        return min(start, max_rate)
+    low = max((probe.rate for probe in probes if probe.passed), default=0.0)
+    high = min((probe.rate for probe in probes if not probe.passed and probe.rate > low), default=None)
+    if high is None:
+        return min(low * growth, max_rate) if low < max_rate else None
+    if low == 0 and high <= start / growth ** 3:
+        return None  # Nothing passes even far below the start rate
+    if high - low <= precision * high:
+        return None
+    return (low + high) / 2
+
+
+def capacity(probes: List[Probe]) -> float:
+    """Highest rate that met every objective"""
+    return max((probe.rate for probe in probes if probe.passed), default=0.0)
+
+
+def knee(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Rate at the knee of a rising latency curve: the point farthest below the chord of its ends"""
+    points = sorted(points)
+    if len(points) < 3:
+        return None
+    (x0, y0), (x1, y1) = points[0], points[-1]
+    if x1 <= x0 or y1 <= y0:
+        return None
+    gaps = [((x - x0) / (x1 - x0) - (y - y0) / (y1 - y0), x) for x, y in points[1:-1]]
+    gap, rate = max(gaps)
+    return rate if gap > 0 else None
+
+
+def probe_stage(template: Stage, rate: float, duration: float) -> Stage:
+    """The template stage run steadily at one rate"""
+    stage = copy.copy(template)
+    stage.name = f"{rate:g}/s"
+    stage.kind = "steady"
+    stage.rate = rate
+    stage.start_rate = 0.0
+    stage.duration = duration
+    return stage
+
+
+async def run_probe(ctx: actions.Context, template: Stage, rate: float, objectives: List[slo.Objective],
+                    args: argparse.Namespace, rng: random.Random) -> Probe:
+    """Drive one rate for the warm-up and the measured window, judging the window"""
+    async def after_warmup() -> Tuple[Snapshot, float]:
+        await asyncio.sleep(args.warmup)
+        return ctx.metrics.snapshot(), time.monotonic()
+
+    warmed = asyncio.create_task(after_warmup())
+    report = await run_stage(ctx, probe_stage(template, rate, args.warmup + args.measure), rng)
+    before, measured_from = await warmed
+    seconds = time.monotonic() - measured_from
+    window = stage_delta(before, ctx.metrics.snapshot())
+    print_stage_report(f"measured at {rate:g} sessions/s", window, seconds)
+    return Probe(rate, seconds, window, slo.evaluate(objectives, window), report.issued if report else 0,
+                 report.late if report else 0)
+
+
+def print_curve(probes: List[Probe], knee_rate: Optional[float]):
+    """Probes by rate with the worst latency against its limit, the limit drawn as |"""
+    limit_at = GRAPH_WIDTH // 2
+    print(f"\n  {'rate/s':>8s} {'req/s':>8s} {'errors':>7s} {'of SLO':>7s}  latency (| = limit)")
+    for probe in sorted(probes, key=lambda p: p.rate):
+        bar = min(round(probe.load * limit_at), GRAPH_WIDTH)
+        cells = ["█" if i < bar else " " for i in range(GRAPH_WIDTH)]
+        cells[limit_at] = "|" if bar <= limit_at else "╋"
+        marks = ("✓" if probe.passed else "✗") + (" knee" if probe.rate == knee_rate else "")
+        if probe.generator_bound:
+            marks += " (generator behind)"
+        error_rate = probe.errors / probe.requests if probe.requests else 0.0
+        print(f"  {probe.rate:8.1f} {probe.throughput:8.1f} {error_rate:7.2%} {probe.load:7.0%}  "
+              f"{''.join(cells)} {marks}")
+
+
+def write_results(path: str, scenario: Scenario, gateway: str, objectives: List[slo.Objective],
+                  probes: List[Probe], knee_rate: Optional[float]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    best = max((probe for probe in probes if probe.passed), key=lambda p: p.rate, default=None)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "scenario": scenario.name,
+            "gateway": gateway,
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "objectives": [str(objective) for objective in objectives],
+            "capacity": capacity(probes),
+            "throughput": best.throughput if best else 0.0,
+            "knee": knee_rate,
+            "probes": [probe.to_dict() for probe in probes],
+        }, f, indent=2)
+
+
+async def search(scenario: Scenario, gateway: str, objectives: List[slo.Objective],
+                 args: argparse.Namespace) -> List[Probe]:
+    """Set up once, probe rates until the capacity is bracketed, tear down"""
+    template = scenario.stages[0]
+    metrics = MetricsStore()
+    rng = random.Random(args.seed)
+    run_manifest = None
+    if scenario.setup.teardown:
+        run_manifest = manifest.Manifest(
+            os.path.join(RESULTS_DIR, f"capacity-{datetime.now():%Y%m%d-%H%M%S}.manifest"), gateway,
+            scenario=scenario.name)
+    http_pool = client.AsyncSessionPool(pool_size=template.concurrency)
+    ctx = actions.Context(http_pool.session, gateway, metrics, run_manifest,
+                          corpus_seed=args.seed if args.seed is not None else random.randrange(1 << 31))
+    probes: List[Probe] = []
+    refresher = None
+    try:
+        await set_up(ctx, scenario)
+        if not ctx.users:
+            log("No users registered successfully. Exiting.", "ERROR")
+            return probes
+        refresher = tokens.RefreshScheduler(ctx.tokens, lambda user: actions.relogin(ctx, user)).start()
+        start = args.start_rate or template.rate
+        rate = next_rate(probes, start, args.growth, args.max_rate, args.precision)
+        while rate is not None and len(probes) < args.max_probes:
+            if probes:
+                await asyncio.sleep(args.cooldown)
+            log(f"\nProbe {len(probes) + 1}: {rate:g} sessions/s "
+                f"({args.warmup:g}s warm-up, {args.measure:g}s measured)", "INFO")
+            probe = await run_probe(ctx, template, rate, objectives, args, rng)
+            probes.append(probe)
+            for verdict in probe.verdicts:
+                print(f"    {verdict}")
+            if probe.generator_bound:
+                log(f"{probe.late}/{probe.sessions} arrivals were sent late: the load generator, not the "
+                    f"gateway, may be the limit", "WARNING")
+            log(f"{'✓ Met' if probe.passed else '✗ Missed'} the objectives at {rate:g} sessions/s "
+                f"({probe.throughput:.1f} req/s)", "SUCCESS" if probe.passed else "WARNING")
+            rate = next_rate(probes, start, args.growth, args.max_rate, args.precision)
+    finally:
+        if refresher:
+            await refresher.stop()
+        await http_pool.close()
+    if run_manifest:
+        run_manifest.close()
+        await teardown.teardown(run_manifest.path)
+    return probes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the highest rate a scenario sustains within its SLO")
+    parser.add_argument("scenario", help="Scenario whose first (open-model) stage is the probe")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL, the scenario's, or {DEFAULT_GATEWAY})")
+    parser.add_argument("--slo", action="append", type=slo.parse_objective, metavar="OPERATION:STAT<LIMIT",
+                        help="Objective every probe must meet, repeatable, replacing the scenario's "
+                             f"(default: {' '.join(DEFAULT_OBJECTIVES)})")
+    parser.add_argument("--start-rate", type=float, help="First probe's sessions/s (default: the stage's rate)")
+    parser.add_argument("--max-rate", type=float, default=MAX_RATE,
+                        help=f"Highest sessions/s probed (default: {MAX_RATE:g})")
+    parser.add_argument("--growth", type=float, default=GROWTH,
+                        help=f"Rate multiplier until an objective is missed (default: {GROWTH:g})")
+    parser.add_argument("--precision", type=float, default=PRECISION,
+                        help=f"Stop once the bracket is within this share of the rate (default: {PRECISION:g})")
+    parser.add_argument("--max-probes", type=int, default=MAX_PROBES,
+                        help=f"Probes run at most (default: {MAX_PROBES})")
+    parser.add_argument("--warmup", type=float, default=WARMUP,
+                        help=f"Unjudged seconds at the start of each probe (default: {WARMUP:g})")
+    parser.add_argument("--measure", type=float, default=MEASURE,
+                        help=f"Judged seconds of each probe (default: {MEASURE:g})")
+    parser.add_argument("--cooldown", type=float, default=COOLDOWN,
+                        help=f"Idle seconds between probes (default: {COOLDOWN:g})")
+    parser.add_argument("--seed", type=int, help="Seed for action choices, think times and arrivals")
+    parser.add_argument("--output", metavar="PATH",
+                        default=os.path.join(RESULTS_DIR, f"capacity-{datetime.now():%Y%m%d-%H%M%S}.json"),
+                        help="Results file (default: results/capacity-<time>.json)")
+    args = parser.parse_args()
+    if args.growth <= 1 or args.precision <= 0 or args.measure <= 0 or args.warmup < 0:
+        parser.error("--growth must be > 1, --precision and --measure > 0 and --warmup >= 0")
+    try:
+        scenario = load_scenario(args.scenario)
+        if not scenario.stages[0].open:
+            raise ScenarioError(f"{args.scenario}.stages[0]: the capacity search drives the first stage's rate, "
+                                f"so it must be an open-model (rate) stage")
+    except (OSError, ScenarioError) as e:
+        log(str(e), "ERROR")
+        raise SystemExit(2)
+    gateway = gateway_for(args.gateway, scenario, DEFAULT_GATEWAY)
+    objectives = args.slo or scenario.objectives or [slo.parse_objective(spec) for spec in DEFAULT_OBJECTIVES]
+    print(f"\nCapacity search: {scenario.name}")
+    print(f"  Gateway URL: {gateway}")
+    print(f"  Probe: {scenario.stages[0].describe()}")
+    print(f"  Objectives: {', '.join(str(objective) for objective in objectives)}\n")
+
+    probes = engine.run(lambda: search(scenario, gateway, objectives, args))
+    if not probes:
+        raise SystemExit(1)
+    knee_rate = knee([(probe.rate, probe.load) for probe in probes])
+    print("\n" + "=" * 70)
+    print("                    CAPACITY SEARCH RESULTS")
+    print("=" * 70)
+    print_curve(probes, knee_rate)
+    found = capacity(probes)
+    print()
+    if found:
+        best = max((probe for probe in probes if probe.passed), key=lambda p: p.rate)
+        ceiling = " (the --max-rate ceiling, raise it to search higher)" if found >= args.max_rate else ""
+        log(f"✓ Capacity: {found:g} sessions/s ({best.throughput:.1f} req/s) within the objectives{ceiling}",
+            "SUCCESS")
+    else:
+        log("✗ No probed rate met the objectives", "ERROR")
+    if knee_rate:
+        log(f"📈 Latency knee at {knee_rate:g} sessions/s", "INFO")
+    write_results(args.output, scenario, gateway, objectives, probes, knee_rate)
+    log(f"📄 Results written to {args.output}", "INFO")
+    print("=" * 70)
+    raise SystemExit(0 if found else 1)
+
+
+if __name__ == "__main__":
+    main()
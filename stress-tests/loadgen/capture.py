@@ -0,0 +1,257 @@
+"""
+Traffic capture for record-and-replay
+Every request the load generator sends is streamed to a gzip-compressed
+file of length-prefixed records: when it was issued, method, route
+template, path, request body, response status and latency, plus what the
+replay engine needs to re-link the traffic to a fresh backend (which
+token sent it, which token the response handed out, the IDs it created)
+
+Dump a capture as JSON lines:  python -m loadgen.capture results/<run>.qhc
+"""
+
+import argparse
+import contextvars
+import gzip
+import json
+import re
+import struct
+import sys
+import time
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+MAGIC = b"QHRC"
+VERSION = 1
+COMPRESS_LEVEL = 5
+
+_FILE_HEADER = struct.Struct("<4sHd")  # magic, version, capture start (unix time)
+_LENGTH = struct.Struct("<I")
+_EXCHANGE = struct.Struct("<QQHii")  # issued offset ns, latency ns, status, actor, grants
+_FIELDS = ("method", "operation", "route", "path", "content_type", "body", "identity", "created")
+NO_ACTOR = -1
+
+GUID = re.compile(rb"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_GUID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+_USERNAME_FIELD = re.compile(rb'name="username"[^\r\n]*\r\n(?:[^\r\n]+\r\n)*\r\n([^\r\n]*)')
+
+
+class Exchange(NamedTuple):
+    offset_ns: int  # Issue time since the capture started
+    latency_ns: int
+    status: int  # 0: no response
+    actor: int  # Token the request was sent with, NO_ACTOR when anonymous
+    grants: int  # Token the response handed out, NO_ACTOR when none
+    method: str
+    operation: str  # Load generator operation name, empty when not recorded by one
+    route: str  # Path template, e.g. /api/quizzes/{id}/with-questions
+    path: str  # Path and query as sent
+    content_type: str
+    body: bytes
+    identity: str  # Username a registration created
+    created: Tuple[str, ...]  # GUIDs in a successful POST/PUT response, in document order
+
+
+def route_template(path: str) -> str:
+    """Route of a request path with its variable segments named"""
+    segments = path.partition("?")[0].split("/")
+    for i, segment in enumerate(segments):
+        if _GUID_SEGMENT.match(segment):
+            segments[i] = "{id}"
+        elif i and segments[i - 1] == "category" and segment:
+            segments[i] = "{category}"
+    return "/".join(segments)
+
+
+def _pack(exchange: Exchange) -> bytes:
+    parts = [_EXCHANGE.pack(exchange.offset_ns, exchange.latency_ns, exchange.status,
+                            exchange.actor, exchange.grants)]
+    for name in _FIELDS:
+        value = getattr(exchange, name)
+        if name == "created":
+            value = ",".join(value)
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        parts.append(_LENGTH.pack(len(value)))
+        parts.append(value)
+    return b"".join(parts)
+
+
+def _unpack(payload: bytes) -> Exchange:
+    values = list(_EXCHANGE.unpack_from(payload))
+    position = _EXCHANGE.size
+    for name in _FIELDS:
+        (length,) = _LENGTH.unpack_from(payload, position)
+        position += _LENGTH.size
+        value = payload[position:position + length]
+        position += length
+        if name == "created":
+            values.append(tuple(value.decode("ascii").split(",")) if value else ())
+        elif name == "body":
+            values.append(value)
+        else:
+            values.append(value.decode("utf-8"))
+    return Exchange(*values)
+
+
+class CaptureWriter:
+    """Appends exchanges to a compressed capture file"""
+
+    def __init__(self, path: str, started_at: Optional[float] = None):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, "wb", compresslevel=COMPRESS_LEVEL)
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, started_at or time.time()))
+
+    def write(self, exchange: Exchange):
+        payload = _pack(exchange)
+        self._file.write(_LENGTH.pack(len(payload)))
+        self._file.write(payload)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(stream: BinaryIO) -> Tuple[float, Iterator[Exchange]]:
+    """Capture start (unix time) and its exchanges in file (completion) order"""
+    magic, version, started_at = _FILE_HEADER.unpack(stream.read(_FILE_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a QuizHub traffic capture")
+
+    def exchanges():
+        while True:
+            prefix = stream.read(_LENGTH.size)
+            if len(prefix) < _LENGTH.size:
+                return
+            payload = stream.read(_LENGTH.unpack(prefix)[0])
+            if len(payload) < _EXCHANGE.size:
+                return  # Truncated by a crash
+            yield _unpack(payload)
+
+    return started_at, exchanges()
+
+
+def open_capture(path: str) -> Tuple[float, Iterator[Exchange]]:
+    return read_capture(gzip.open(path, "rb"))
+
+
+class _Pending:
+    __slots__ = ("started_ns", "method", "path", "actor", "content_type", "body", "status")
+
+    def __init__(self, started_ns: int, method: str, path: str):
+        self.started_ns = started_ns
+        self.method = method
+        self.path = path
+        self.actor = NO_ACTOR
+        self.content_type = ""
+        self.body = bytearray()
+        self.status = 0
+
+
+class TrafficRecorder:
+    """aiohttp trace hooks that capture every request of the sessions they are installed on
+
+    The request side comes from the trace hooks; the load generator hands
+    over the response body with complete() once it has read it, in the
+    same task. A request that is never completed is written without it
+    when its task sends the next request, or on close
+    """
+
+    def __init__(self, path: str):
+        self.writer = CaptureWriter(path)
+        self.started_ns = time.perf_counter_ns()
+        self._tokens: Dict[str, int] = {}
+        self._current: contextvars.ContextVar = contextvars.ContextVar("capture_exchange", default=None)
+
+    @property
+    def path(self) -> str:
+        return self.writer.path
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_headers_sent.append(self._on_headers_sent)
+        trace.on_request_chunk_sent.append(self._on_chunk_sent)
+        trace.on_request_end.append(self._on_request_end)
+        return trace
+
+    def _actor(self, token: str) -> int:
+        actor = self._tokens.get(token)
+        if actor is None:
+            actor = self._tokens[token] = len(self._tokens)
+        return actor
+
+    async def _on_request_start(self, session, context, params):
+        previous = self._current.get()
+        if previous is not None:
+            self._write(previous, 0, previous.status, b"", "")
+        context.exchange = _Pending(time.perf_counter_ns(), params.method, params.url.path_qs)
+        self._current.set(context.exchange)
+
+    async def _on_headers_sent(self, session, context, params):
+        exchange = context.exchange
+        exchange.content_type = params.headers.get("Content-Type", "")
+        authorization = params.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            exchange.actor = self._actor(authorization[7:])
+
+    async def _on_chunk_sent(self, session, context, params):
+        context.exchange.body += params.chunk
+
+    async def _on_request_end(self, session, context, params):
+        context.exchange.status = params.response.status
+
+    def complete(self, operation: str, status: int, body: bytes, latency_ns: int):
+        """Write the request this task just finished, with its response body"""
+        exchange = self._current.get()
+        if exchange is None:
+            return
+        self._current.set(None)
+        self._write(exchange, latency_ns, status, body, operation)
+
+    def _write(self, exchange: _Pending, latency_ns: int, status: int, body: bytes, operation: str):
+        request_body = bytes(exchange.body)
+        route = route_template(exchange.path)
+        grants, created, identity = NO_ACTOR, (), ""
+        if exchange.method in ("POST", "PUT") and 200 <= status < 300 and body:
+            created = tuple(g.decode("ascii") for g in GUID.findall(body))
+            if b'"token"' in body or b'"Token"' in body:
+                try:
+                    data = json.loads(body)
+                    token = data.get("token") or data.get("Token")
+                    if token:
+                        grants = self._actor(token)
+                except (ValueError, AttributeError):
+                    pass
+            if route.endswith("/register"):
+                match = _USERNAME_FIELD.search(request_body)
+                identity = match.group(1).decode("utf-8", "replace") if match else ""
+        self.writer.write(Exchange(
+            exchange.started_ns - self.started_ns, latency_ns, status, exchange.actor, grants,
+            exchange.method, operation, route, exchange.path, exchange.content_type, request_body,
+            identity, created))
+
+    def close(self):
+        exchange = self._current.get()
+        if exchange is not None:
+            self._write(exchange, 0, exchange.status, b"", "")
+        self.writer.close()
+
+
+def main():
+    """Print a capture as JSON lines"""
+    parser = argparse.ArgumentParser(description="Dump a traffic capture as JSON lines")
+    parser.add_argument("path")
+    parser.add_argument("--bodies", action="store_true", help="Include request bodies")
+    args = parser.parse_args()
+    started_at, exchanges = open_capture(args.path)
+    for exchange in exchanges:
+        record = exchange._asdict()
+        record["issued_at"] = started_at + exchange.offset_ns / 1e9
+        record["body"] = exchange.body.decode("utf-8", "replace") if args.bodies else len(exchange.body)
+        sys.stdout.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Streaming cleanup of paginated listings
+Pages are read one after another with the next page already requested
+while the current one is examined, matching items are handed straight to
+the seeding pipeline and deleted with bounded, adaptive parallelism.
+Listings are offset-paginated and deleting shifts later items back, so
+cleanup walks them from the last page to the first; sweeps repeat until
+one deletes nothing, which also catches items inserted meanwhile
+"""
+
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+from loadgen import seeding
+
+MAX_PAGE_SIZE = 100  # Upper bound the QuizService accepts
+MAX_SWEEPS = 10
+
+
+async def fetch_page(session: aiohttp.ClientSession, url: str, page: int, page_size: int,
+                     headers: Dict[str, str] = None, max_attempts: int = 5) -> List[Dict]:
+    """One page of a listing, retried with backoff on 429/5xx and connection errors"""
+    for attempt in range(max_attempts):
+        retry_after = None
+        try:
+            async with session.get(url, params={"page": page, "pageSize": page_size}, headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    # Handle both paginated and non-paginated responses
+                    if isinstance(data, dict):
+                        return data.get("quizzes", data.get("items", []))
+                    return data
+                if response.status not in seeding.RETRY_STATUSES:
+                    raise RuntimeError(f"GET {url} page {page} failed: {response.status}")
+                retry_after = seeding.retry_after_seconds(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt + 1 == max_attempts:
+                raise
+        delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+        await asyncio.sleep(max(delay, retry_after or 0))
+    raise RuntimeError(f"GET {url} page {page} still failing after {max_attempts} attempts")
+
+
+async def last_page(session: aiohttp.ClientSession, url: str, headers: Dict[str, str] = None,
+                    page_size: int = MAX_PAGE_SIZE, max_attempts: int = 5) -> int:
+    """Number of the last non-empty page (1 for an empty listing), found by galloping then bisecting"""
+    async def full(page):
+        return len(await fetch_page(session, url, page, page_size, headers, max_attempts)) >= page_size
+
+    low = 1
+    if not await full(low):
+        return low
+    high = 2
+    while await full(high):
+        low, high = high, high * 2
+    # Page low is full, page high is not: the last page is in (low, high]
+    while high - low > 1:
+        middle = (low + high) // 2
+        if await full(middle):
+            low = middle
+        else:
+            high = middle
+    items = await fetch_page(session, url, high, page_size, headers, max_attempts)
+    return high if items else low
+
+
+async def stream_pages(session: aiohttp.ClientSession, url: str, headers: Dict[str, str] = None,
+                       page_size: int = MAX_PAGE_SIZE, max_attempts: int = 5,
+                       reverse: bool = False) -> AsyncIterator[List[Dict]]:
+    """Every page of a listing, prefetching the next page while the caller works on this one
+
+    In reverse (last page first) deleting items from the current page
+    only shifts pages that were already read, so one sweep sees everything
+    """
+    if reverse:
+        page = await last_page(session, url, headers, page_size, max_attempts)
+    else:
+        page = 1
+    pending = asyncio.create_task(fetch_page(session, url, page, page_size, headers, max_attempts))
+    try:
+        while pending:
+            items = await pending
+            pending = None
+            if reverse:
+                page -= 1
+                more = page >= 1
+            else:
+                # A short page is the last one
+                page += 1
+                more = len(items) >= page_size
+            if more:
+                pending = asyncio.create_task(fetch_page(session, url, page, page_size, headers, max_attempts))
+            yield items
+    finally:
+        if pending:
+            pending.cancel()
+
+
+class CleanupStats:
+    """Totals over all sweeps of one cleanup"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.examined = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+        self.retries = 0
+        self.sweeps = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.label}: examined {self.examined}, deleted {self.deleted} "
+                f"({self.rate:.1f}/s), {self.failed} failed, {self.retries} retried, "
+                f"{self.sweeps} sweep{'s' if self.sweeps != 1 else ''} in {self.elapsed:.1f}s")
+
+
+async def delete_item(session: aiohttp.ClientSession, url: str, headers: Dict[str, str] = None):
+    """DELETE url; an item that is already gone counts as skipped"""
+    async with session.delete(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
+        if response.status in [200, 204]:
+            return True
+        if response.status == 404:
+            return seeding.SKIPPED
+        if response.status in seeding.RETRY_STATUSES:
+            raise seeding.RetryableError(response.status, seeding.retry_after_seconds(response))
+        return False
+
+
+async def cleanup(session: aiohttp.ClientSession, list_url: str, item_url: Callable[[Dict], str],
+                  predicate: Callable[[Dict], bool], concurrency: int, headers: Dict[str, str] = None,
+                  label: str = "Cleanup", page_size: int = MAX_PAGE_SIZE, max_attempts: int = 5,
+                  max_sweeps: int = MAX_SWEEPS, on_deleted: Callable[[Dict], None] = None,
+                  progress: Callable[[str], None] = None) -> CleanupStats:
+    """Delete every listed item matching predicate, sweeping the listing until nothing is left to delete"""
+    totals = CleanupStats(label)
+    limit = seeding.AdaptiveConcurrency(max(concurrency // 4, 1), concurrency)
+    while totals.sweeps < max_sweeps:
+        totals.sweeps += 1
+        queued: Set[str] = set()
+
+        async def candidates():
+            async for page in stream_pages(session, list_url, headers, page_size, max_attempts, reverse=True):
+                totals.examined += len(page)
+                for item in page:
+                    # Items inserted meanwhile shift others onto a neighbouring page
+                    if item.get("id") not in queued and predicate(item):
+                        queued.add(item.get("id"))
+                        totals.matched += 1
+                        yield item
+
+        def deleted(item, _):
+            if on_deleted:
+                on_deleted(item)
+
+        stats = await seeding.run_pipeline(
+            candidates(), lambda item: delete_item(session, item_url(item), headers),
+            seeding.SeedStats(f"{label} (sweep {totals.sweeps})"), limit,
+            on_result=deleted, max_attempts=max_attempts, progress=progress)
+        totals.deleted += stats.succeeded
+        totals.retries += stats.retries
+        totals.failed = stats.failed  # Items that keep failing are retried by every sweep
+        if not stats.succeeded:
+            break
+    totals.finished = time.monotonic()
+    return totals
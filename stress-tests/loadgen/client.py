@@ -0,0 +1,131 @@
+"""
+Pooled HTTP clients shared by the stress tests
+Keep-alive connections are reused across requests instead of opening
+(and TLS-handshaking) a new connection for every call
+"""
+
+import threading
+from typing import Dict, List
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 100  # Keep-alive connections per host
+DEFAULT_POOL_HOSTS = 10  # Distinct hosts cached per session
+
+
+class ConnectionStats:
+    """Request and connection counters for one client"""
+
+    def __init__(self, requests_sent: int = 0, connections_opened: int = 0):
+        self.requests_sent = requests_sent
+        self.connections_opened = connections_opened
+
+    def __add__(self, other: "ConnectionStats") -> "ConnectionStats":
+        return ConnectionStats(self.requests_sent + other.requests_sent,
+                               self.connections_opened + other.connections_opened)
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests_sent - self.connections_opened, 0)
+
+    @property
+    def reuse_ratio(self) -> float:
+        if not self.requests_sent:
+            return 0.0
+        return self.connections_reused / self.requests_sent
+
+    def summary(self) -> str:
+        return (f"{self.requests_sent} requests over {self.connections_opened} connections "
+                f"({self.reuse_ratio * 100:.1f}% reused)")
+
+
+class SessionPool:
+    """Thread-local requests sessions, each worker keeps its own keep-alive pool"""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, pool_hosts: int = DEFAULT_POOL_HOSTS):
+        self.pool_size = pool_size
+        self.pool_hosts = pool_hosts
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        """Return the calling worker's session, creating it on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def stats(self) -> ConnectionStats:
+        """Aggregate urllib3 pool counters over every worker's session"""
+        stats = ConnectionStats()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    stats.requests_sent += pool.num_requests
+                    stats.connections_opened += pool.num_connections
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+
+class AsyncSessionPool:
+    """One aiohttp session per process (event loop) with a per-host keep-alive pool"""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, max_connections: int = 0,
+                 timeout: float = 30, keepalive_timeout: float = 60,
+                 trace_configs: List[aiohttp.TraceConfig] = None):
+        self._stats = ConnectionStats()
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(self._on_connection_created)
+        connector = aiohttp.TCPConnector(
+            limit=max_connections,
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            trace_configs=[trace] + list(trace_configs or []),
+        )
+
+    async def _on_request_start(self, session, context, params):
+        self._stats.requests_sent += 1
+
+    async def _on_connection_created(self, session, context, params):
+        self._stats.connections_opened += 1
+
+    def stats(self) -> ConnectionStats:
+        return ConnectionStats(self._stats.requests_sent, self._stats.connections_opened)
+
+    async def close(self):
+        await self.session.close()
+
+
+def multipart_form(fields: Dict[str, str]) -> aiohttp.MultipartWriter:
+    """Build a multipart/form-data body (UserService binds registration with [FromForm])"""
+    writer = aiohttp.MultipartWriter("form-data")
+    for name, value in fields.items():
+        part = writer.append(value)
+        part.set_content_disposition("form-data", name=name)
+    return writer
@@ -0,0 +1,290 @@
+"""
+Baseline comparison and regression gate
+Compares the saved time series (.qts) or benchmark results (loadgen.bench
+.json, one "operation" per benchmark) of a baseline run against a
+candidate run, per operation: throughput while the operation was active,
+latency percentiles and error rate. Given repeated runs on either side, a
+Welch t-test over the runs tells real changes from run-to-run noise, and
+only a change that is both past its threshold and significant fails the
+gate; single runs are gated on the threshold alone. The per-worker files
+of a run (run.worker1.qts, ...) are merged into one run with run.qts. Exits
+1 when a regression is found, so a deploy pipeline can stop on it
+
+Usage:  python -m loadgen.compare --baseline results/a1.qts results/a2.qts --candidate results/b1.qts results/b2.qts
+"""
+
+import argparse
+import base64
+import json
+import math
+import re
+import struct
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from loadgen.histogram import Histogram
+from loadgen.timeseries import read_samples
+
+# Metric -> (higher is better, default threshold); percentages of the baseline, points for errors
+METRICS = {
+    "throughput": (True, 10.0),
+    "p50": (False, 10.0),
+    "p95": (False, 10.0),
+    "p99": (False, 15.0),
+    "errors": (False, 0.5),
+}
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99}
+ALPHA = 0.05  # Significance level of the t-test
+MIN_SAMPLES = 20  # Requests an operation needs in every run to be compared
+
+_WORKER_FILE = re.compile(r"^(?P<root>.*)\.worker\d+(?P<ext>\.qts)$")
+
+
+class RunStats(NamedTuple):
+    """One operation over one run"""
+    count: int
+    seconds: float  # Seconds of the intervals in which the operation had requests
+    errors: int
+    histogram: Histogram
+
+    def value(self, metric: str) -> float:
+        """throughput in req/s, percentiles in ms, errors as a percentage of requests"""
+        if metric == "throughput":
+            return self.count / self.seconds if self.seconds else 0.0
+        if metric == "errors":
+            return self.errors / self.count * 100 if self.count else 0.0
+        return self.histogram.percentile_ns(PERCENTILES[metric]) / 1e6
+
+
+class Comparison(NamedTuple):
+    operation: str
+    metric: str
+    baseline: float  # Mean over the runs
+    candidate: float
+    change: float  # Percent of the baseline; percentage points for errors
+    p_value: Optional[float]  # None when either side has a single run
+    regression: bool
+    improvement: bool
+
+
+def load_bench(path: str) -> Dict[str, RunStats]:
+    """Per-benchmark totals of a loadgen.bench results file"""
+    with open(path, encoding="utf-8") as f:
+        benchmarks = json.load(f)["benchmarks"]
+    return {name: RunStats(result["count"], result["seconds"], result["errors"],
+                           Histogram.from_bytes(base64.b64decode(result["histogram"])))
+            for name, result in benchmarks.items() if result.get("count")}
+
+
+class _Series:
+    """One operation's samples from one or more time-series files"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.intervals: List[Tuple[float, float]] = []
+        self.histogram = Histogram()
+
+    def seconds(self) -> float:
+        """Length of the union of the intervals with requests (workers of a run overlap in time)"""
+        total, end = 0.0, float("-inf")
+        for start, stop in sorted(self.intervals):
+            if stop > end:
+                total += stop - max(start, end)
+                end = stop
+        return total
+
+
+def _read_series(paths: List[str]) -> Dict[str, _Series]:
+    series: Dict[str, _Series] = {}
+    for path in paths:
+        with open(path, "rb") as stream:
+            for sample in read_samples(stream):
+                operation = series.setdefault(sample.operation, _Series())
+                operation.count += sample.count
+                operation.errors += sample.errors
+                if sample.count:
+                    operation.intervals.append((sample.started_at, sample.started_at + sample.seconds))
+                operation.histogram.merge(sample.histogram)
+    return series
+
+
+def group_runs(paths: List[str]) -> List[List[str]]:
+    """The files of each run in order: run.workerN.qts files join run.qts (or each other without it)"""
+    groups: Dict[str, List[str]] = {}
+    for path in paths:
+        match = _WORKER_FILE.match(path)
+        root = match.group("root") + match.group("ext") if match else path
+        group = groups.setdefault(root, [])
+        if path not in group:
+            group.append(path)
+    return list(groups.values())
+
+
+def load_run(paths: Union[str, List[str]]) -> Dict[str, RunStats]:
+    """Per-operation totals of a run's time-series files (or of a benchmark results file)
+
+    A multi-process run's parent file absorbed its workers' totals at the
+    end, so the operations its worker files record are taken from those
+    and only the rest (quiz creation, leaderboards) from the parent file
+    """
+    paths = [paths] if isinstance(paths, str) else paths
+    if len(paths) == 1 and paths[0].endswith(".json"):
+        return load_bench(paths[0])
+    workers = [path for path in paths if _WORKER_FILE.match(path)]
+    series = _read_series(workers)
+    for operation, parent in _read_series([path for path in paths if path not in workers]).items():
+        series.setdefault(operation, parent)
+    return {operation: RunStats(s.count, s.seconds(), s.errors, s.histogram) for operation, s in series.items()}
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction of the incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return h
+
+
+def incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1 - x) / b
+
+
+def welch_p_value(first: List[float], second: List[float]) -> Optional[float]:
+    """Two-sided p-value of Welch's t-test, None with fewer than two values on a side"""
+    n1, n2 = len(first), len(second)
+    if n1 < 2 or n2 < 2:
+        return None
+    mean1, mean2 = sum(first) / n1, sum(second) / n2
+    var1 = sum((v - mean1) ** 2 for v in first) / (n1 - 1)
+    var2 = sum((v - mean2) ** 2 for v in second) / (n2 - 1)
+    se2 = var1 / n1 + var2 / n2
+    if se2 == 0:
+        return 1.0 if mean1 == mean2 else 0.0
+    t = (mean2 - mean1) / math.sqrt(se2)
+    df = se2 ** 2 / ((var1 / n1) ** 2 / (n1 - 1) + (var2 / n2) ** 2 / (n2 - 1))
+    return incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def compare(baseline: List[Dict[str, RunStats]], candidate: List[Dict[str, RunStats]],
+            thresholds: Dict[str, float], alpha: float = ALPHA,
+            operations: Optional[List[str]] = None) -> Tuple[List[Comparison], List[str]]:
+    """Comparisons of the operations every run has enough requests for, and the operations skipped"""
+    runs = baseline + candidate
+    common = set.intersection(*(set(run) for run in runs))
+    names = sorted(common if operations is None else common & set(operations))
+    skipped = sorted((set(operations) if operations is not None else set().union(*runs)) - set(names))
+    results = []
+    for operation in names:
+        if any(run[operation].count < MIN_SAMPLES for run in runs):
+            skipped.append(operation)
+            continue
+        for metric, (higher_is_better, _) in METRICS.items():
+            before = [run[operation].value(metric) for run in baseline]
+            after = [run[operation].value(metric) for run in candidate]
+            mean_before, mean_after = sum(before) / len(before), sum(after) / len(after)
+            if metric == "errors":
+                change = mean_after - mean_before
+            else:
+                change = (mean_after - mean_before) / mean_before * 100 if mean_before else 0.0
+            worse = -change if higher_is_better else change
+            p_value = welch_p_value(before, after)
+            significant = p_value is None or p_value < alpha
+            threshold = thresholds[metric]
+            results.append(Comparison(operation, metric, mean_before, mean_after, change, p_value,
+                                      regression=worse > threshold and significant,
+                                      improvement=-worse > threshold and significant))
+    return results, sorted(skipped)
+
+
+def parse_threshold(spec: str) -> Tuple[str, float]:
+    """METRIC=PERCENT such as p99=20 or errors=0.1 (percentage points)"""
+    metric, _, value = spec.partition("=")
+    if metric not in METRICS:
+        raise argparse.ArgumentTypeError(f"unknown metric '{metric}' (metrics: {', '.join(METRICS)})")
+    try:
+        return metric, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad threshold '{spec}', expected METRIC=PERCENT such as p99=20") from None
+
+
+def print_report(results: List[Comparison], skipped: List[str], runs: Tuple[int, int], alpha: float):
+    units = {"throughput": "req/s", "errors": "%"}
+    print(f"\n  {runs[0]} baseline run{'s' if runs[0] > 1 else ''} vs {runs[1]} candidate "
+          f"run{'s' if runs[1] > 1 else ''}" + ("" if min(runs) > 1 else " (single runs: no significance test)"))
+    print(f"\n  {'operation':15s} {'metric':16s} {'baseline':>10s} {'candidate':>10s} {'change':>9s} "
+          f"{'p':>6s}  verdict")
+    for result in results:
+        unit = units.get(result.metric, "ms")
+        change = f"{result.change:+.2f}pt" if result.metric == "errors" else f"{result.change:+.1f}%"
+        p_value = f"{result.p_value:.3f}" if result.p_value is not None else "-"
+        verdict = "✗ regression" if result.regression else "✓ improved" if result.improvement else ""
+        if not verdict and result.p_value is not None and result.p_value >= alpha:
+            verdict = "~ noise" if abs(result.change) > 0 else ""
+        print(f"  {result.operation:15s} {result.metric + ' ' + unit:16s} {result.baseline:10.2f} "
+              f"{result.candidate:10.2f} {change:>9s} {p_value:>6s}  {verdict}")
+    if skipped:
+        print(f"\n  Not compared (missing or fewer than {MIN_SAMPLES} requests in a run): {', '.join(skipped)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark runs against a baseline and gate regressions")
+    parser.add_argument("--baseline", nargs="+", required=True, metavar="RUN",
+                        help="Time-series (.qts) or benchmark (.json) files of the baseline run(s); "
+                             "a run's .workerN.qts files count as one run with it")
+    parser.add_argument("--candidate", nargs="+", required=True, metavar="RUN",
+                        help="Time-series (.qts) or benchmark (.json) files of the candidate run(s)")
+    parser.add_argument("--threshold", action="append", type=parse_threshold, default=[], metavar="METRIC=PERCENT",
+                        help="Regression threshold, repeatable (defaults: "
+                             + ", ".join(f"{metric}={threshold:g}" for metric, (_, threshold) in METRICS.items())
+                             + "; errors in percentage points)")
+    parser.add_argument("--alpha", type=float, default=ALPHA,
+                        help=f"Significance level for repeated runs (default: {ALPHA:g})")
+    parser.add_argument("--operations", help="Comma-separated operations to compare (default: all in every run)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the comparison as JSON")
+    args = parser.parse_args()
+    thresholds = {metric: threshold for metric, (_, threshold) in METRICS.items()}
+    thresholds.update(args.threshold)
+    try:
+        baseline = [load_run(paths) for paths in group_runs(args.baseline)]
+        candidate = [load_run(paths) for paths in group_runs(args.candidate)]
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        raise SystemExit(2)
+    operations = args.operations.split(",") if args.operations else None
+    results, skipped = compare(baseline, candidate, thresholds, args.alpha, operations)
+    print_report(results, skipped, (len(baseline), len(candidate)), args.alpha)
+    regressions = [result for result in results if result.regression]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"baseline": args.baseline, "candidate": args.candidate, "thresholds": thresholds,
+                       "alpha": args.alpha, "comparisons": [result._asdict() for result in results],
+                       "skipped": skipped, "regressions": len(regressions)}, f, indent=2)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression{'s' if len(regressions) > 1 else ''}: "
+              + ", ".join(f"{r.operation} {r.metric}" for r in regressions))
+        raise SystemExit(1)
+    print(f"\n✓ No regressions past the thresholds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Synthetic quiz corpus
+Deterministic, seedable and lazy: quiz i depends only on (seed, i), so a
+corpus of any size can be streamed, sharded or regenerated without ever
+being held in memory. Quizzes use the seed-data template format and cover
+all four question types
+
+Preview a corpus as JSON lines:  python -m loadgen.corpus --quizzes 5 --corpus-seed 1
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# Question types (QuizService QuestionType enum)
+SINGLE = 0
+MULTIPLE = 1
+TRUE_FALSE = 2
+FILL_IN = 3
+QUESTION_TYPES = {"SINGLE": SINGLE, "MULTIPLE": MULTIPLE, "TRUE_FALSE": TRUE_FALSE, "FILL_IN": FILL_IN}
+
+# Topic words per category (question subjects and answer options)
+TOPICS = {
+    "Science": ["atom", "molecule", "photosynthesis", "gravity", "enzyme", "electron", "cell", "catalyst",
+                "isotope", "mitochondria", "neutron", "orbit", "wavelength", "genome", "protein", "entropy"],
+    "History": ["empire", "revolution", "treaty", "dynasty", "pharaoh", "republic", "crusade", "monarchy",
+                "senate", "armistice", "colony", "renaissance", "reformation", "constitution", "siege", "charter"],
+    "Geography": ["river", "plateau", "archipelago", "delta", "glacier", "peninsula", "desert", "capital",
+                  "strait", "volcano", "savanna", "fjord", "monsoon", "tundra", "continent", "canyon"],
+    "Mathematics": ["prime", "integral", "matrix", "vector", "polynomial", "derivative", "theorem", "fraction",
+                    "logarithm", "hypotenuse", "sequence", "function", "probability", "axiom", "tangent", "median"],
+    "Technology": ["compiler", "protocol", "database", "algorithm", "processor", "kernel", "router", "cache",
+                   "container", "encryption", "thread", "framework", "bandwidth", "interpreter", "socket", "index"],
+    "Literature": ["novel", "sonnet", "metaphor", "protagonist", "epic", "tragedy", "narrator", "allegory",
+                   "stanza", "satire", "memoir", "ballad", "prologue", "fable", "irony", "manuscript"],
+    "Sports": ["marathon", "tournament", "goalkeeper", "championship", "relay", "referee", "stadium", "league",
+               "sprint", "penalty", "medal", "decathlon", "playoff", "captain", "offside", "racket"],
+    "Music": ["symphony", "chord", "tempo", "octave", "sonata", "melody", "rhythm", "orchestra",
+              "harmony", "opera", "concerto", "scale", "chorus", "crescendo", "overture", "quartet"],
+    "Art": ["fresco", "sculpture", "canvas", "perspective", "impressionism", "mosaic", "portrait", "palette",
+            "cubism", "etching", "gallery", "baroque", "watercolor", "surrealism", "sketch", "tapestry"],
+    "General Knowledge": ["currency", "language", "invention", "festival", "landmark", "flag", "calendar",
+                          "tradition", "cuisine", "holiday", "symbol", "proverb", "alphabet", "museum", "bridge", "planet"],
+}
+CATEGORIES = list(TOPICS)
+
+ADJECTIVES = ["Essential", "Advanced", "Curious", "Classic", "Modern", "Hidden", "Practical", "Legendary",
+              "Everyday", "Ultimate", "Surprising", "Fundamental"]
+# Question text templates per type; {topic} and {category} are filled in, qualifiers pad to the target length
+TEMPLATES = {
+    SINGLE: ["Which term is most closely associated with the {topic}",
+             "What best describes {a_topic} in {category}",
+             "Which of the following is a well-known example of {a_topic}",
+             "Which concept is usually taught right after the {topic}"],
+    MULTIPLE: ["Which of the following are related to the {topic}",
+               "Select every concept that belongs to {category} alongside the {topic}",
+               "Which of these terms describe a kind of {topic}"],
+    TRUE_FALSE: ["{A_topic} is a core concept in {category}",
+                 "The {topic} was first described in the twentieth century",
+                 "Every {topic} can be observed directly",
+                 "The {topic} is studied mainly outside of {category}"],
+    FILL_IN: ["What is the {category} term with {length} letters that starts with \"{initial}\"",
+              "Which {category} term, starting with \"{initial}\", completes the {context}",
+              "Which {length}-letter {category} term begins with \"{initial}\""],
+}
+QUALIFIERS = ["in modern practice", "according to most textbooks", "as taught in introductory courses",
+              "in the classical sense", "when studied in depth", "for most practical purposes",
+              "in everyday usage", "based on the standard definition"]
+
+
+class Distribution:
+    """Integer-valued random distribution parsed from a short spec string"""
+
+    def __init__(self, kind: str, params: List[float], low: int = 1):
+        self.kind = kind
+        self.params = params
+        self.low = low
+
+    def sample(self, rng: random.Random) -> int:
+        kind, p = self.kind, self.params
+        if kind == "const":
+            value = p[0]
+        elif kind == "uniform":
+            value = rng.randint(int(p[0]), int(p[1]))
+        elif kind == "normal":
+            value = round(rng.gauss(p[0], p[1]))
+        elif kind == "poisson":
+            value = _poisson(rng, p[0])
+        elif kind == "choice":
+            value = rng.choice(p)
+        else:
+            raise ValueError(f"Unknown distribution: {kind}")
+        return max(int(value), self.low)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{':'.join(f'{v:g}' for v in self.params)}"
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    if mean > 30:  # Normal approximation keeps large means cheap
+        return round(rng.gauss(mean, math.sqrt(mean)))
+    limit, k, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        k += 1
+        product *= rng.random()
+    return k
+
+
+def parse_distribution(spec: str, low: int = 1) -> Distribution:
+    """Parse "const:5", "uniform:5:10", "normal:8:2", "poisson:6" or "choice:1,2,3" """
+    kind, _, rest = spec.partition(":")
+    if kind == "choice":
+        params = [float(v) for v in rest.split(",")]
+    else:
+        params = [float(v) for v in rest.split(":")] if rest else []
+    expected = {"const": 1, "uniform": 2, "normal": 2, "poisson": 1}
+    if kind not in expected and kind != "choice":
+        raise ValueError(f"Unknown distribution '{kind}' in '{spec}'")
+    if (kind in expected and len(params) != expected[kind]) or not params:
+        raise ValueError(f"Bad parameters for '{spec}'")
+    return Distribution(kind, params, low)
+
+
+def parse_type_weights(spec: str) -> Dict[int, float]:
+    """Parse "SINGLE=4,MULTIPLE=2,TRUE_FALSE=2,FILL_IN=1" into {type: weight}"""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        weights[QUESTION_TYPES[name.strip().upper()]] = float(weight or 1)
+    return weights
+
+
+class CorpusConfig:
+    """Shape of the generated quizzes"""
+
+    def __init__(self, questions: str = "uniform:5:10", answers: str = "uniform:3:5",
+                 words: str = "normal:10:3", points: str = "choice:1,1,2,3",
+                 types: str = "SINGLE=4,MULTIPLE=2,TRUE_FALSE=2,FILL_IN=1",
+                 categories: Optional[List[str]] = None):
+        self.questions = parse_distribution(questions)
+        self.answers = parse_distribution(answers, low=2)  # Options per SINGLE/MULTIPLE question
+        self.words = parse_distribution(words, low=3)  # Words per question text
+        self.points = parse_distribution(points)
+        weights = parse_type_weights(types)
+        self.types = list(weights)
+        self.type_weights = list(weights.values())
+        self.categories = categories or CATEGORIES
+
+
+def _article(word: str) -> str:
+    return f"{'an' if word[0] in 'aeiou' else 'a'} {word}"
+
+
+def _sentence(rng: random.Random, template: str, words: int, **slots) -> str:
+    text = template.format(**slots)
+    qualifiers = rng.sample(QUALIFIERS, len(QUALIFIERS))
+    while len(text.split()) < words and qualifiers:
+        text += f", {qualifiers.pop()}"
+    return text
+
+
+def _options(rng: random.Random, category: str, count: int) -> List[str]:
+    pool = TOPICS[category] + TOPICS[rng.choice(CATEGORIES)]
+    picks = rng.sample(pool, min(count, len(set(pool))))
+    options, seen = [], set()
+    for word in picks:
+        text = f"{rng.choice(ADJECTIVES)} {word}" if rng.random() < 0.4 else word.capitalize()
+        if text not in seen:
+            seen.add(text)
+            options.append(text)
+    while len(options) < count:  # Tiny pools: pad with numbered options
+        options.append(f"Option {len(options) + 1}")
+    return options
+
+
+def generate_question(rng: random.Random, category: str, config: CorpusConfig) -> Dict:
+    """One question in the seed-data template format"""
+    question_type = rng.choices(config.types, config.type_weights)[0]
+    topic = rng.choice(TOPICS[category])
+    text = _sentence(rng, rng.choice(TEMPLATES[question_type]), config.words.sample(rng),
+                     topic=topic, a_topic=_article(topic), A_topic=_article(topic).capitalize(),
+                     category=category.lower(), length=len(topic), initial=topic[0].upper(),
+                     context=f"{rng.choice(ADJECTIVES).lower()} {rng.choice(TOPICS[category])} sequence")
+    if question_type == TRUE_FALSE:
+        correct = rng.random() < 0.5
+        answers = [{"text": "True", "isCorrect": correct}, {"text": "False", "isCorrect": not correct}]
+        text += "."
+    elif question_type == FILL_IN:
+        answers = [{"text": topic.capitalize(), "isCorrect": True}]
+        text += "?"
+    else:
+        options = _options(rng, category, config.answers.sample(rng))
+        correct_count = 1 if question_type == SINGLE else rng.randint(1, max(len(options) - 1, 1))
+        correct = set(rng.sample(range(len(options)), correct_count))
+        answers = [{"text": option, "isCorrect": i in correct} for i, option in enumerate(options)]
+        text += "?" if question_type == SINGLE else " (Select all that apply)"
+    question = {"text": text, "type": question_type, "answers": answers, "points": config.points.sample(rng)}
+    if question_type == FILL_IN:
+        question["isCaseSensitive"] = False
+    return question
+
+
+def generate_quiz(seed: int, index: int, config: CorpusConfig) -> Dict:
+    """Quiz number index of the corpus for seed (independent of every other quiz)"""
+    rng = random.Random(f"{seed}:{index}")
+    category = rng.choice(config.categories)
+    questions = [generate_question(rng, category, config) for _ in range(config.questions.sample(rng))]
+    title_topic = rng.choice(TOPICS[category]).capitalize()
+    return {
+        "title": f"{rng.choice(ADJECTIVES)} {category}: {title_topic} #{index + 1}",
+        "description": f"Synthetic {category.lower()} quiz about {title_topic.lower()} and related topics",
+        "category": category,
+        "difficulty": rng.randint(1, 3),
+        "timeLimitSeconds": 60 * max(5, len(questions) * 2),
+        "questions": questions,
+    }
+
+
+def generate_quizzes(count: Optional[int] = None, seed: int = 0, config: Optional[CorpusConfig] = None,
+                     start: int = 0) -> Iterator[Dict]:
+    """Lazily yield quizzes start, start+1, ... (forever when count is None)"""
+    config = config or CorpusConfig()
+    index = start
+    while count is None or index < start + count:
+        yield generate_quiz(seed, index, config)
+        index += 1
+
+
+def quiz_payload(template: Dict) -> Dict:
+    """QuizService create-quiz request body for a corpus/template quiz"""
+    return {
+        "title": template["title"],
+        "description": template["description"],
+        "category": template["category"],
+        "difficulty": template["difficulty"],
+        "timeLimitSeconds": template["timeLimitSeconds"],
+        "questions": [{
+            "text": q["text"],
+            "questionType": q["type"],
+            "points": q.get("points", 1),
+            "isCaseSensitive": q.get("isCaseSensitive", False),
+            "answers": q["answers"],
+        } for q in template["questions"]],
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser, default_seed: Optional[int] = 0):
+    """Corpus shape options shared by the scripts that use the generator"""
+    parser.add_argument("--corpus-seed", type=int, default=default_seed,
+                        help=f"Synthetic corpus seed (default: {'random' if default_seed is None else default_seed})")
+    parser.add_argument("--corpus-questions", default="uniform:5:10",
+                        help="Questions per quiz distribution (default: uniform:5:10)")
+    parser.add_argument("--corpus-answers", default="uniform:3:5",
+                        help="Options per choice question distribution (default: uniform:3:5)")
+    parser.add_argument("--corpus-words", default="normal:10:3",
+                        help="Words per question text distribution (default: normal:10:3)")
+    parser.add_argument("--corpus-points", default="choice:1,1,2,3",
+                        help="Points per question distribution (default: choice:1,1,2,3)")
+    parser.add_argument("--corpus-types", default="SINGLE=4,MULTIPLE=2,TRUE_FALSE=2,FILL_IN=1",
+                        help="Question type weights (default: SINGLE=4,MULTIPLE=2,TRUE_FALSE=2,FILL_IN=1)")
+
+
+def config_from_args(args: argparse.Namespace) -> CorpusConfig:
+    return CorpusConfig(questions=args.corpus_questions, answers=args.corpus_answers, words=args.corpus_words,
+                        points=args.corpus_points, types=args.corpus_types)
+
+
+def main():
+    """Write a corpus as JSON lines"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic QuizHub quiz corpus as JSON lines")
+    parser.add_argument("--quizzes", type=int, default=10, help="Number of quizzes (default: 10)")
+    parser.add_argument("--start", type=int, default=0, help="Index of the first quiz (for sharding)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    for quiz in generate_quizzes(args.quizzes, args.corpus_seed, config_from_args(args), start=args.start):
+        sys.stdout.write(json.dumps(quiz) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Live terminal dashboard
+Redraws once per monitor sample from the rolling window: per-operation
+throughput, error rate, latency percentiles and in-flight requests
+"""
+
+import sys
+import time
+from typing import Dict, TextIO
+
+from loadgen.monitor import Interval, Monitor
+
+CLEAR = "\033[H\033[2J"
+BOLD = "\033[1m"
+RED = "\033[0;31m"
+RESET = "\033[0m"
+
+
+def _ms(value_ns: int) -> str:
+    return f"{value_ns / 1e6:8.1f}ms"
+
+
+class Dashboard:
+    """Monitor listener that renders the rolling window as a table"""
+
+    def __init__(self, monitor: Monitor, operations: Dict[str, str], title: str = "QuizHub Stress Test",
+                 stream: TextIO = sys.stdout):
+        # operations maps histogram names to their "<prefix>_success"/"<prefix>_fail" counters
+        self.monitor = monitor
+        self.operations = operations
+        self.title = title
+        self.stream = stream
+        self.interactive = stream.isatty()
+        monitor.add_listener(self)
+
+    def __call__(self, interval: Interval):
+        self.stream.write(self.render(self.monitor.window()))
+        self.stream.flush()
+
+    def error_rate(self, window: Interval, operation: str) -> float:
+        prefix = self.operations.get(operation, operation)
+        failed = window.counters.get(f"{prefix}_fail", 0)
+        total = window.counters.get(f"{prefix}_success", 0) + failed
+        return failed / total * 100 if total else 0.0
+
+    def render(self, window: Interval) -> str:
+        elapsed = int(time.time() - self.monitor.started_at)
+        lines = [
+            f"{BOLD}{self.title} - live, last {window.seconds:.0f}s, "
+            f"{elapsed // 60:02d}:{elapsed % 60:02d} elapsed{RESET}",
+            f"{'Operation':15s} {'RPS':>8s} {'Err%':>7s} {'p50':>10s} {'p95':>10s} {'p99':>10s} {'In-flight':>10s}",
+        ]
+        total_count = total_failed = total_done = 0
+        for operation in sorted(set(window.histograms) | {op for op, n in window.in_flight.items() if n}):
+            histogram = window.histograms.get(operation)
+            error_rate = self.error_rate(window, operation)
+            color = RED if error_rate > 0 else ""
+            if histogram:
+                latency = f"{_ms(histogram.percentile_ns(50))} {_ms(histogram.percentile_ns(95))} {_ms(histogram.percentile_ns(99))}"
+                total_count += histogram.count
+            else:
+                latency = f"{'-':>10s} {'-':>10s} {'-':>10s}"
+            lines.append(f"{color}{operation:15s} {window.rate(operation):8.1f} {error_rate:6.1f}% "
+                         f"{latency} {window.in_flight.get(operation, 0):10d}{RESET if color else ''}")
+        for name, value in window.counters.items():
+            if name.endswith("_fail"):
+                total_failed += value
+            if name.endswith("_success") or name.endswith("_fail"):
+                total_done += value
+        rps = total_count / window.seconds if window.seconds else 0.0
+        error_rate = total_failed / total_done * 100 if total_done else 0.0
+        lines.append(f"{'TOTAL':15s} {rps:8.1f} {error_rate:6.1f}% "
+                     f"{'':32s} {sum(window.in_flight.values()):10d}")
+        text = "\n".join(lines) + "\n"
+        return CLEAR + text if self.interactive else text + "\n"
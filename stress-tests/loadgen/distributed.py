@@ -0,0 +1,223 @@
+"""
+Distributed load generation: one coordinator, many agents
+Agents connect over TCP and exchange newline-delimited JSON messages.
+The coordinator estimates every agent's clock offset, hands out
+configuration and a common start time, and merges the histogram
+snapshots the agents stream back
+"""
+
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+from loadgen.metrics import Snapshot
+
+DEFAULT_PORT = 7878
+STREAM_LIMIT = 64 * 1024 * 1024  # Configs carry quiz lists, snapshots carry histograms
+CLOCK_SAMPLES = 8
+SPIN_NS = 2_000_000  # Busy-wait the last 2ms before the start time
+
+
+def parse_address(address: str, default_host: str = "0.0.0.0") -> tuple:
+    """Parse "host:port", ":port" or "port" into (host, port)"""
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port or DEFAULT_PORT)
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict):
+    writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Optional[Dict]:
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+async def sleep_until_ns(target_ns: int):
+    """Sleep until a wall-clock time, finishing with a short spin for millisecond accuracy"""
+    remaining = target_ns - time.time_ns()
+    if remaining > SPIN_NS:
+        await asyncio.sleep((remaining - SPIN_NS) / 1e9)
+    while time.time_ns() < target_ns:
+        pass
+
+
+class AgentLink:
+    """Coordinator-side state for one connected agent"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, name: str):
+        self.reader = reader
+        self.writer = writer
+        self.name = name
+        self.offset_ns = 0  # Agent clock minus coordinator clock
+        self.rtt_ns = 0
+        self.snapshot = Snapshot()  # Latest cumulative snapshot
+        self.result: Optional[Dict] = None
+
+    async def request(self, message: Dict, reply: str) -> Dict:
+        await _send(self.writer, message)
+        while True:
+            response = await _receive(self.reader)
+            if response is None:
+                raise ConnectionError(f"Agent {self.name} disconnected")
+            if response["type"] == reply:
+                return response
+
+    async def sync_clock(self, samples: int = CLOCK_SAMPLES):
+        """Estimate the clock offset from the lowest round-trip ping (NTP-style)"""
+        best = None
+        for _ in range(samples):
+            sent_ns = time.time_ns()
+            pong = await self.request({"type": "ping"}, "pong")
+            received_ns = time.time_ns()
+            rtt_ns = received_ns - sent_ns
+            if best is None or rtt_ns < best[0]:
+                best = (rtt_ns, pong["time_ns"] - (sent_ns + received_ns) // 2)
+        self.rtt_ns, self.offset_ns = best
+
+
+class Coordinator:
+    """Accepts agents, starts them together and merges their reports"""
+
+    def __init__(self, host: str, port: int, expected_agents: int, interval: float = 5.0):
+        self.host = host
+        self.port = port
+        self.expected_agents = expected_agents
+        self.interval = interval
+        self.agents: List[AgentLink] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._all_connected = asyncio.Event()
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = await _receive(reader)
+        if not hello or hello.get("type") != "hello" or len(self.agents) >= self.expected_agents:
+            writer.close()
+            return
+        self.agents.append(AgentLink(reader, writer, hello.get("name", f"agent-{len(self.agents) + 1}")))
+        if len(self.agents) == self.expected_agents:
+            self._all_connected.set()
+
+    async def wait_for_agents(self, timeout: Optional[float] = None):
+        """Listen until every expected agent has said hello"""
+        self._server = await asyncio.start_server(self._on_connect, self.host, self.port, limit=STREAM_LIMIT)
+        await asyncio.wait_for(self._all_connected.wait(), timeout)
+
+    async def configure(self, configs: List[Dict]):
+        """Send each agent its configuration and wait until all report ready"""
+        await asyncio.gather(*(
+            agent.request({"type": "config", "config": config}, "ready")
+            for agent, config in zip(self.agents, configs)
+        ))
+
+    async def start(self, lead: float = 1.0) -> int:
+        """Sync clocks and tell every agent to start at the same instant (coordinator clock ns)"""
+        await asyncio.gather(*(agent.sync_clock() for agent in self.agents))
+        max_rtt_ns = max(agent.rtt_ns for agent in self.agents)
+        start_ns = time.time_ns() + int(lead * 1e9) + max_rtt_ns
+        for agent in self.agents:
+            await _send(agent.writer, {"type": "start", "start_ns": start_ns + agent.offset_ns})
+        return start_ns
+
+    async def _follow(self, agent: AgentLink):
+        while True:
+            message = await _receive(agent.reader)
+            if message is None:
+                return
+            if message["type"] in ("snapshot", "done"):
+                agent.snapshot = Snapshot.from_bytes(message["snapshot"].encode("utf-8"))
+            if message["type"] == "done":
+                agent.result = message["stats"]
+                return
+
+    async def collect(self, on_progress: Optional[Callable[[Snapshot], None]] = None) -> Snapshot:
+        """Follow agent snapshots until all are done, then return the merged snapshot"""
+        followers = asyncio.gather(*(self._follow(agent) for agent in self.agents))
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(followers), self.interval)
+                break
+            except asyncio.TimeoutError:
+                if on_progress:
+                    on_progress(self.merged())
+        return self.merged()
+
+    def merged(self) -> Snapshot:
+        snapshot = Snapshot()
+        for agent in self.agents:
+            snapshot.merge(agent.snapshot)
+        return snapshot
+
+    async def close(self):
+        for agent in self.agents:
+            agent.writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class Agent:
+    """Agent-side connection to the coordinator"""
+
+    def __init__(self, host: str, port: int, name: str):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self, retry_for: float = 30.0):
+        """Connect and say hello, retrying while the coordinator is not yet listening"""
+        deadline = time.monotonic() + retry_for
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.5)
+        await _send(self.writer, {"type": "hello", "name": self.name})
+
+    async def _expect(self, kind: str) -> Dict:
+        """Wait for a message of the given type, answering clock pings meanwhile"""
+        while True:
+            message = await _receive(self.reader)
+            if message is None:
+                raise ConnectionError("Coordinator closed the connection")
+            if message["type"] == "ping":
+                await _send(self.writer, {"type": "pong", "time_ns": time.time_ns()})
+            elif message["type"] == kind:
+                return message
+
+    async def receive_config(self) -> Dict:
+        return (await self._expect("config"))["config"]
+
+    async def ready(self):
+        await _send(self.writer, {"type": "ready"})
+
+    async def wait_for_start(self) -> int:
+        """Block until the coordinator's start time; returns how late we actually started (ns)"""
+        start_ns = (await self._expect("start"))["start_ns"]
+        await sleep_until_ns(start_ns)
+        return time.time_ns() - start_ns
+
+    async def report(self, snapshot: Snapshot):
+        await _send(self.writer, {"type": "snapshot", "snapshot": snapshot.to_bytes().decode("utf-8")})
+
+    async def report_every(self, interval: float, snapshot: Callable[[], Snapshot]):
+        """Stream cumulative snapshots until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.report(snapshot())
+
+    async def finish(self, snapshot: Snapshot, stats: Dict):
+        await _send(self.writer, {
+            "type": "done",
+            "snapshot": snapshot.to_bytes().decode("utf-8"),
+            "stats": stats,
+        })
+        self.writer.close()
@@ -0,0 +1,72 @@
+"""
+Asyncio load engine
+One event loop per process, every virtual user is a coroutine
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def raise_open_file_limit():
+    """Raise the soft file descriptor limit so every in-flight request can own a socket"""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def run(main: Callable[[], Awaitable[Any]]) -> Any:
+    """Run the main coroutine on a fresh event loop (uvloop when installed)"""
+    raise_open_file_limit()
+    if uvloop is not None:
+        return uvloop.run(main())
+    return asyncio.run(main())
+
+
+async def run_virtual_users(user_coro: Callable[..., Awaitable[Any]],
+                            user_args: Iterable[tuple],
+                            max_in_flight: int,
+                            keep_results: bool = True) -> List[Any]:
+    """Run one coroutine per virtual user, at most max_in_flight of them at once
+
+    A fixed set of workers pulls users from the iterable as earlier ones
+    finish, so only the running users exist as coroutines. The returned
+    list still holds one result per user; pass keep_results=False to drop
+    them (and get an empty list) so millions of users cost no more memory
+    than max_in_flight of them. When a user raises, the other workers are
+    cancelled and the exception propagates
+    """
+    results: List[Any] = []
+    pending = enumerate(user_args)
+
+    async def worker():
+        for index, args in pending:
+            if not keep_results:
+                await user_coro(*args)
+                continue
+            results.append(None)
+            results[index] = await user_coro(*args)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(max_in_flight, 1))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+    return results
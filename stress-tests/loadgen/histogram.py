@@ -0,0 +1,178 @@
+"""
+Fixed-memory log-bucketed latency histogram (HDR histogram layout)
+Values are bucketed by power of two with SUB_BUCKETS linear sub-buckets
+each, so every recorded value keeps 1.6% relative precision no matter how
+many samples a run produces
+"""
+
+import struct
+from array import array
+from typing import Iterator, Tuple
+
+SUB_BUCKET_BITS = 7           # 64 buckets per power of two -> <= 1.6% relative bucket width
+UNIT_NS = 1000                # Resolution: 1 microsecond
+MAX_MAGNITUDE = 36            # Track up to 2^36 us (~19 hours)
+
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+BUCKET_COUNT = _SUB_BUCKETS + (MAX_MAGNITUDE - SUB_BUCKET_BITS + 1) * _HALF
+_MAX_UNITS = (1 << MAX_MAGNITUDE) - 1
+_HEADER = struct.Struct("<QQQQ")  # count, total_ns, min_ns, max_ns
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def bucket_index(units: int) -> int:
+    """Bucket holding a value expressed in UNIT_NS units"""
+    if units < _SUB_BUCKETS:
+        return units
+    if units > _MAX_UNITS:
+        units = _MAX_UNITS
+    shift = units.bit_length() - SUB_BUCKET_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF + ((units >> shift) - _HALF)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """[low, high) range of a bucket in UNIT_NS units"""
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    shift = (index - _SUB_BUCKETS) // _HALF + 1
+    mantissa = (index - _SUB_BUCKETS) % _HALF + _HALF
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """Latency histogram in nanoseconds with constant memory"""
+
+    __slots__ = ("counts", "count", "total_ns", "min_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+
+    def record(self, value_ns: int):
+        value_ns = int(value_ns)
+        if value_ns < 0:
+            value_ns = 0
+        self.counts[bucket_index(value_ns // UNIT_NS)] += 1
+        if self.count == 0 or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        self.count += 1
+        self.total_ns += value_ns
+
+    def merge(self, other: "Histogram"):
+        """Add another histogram's samples into this one"""
+        if not other.count:
+            return
+        counts = self.counts
+        for index, n in other.nonzero():
+            counts[index] += n
+        if self.count == 0 or other.min_ns < self.min_ns:
+            self.min_ns = other.min_ns
+        if other.max_ns > self.max_ns:
+            self.max_ns = other.max_ns
+        self.count += other.count
+        self.total_ns += other.total_ns
+
+    def copy(self) -> "Histogram":
+        clone = Histogram()
+        clone.counts = array("Q", self.counts)
+        clone.count = self.count
+        clone.total_ns = self.total_ns
+        clone.min_ns = self.min_ns
+        clone.max_ns = self.max_ns
+        return clone
+
+    def delta(self, earlier: "Histogram") -> "Histogram":
+        """Samples recorded since an earlier copy of this histogram"""
+        result = Histogram()
+        counts, earlier_counts = result.counts, earlier.counts
+        first = last = None
+        for index, n in self.nonzero():
+            n -= earlier_counts[index]
+            if n:
+                counts[index] = n
+                if first is None:
+                    first = index
+                last = index
+        result.count = self.count - earlier.count
+        result.total_ns = self.total_ns - earlier.total_ns
+        if first is not None:
+            # Exact extremes of the interval are unknown, bucket edges bound them
+            result.min_ns = max(bucket_bounds(first)[0] * UNIT_NS, self.min_ns)
+            result.max_ns = min(bucket_bounds(last)[1] * UNIT_NS - 1, self.max_ns)
+        return result
+
+    def nonzero(self) -> Iterator[Tuple[int, int]]:
+        """(bucket index, count) pairs for every populated bucket"""
+        for index, n in enumerate(self.counts):
+            if n:
+                yield index, n
+
+    def to_bytes(self) -> bytes:
+        """Compact encoding: header plus delta-encoded (index, count) varints"""
+        out = bytearray(_HEADER.pack(self.count, self.total_ns, self.min_ns, self.max_ns))
+        previous = 0
+        for index, n in self.nonzero():
+            _write_varint(out, index - previous)
+            _write_varint(out, n)
+            previous = index
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Histogram":
+        histogram = cls()
+        histogram.count, histogram.total_ns, histogram.min_ns, histogram.max_ns = _HEADER.unpack_from(data)
+        pos = _HEADER.size
+        index = 0
+        while pos < len(data):
+            delta, pos = _read_varint(data, pos)
+            n, pos = _read_varint(data, pos)
+            index += delta
+            histogram.counts[index] = n
+        return histogram
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile_ns(self, q: float) -> int:
+        """Value at the q-th percentile (upper edge of its bucket, clamped to min/max)"""
+        if not self.count:
+            return 0
+        if q >= 100:
+            return self.max_ns
+        target = max(int(self.count * q / 100 + 0.5), 1)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= target:
+                    high_ns = bucket_bounds(index)[1] * UNIT_NS - 1
+                    return max(min(high_ns, self.max_ns), self.min_ns)
+        return self.max_ns
+
+    def percentile(self, q: float) -> float:
+        """Value at the q-th percentile in seconds"""
+        return self.percentile_ns(q) / 1e9
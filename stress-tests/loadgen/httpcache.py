@@ -0,0 +1,121 @@
+"""
+Client-side response cache
+Models the cache of a browser running the frontend: a response younger
+than the TTL is reused without a request, a stale one is revalidated with
+If-None-Match when the server sent an ETag (a 304 keeps the cached body)
+and refetched otherwise, and the least recently used entries are evicted
+once a cache holds more than its size. Each virtual user gets its own
+cache, or all users share one to model a caching proxy in front of the
+gateway
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+CACHE_TTL = 300.0  # Seconds a response is reused without asking the server
+CACHE_SIZE = 50  # Responses kept per cache before the least recently used is evicted
+SCOPES = ("user", "shared")
+
+# Outcomes of a lookup
+HIT = "hit"  # Fresh entry, no request
+MISS = "miss"  # No entry, plain request
+STALE = "stale"  # Entry past its TTL, conditional request when it has an ETag
+
+
+class Entry:
+    """A cached response body, its ETag and when the server last vouched for it"""
+
+    __slots__ = ("body", "etag", "stored_at")
+
+    def __init__(self, body: bytes, etag: Optional[str], stored_at: float):
+        self.body = body
+        self.etag = etag
+        self.stored_at = stored_at
+
+
+class ResponseCache:
+    """One client's responses by key, fresh for ttl seconds, at most size of them"""
+
+    def __init__(self, ttl: float = CACHE_TTL, size: int = CACHE_SIZE, bodies: Optional[Dict] = None):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        # Identical bodies cached by many users are stored once
+        self._bodies: Dict[str, bytes] = {} if bodies is None else bodies
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str, now: Optional[float] = None) -> Tuple[str, Optional[Entry]]:
+        """Outcome (HIT, MISS or STALE) and the entry, marked as most recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISS, None
+        self._entries.move_to_end(key)
+        now = time.monotonic() if now is None else now
+        return (HIT if now - entry.stored_at < self.ttl else STALE), entry
+
+    def store(self, key: str, body: bytes, etag: Optional[str] = None, now: Optional[float] = None) -> int:
+        """Cache a full response; returns how many least recently used entries were evicted"""
+        shared = self._bodies.get(key)
+        if shared == body:
+            body = shared
+        else:
+            self._bodies[key] = body
+        self._entries[key] = Entry(body, etag, time.monotonic() if now is None else now)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def revalidated(self, entry: Entry, now: Optional[float] = None):
+        """The server answered 304: the cached body is fresh again"""
+        entry.stored_at = time.monotonic() if now is None else now
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+
+class CacheGroup:
+    """The caches of every virtual user, or the one cache they all share"""
+
+    def __init__(self, ttl: float = CACHE_TTL, size: int = CACHE_SIZE, scope: str = "user"):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown cache scope '{scope}', expected one of {', '.join(SCOPES)}")
+        self.ttl = ttl
+        self.size = size
+        self.scope = scope
+        self._bodies: Dict[str, bytes] = {}
+        self._caches: Dict[str, ResponseCache] = {}
+        self._shared = ResponseCache(ttl, size, self._bodies) if scope == "shared" else None
+
+    def __len__(self) -> int:
+        return 1 if self._shared is not None else len(self._caches)
+
+    def for_user(self, username: str) -> ResponseCache:
+        if self._shared is not None:
+            return self._shared
+        cache = self._caches.get(username)
+        if cache is None:
+            cache = self._caches[username] = ResponseCache(self.ttl, self.size, self._bodies)
+        return cache
+
+
+def conditional_headers(entry: Optional[Entry]) -> Dict[str, str]:
+    """If-None-Match for a stale entry the server gave an ETag, nothing otherwise"""
+    return {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+
+
+def summary(counters: Dict[str, int], prefix: str) -> Optional[str]:
+    """Hit ratio line from the <prefix>_hit/_miss/_stale/_revalidated/_evicted counters, None when unused"""
+    hits, misses, stale = (counters.get(f"{prefix}_{name}", 0) for name in (HIT, MISS, STALE))
+    lookups = hits + misses + stale
+    if not lookups:
+        return None
+    revalidated = counters.get(f"{prefix}_revalidated", 0)
+    evicted = counters.get(f"{prefix}_evicted", 0)
+    return (f"{hits / lookups:.1%} hits ({hits} hits, {misses} misses, {stale} stale of which "
+            f"{revalidated} revalidated with 304, {evicted} evicted)")
@@ -0,0 +1,94 @@
+"""
+Checkpoint journal for resumable seeding
+Every completed item is appended as one JSON line (kind, key, id) and the
+file is fsynced in batches, so an interrupted seed loses at most the last
+unsynced batch. Reopening the journal replays it, letting a rerun skip
+work that already finished
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Tuple
+
+FSYNC_EVERY = 20  # Records between fsyncs
+
+
+def template_hash(template: Dict) -> str:
+    """Stable content hash of a quiz template (key order does not matter)"""
+    canonical = json.dumps(template, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class Journal:
+    """Append-only record of completed items, keyed by (kind, key)"""
+
+    def __init__(self, path: str, fsync_every: int = FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.entries: Dict[Tuple[str, str], Any] = {}
+        self.replayed = 0
+        self._pending = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        needs_newline = self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            # Terminate a line torn by a crash so the next record starts cleanly
+            self._file.write("\n")
+
+    def _replay(self) -> bool:
+        """Load existing records; returns True if the file ends mid-line"""
+        if not os.path.exists(self.path):
+            return False
+        last = ""
+        with open(self.path, encoding="utf-8") as f:
+            for last in f:
+                try:
+                    record = json.loads(last)
+                    self.entries[(record["kind"], record["key"])] = record["id"]
+                    self.replayed += 1
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn final write
+        return bool(last) and not last.endswith("\n")
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        return item in self.entries
+
+    def get(self, kind: str, key: str, default: Any = None) -> Any:
+        return self.entries.get((kind, key), default)
+
+    def items(self, kind: str) -> Iterator[Tuple[str, Any]]:
+        for (entry_kind, key), value in self.entries.items():
+            if entry_kind == kind:
+                yield key, value
+
+    def record(self, kind: str, key: str, value: Any):
+        self.entries[(kind, key)] = value
+        self._file.write(json.dumps({"kind": kind, "key": key, "id": value}) + "\n")
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def default_path(directory: str, name: str, target: str) -> str:
+    """Journal path for one script against one gateway (IDs are only valid there)"""
+    host = target.split("://", 1)[-1].rstrip("/").replace(":", "_").replace("/", "_")
+    return os.path.join(directory, f"{name}-{host}.journal")
@@ -0,0 +1,64 @@
+"""
+Run manifest of created test data
+Every entity a stress run creates (users, quizzes, results) is appended
+as one JSON line as soon as the backend confirms it, so even a crashed run
+leaves a complete list for loadgen.teardown to delete
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+USER = "user"
+QUIZ = "quiz"
+RESULT = "result"
+
+
+class Manifest:
+    """Thread-safe, line-buffered writer of created entity IDs"""
+
+    def __init__(self, path: str, gateway: str, **details):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8", buffering=1)
+        self._write({"kind": "run", "gateway": gateway, "started": time.time(), **details})
+
+    def _write(self, record: Dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def add(self, kind: str, entity_id: str, **details):
+        if entity_id:
+            self._write({"kind": kind, "id": entity_id, **details})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_manifest(path: str) -> Tuple[Dict, Dict[str, List[Dict]]]:
+    """Run header and the created entities by kind, in creation order; later records of an ID update it"""
+    header: Dict = {}
+    entities: Dict[str, List[Dict]] = {USER: [], QUIZ: [], RESULT: []}
+    seen: Dict[Tuple[str, str], Dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final write of a crashed run
+            kind = record.get("kind")
+            if kind == "run":
+                header = record
+            elif (kind, record.get("id")) in seen:
+                seen[kind, record.get("id")].update(record)
+            else:
+                seen[kind, record.get("id")] = record
+                entities.setdefault(kind, []).append(record)
+    return header, entities
@@ -0,0 +1,160 @@
+"""
+Metrics store for the stress tests
+Every thread (and so every asyncio event loop) writes to its own Recorder
+without locking; reports merge the recorders into a Snapshot
+"""
+
+import base64
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from loadgen.histogram import Histogram
+
+
+class Recorder:
+    """Counters and latency histograms owned by a single thread"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = {}
+        self.corrected: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.received: Dict[str, int] = defaultdict(int)  # Response bytes per operation
+        self.statuses: Dict[Tuple[str, int], int] = defaultdict(int)  # (operation, HTTP status; 0 = no response)
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def begin(self, operation: str):
+        self.in_flight[operation] += 1
+
+    def end(self, operation: str):
+        self.in_flight[operation] -= 1
+
+    def record(self, operation: str, duration_ns: int, corrected_ns: Optional[int] = None,
+               received: int = 0, status: Optional[int] = None):
+        """Record a response time; corrected_ns defaults to the raw value"""
+        if received:
+            self.received[operation] += received
+        if status is not None:
+            self.statuses[operation, status] += 1
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = Histogram()
+            self.corrected[operation] = Histogram()
+        histogram.record(duration_ns)
+        self.corrected[operation].record(duration_ns if corrected_ns is None else corrected_ns)
+
+
+class Snapshot:
+    """Merged view of one or more recorders"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = {}
+        self.corrected: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.received: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[Tuple[str, int], int] = defaultdict(int)
+
+    def merge(self, other):
+        """Fold a Recorder or another Snapshot into this snapshot"""
+        for name, value in dict(other.counters).items():
+            self.counters[name] += value
+        for operation, value in dict(other.in_flight).items():
+            self.in_flight[operation] += value
+        for operation, value in dict(other.received).items():
+            self.received[operation] += value
+        for key, value in dict(other.statuses).items():
+            self.statuses[key] += value
+        for target, source in ((self.histograms, other.histograms), (self.corrected, other.corrected)):
+            for operation, histogram in dict(source).items():
+                if operation in target:
+                    target[operation].merge(histogram)
+                else:
+                    target[operation] = histogram.copy()
+        return self
+
+    def operations(self) -> List[str]:
+        return sorted(self.histograms)
+
+    def to_bytes(self) -> bytes:
+        """Compact, pickle-free encoding for shipping snapshots between processes and hosts"""
+        def encode(histograms):
+            return {op: base64.b64encode(h.to_bytes()).decode("ascii") for op, h in histograms.items()}
+        return json.dumps({
+            "counters": dict(self.counters),
+            "in_flight": dict(self.in_flight),
+            "received": dict(self.received),
+            "statuses": [[operation, status, n] for (operation, status), n in self.statuses.items()],
+            "histograms": encode(self.histograms),
+            "corrected": encode(self.corrected),
+        }, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Snapshot":
+        payload = json.loads(data)
+        snapshot = cls()
+        snapshot.counters.update(payload["counters"])
+        snapshot.in_flight.update(payload.get("in_flight", {}))
+        snapshot.received.update(payload.get("received", {}))
+        for operation, status, n in payload.get("statuses", []):
+            snapshot.statuses[operation, status] = n
+        for target, key in ((snapshot.histograms, "histograms"), (snapshot.corrected, "corrected")):
+            for op, encoded in payload[key].items():
+                target[op] = Histogram.from_bytes(base64.b64decode(encoded))
+        return snapshot
+
+
+class MetricsStore:
+    """Hands each thread its own Recorder; only registration takes a lock"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._recorders: List[Recorder] = []
+        self._absorbed: List[Snapshot] = []
+        self._lock = threading.Lock()
+
+    def recorder(self) -> Recorder:
+        recorder = getattr(self._local, "recorder", None)
+        if recorder is None:
+            recorder = self._local.recorder = Recorder()
+            with self._lock:
+                self._recorders.append(recorder)
+        return recorder
+
+    def incr(self, name: str, value: int = 1):
+        self.recorder().incr(name, value)
+
+    def record(self, operation: str, duration_ns: int, corrected_ns: Optional[int] = None,
+               received: int = 0, status: Optional[int] = None):
+        self.recorder().record(operation, duration_ns, corrected_ns, received, status)
+
+    def begin(self, operation: str):
+        """Count an operation as in flight until the matching end()"""
+        self.recorder().begin(operation)
+
+    def end(self, operation: str):
+        self.recorder().end(operation)
+
+    def absorb(self, snapshot: Snapshot):
+        """Include a snapshot produced elsewhere (another process or host) in every report"""
+        with self._lock:
+            self._absorbed.append(snapshot)
+
+    def snapshot(self) -> Snapshot:
+        with self._lock:
+            sources = list(self._recorders) + list(self._absorbed)
+        snapshot = Snapshot()
+        for source in sources:
+            snapshot.merge(source)
+        return snapshot
+
+
+def format_latency(histogram: Histogram) -> str:
+    """One-line latency summary in seconds"""
+    return (f"avg={histogram.mean_ns / 1e9:6.3f}s  p50={histogram.percentile(50):.3f}s  "
+            f"p90={histogram.percentile(90):.3f}s  p99={histogram.percentile(99):.3f}s  "
+            f"p99.9={histogram.percentile(99.9):.3f}s  max={histogram.max_ns / 1e9:.3f}s")
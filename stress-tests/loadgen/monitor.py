@@ -0,0 +1,121 @@
+"""
+Live metrics sampling
+A background thread diffs cumulative snapshots once per interval, so
+listeners (dashboard, exporters) see per-interval and rolling-window
+numbers without adding any work to the request path
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from loadgen.histogram import Histogram
+from loadgen.metrics import Snapshot
+
+
+class Interval:
+    """What happened between two samples (or across a window of them)"""
+
+    def __init__(self, started_at: float, seconds: float):
+        self.started_at = started_at  # Unix time
+        self.seconds = seconds
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)  # At the end of the interval
+        self.received: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def between(cls, earlier: Snapshot, later: Snapshot, started_at: float, seconds: float) -> "Interval":
+        interval = cls(started_at, seconds)
+        for name, value in later.counters.items():
+            delta = value - earlier.counters.get(name, 0)
+            if delta:
+                interval.counters[name] = delta
+        empty = Histogram()
+        for operation, histogram in later.histograms.items():
+            delta = histogram.delta(earlier.histograms.get(operation, empty))
+            if delta.count:
+                interval.histograms[operation] = delta
+        for operation, value in later.received.items():
+            delta = value - earlier.received.get(operation, 0)
+            if delta:
+                interval.received[operation] = delta
+        interval.in_flight.update(later.in_flight)
+        return interval
+
+    def absorb(self, other: "Interval"):
+        """Extend this interval with the next one"""
+        self.seconds += other.seconds
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        for operation, histogram in other.histograms.items():
+            if operation in self.histograms:
+                self.histograms[operation].merge(histogram)
+            else:
+                self.histograms[operation] = histogram.copy()
+        for operation, value in other.received.items():
+            self.received[operation] += value
+        self.in_flight = other.in_flight
+
+    def rate(self, operation: str) -> float:
+        histogram = self.histograms.get(operation)
+        if not histogram or self.seconds <= 0:
+            return 0.0
+        return histogram.count / self.seconds
+
+
+class Monitor:
+    """Samples a snapshot source every interval and feeds listeners from a sampler thread"""
+
+    def __init__(self, source: Callable[[], Snapshot], interval: float = 1.0, window: int = 10):
+        self.source = source
+        self.interval = interval
+        self.started_at = time.time()
+        self.latest: Optional[Interval] = None
+        self._intervals: Deque[Interval] = deque(maxlen=window)
+        self._listeners: List[Callable[[Interval], None]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-monitor", daemon=True)
+
+    def add_listener(self, listener: Callable[[Interval], None]):
+        """listener(interval) is called from the sampler thread after every sample"""
+        self._listeners.append(listener)
+
+    def start(self) -> "Monitor":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling after one last sample, so listeners see the tail of the run"""
+        self._stop.set()
+        self._thread.join()
+        for listener in self._listeners:
+            close = getattr(listener, "close", None)
+            if close:
+                close()
+
+    def window(self) -> Interval:
+        """Rolling window made of the most recent intervals"""
+        intervals = list(self._intervals)
+        if not intervals:
+            return Interval(time.time(), 0.0)
+        window = Interval(intervals[0].started_at, 0.0)
+        for interval in intervals:
+            window.absorb(interval)
+        return window
+
+    def _run(self):
+        previous = self.source()
+        previous_at, previous_clock = time.time(), time.monotonic()
+        stopping = False
+        while not stopping:
+            stopping = self._stop.wait(self.interval)
+            current = self.source()
+            now, clock = time.time(), time.monotonic()
+            interval = Interval.between(previous, current, previous_at, clock - previous_clock)
+            self._intervals.append(interval)
+            self.latest = interval
+            for listener in self._listeners:
+                listener(interval)
+            previous, previous_at, previous_clock = current, now, clock
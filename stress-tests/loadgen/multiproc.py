@@ -0,0 +1,70 @@
+"""
+Multi-process load generation
+Each worker process runs its own share of virtual users (and its own
+event loop or thread pool) and ships back a compact metrics snapshot;
+while they run, workers can stream reports to the parent through a queue
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+_reports = None  # Queue to the parent, set in workers of a run_workers with on_report
+
+
+def split(total: int, parts: int) -> List[int]:
+    """Split total into parts near-equal integer shares"""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def split_list(items: Sequence[Any], parts: int) -> List[List[Any]]:
+    """Deal items round-robin into parts lists"""
+    return [list(items[i::parts]) for i in range(parts)]
+
+
+def _set_reports(queue):
+    global _reports
+    _reports = queue
+
+
+def reporting() -> bool:
+    """Whether this worker's parent listens to report()"""
+    return _reports is not None
+
+
+def report(key: Any, data: Any):
+    """Send a report from a worker to the parent's on_report(key, data); dropped when nobody listens"""
+    if _reports is not None:
+        _reports.put((key, data))
+
+
+def run_workers(target: Callable[[Any], Any], shares: Sequence[Any],
+                on_report: Optional[Callable[[Any, Any], None]] = None) -> List[Any]:
+    """Run target(share) in one process per share; results come back in share order
+
+    With on_report, reports the workers send while running are handed to it
+    on a background thread of this process, all of them before this returns
+    """
+    # Spawn, not fork: a forked child would share the parent's epoll instance and
+    # keep-alive sockets, and tearing them down there breaks the parent's event loop
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue() if on_report else None
+    receiver = None
+    if queue is not None:
+        def receive():
+            while (item := queue.get()) is not None:
+                on_report(*item)
+
+        receiver = threading.Thread(target=receive, name="worker-reports", daemon=True)
+        receiver.start()
+    try:
+        with ProcessPoolExecutor(max_workers=len(shares), mp_context=context,
+                                 initializer=_set_reports, initargs=(queue,)) as pool:
+            return list(pool.map(target, shares))
+    finally:
+        if queue is not None:
+            # Workers flush their queue on exit, so the sentinel arrives after their last report
+            queue.put(None)
+            receiver.join()
@@ -0,0 +1,169 @@
+"""
+Pre-encoded request bodies
+Answer keys and JSON byte templates are built once, before the measured
+phase, so the hot loop only picks a template and splices pre-encoded
+fragments into it: no dicts are built and json.dumps is never called per
+request. A template is encoded once with named holes (Slot) and filled
+with a single bytes join
+"""
+
+import json
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loadgen import corpus
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+VARIANTS = 32  # Pre-drawn answer sheets per quiz
+MARKER = "\x00"
+
+
+def encode(value) -> bytes:
+    """Compact JSON bytes, as sent on the wire"""
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class Slot:
+    """A hole in a BodyTemplate, filled with pre-encoded JSON bytes"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class BodyTemplate:
+    """A JSON body encoded once, with Slot values left as holes"""
+
+    def __init__(self, payload: Dict):
+        names: List[str] = []
+
+        def mark(value):
+            if isinstance(value, Slot):
+                names.append(value.name)
+                return f"{MARKER}{value.name}{MARKER}"
+            if isinstance(value, dict):
+                return {key: mark(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [mark(item) for item in value]
+            return value
+
+        encoded = encode(mark(payload))
+        self.parts: List[bytes] = []
+        self.slots: List[str] = []
+        for name in names:
+            hole = encode(f"{MARKER}{name}{MARKER}")
+            before, _, encoded = encoded.partition(hole)
+            self.parts.append(before)
+            self.slots.append(name)
+        self.parts.append(encoded)
+
+    def fill(self, *values: bytes) -> bytes:
+        """Body with the slots, in payload order, replaced by values"""
+        pieces = [self.parts[0]]
+        for value, part in zip(values, self.parts[1:]):
+            pieces.append(value)
+            pieces.append(part)
+        return b"".join(pieces)
+
+
+def answer_key(quiz: Dict) -> List[Tuple[str, float, Optional[str], List[Tuple[str, float]]]]:
+    """(question id, points, correct answer, [(wrong answer, points it earns)]) per question of a quiz
+
+    Choice questions are answered by answer ID, every correct ID joined
+    with "," for multiple choice, where leaving one out still earns its
+    share of the points; true/false and fill-in questions by answer text
+    """
+    key = []
+    for question in quiz.get("questions") or []:
+        options = question.get("answers") or []
+        kind = question.get("questionType", corpus.SINGLE)
+        kind = corpus.QUESTION_TYPES.get(kind, kind)
+        points = float(question.get("points") or 1)
+        field = "id" if kind in (corpus.SINGLE, corpus.MULTIPLE) else "text"
+        right = [str(a[field]) for a in options if a.get("isCorrect")]
+        wrong = [(str(a[field]), 0.0) for a in options if not a.get("isCorrect")]
+        if kind == corpus.MULTIPLE and len(right) > 1:
+            wrong.append((",".join(right[:-1]), round(points / len(right) * (len(right) - 1), 2)))
+        correct = ",".join(right) if kind == corpus.MULTIPLE else next(iter(right), None)
+        key.append((question.get("id"), points, correct or None, wrong))
+    return key
+
+
+class SubmissionPool:
+    """Result submission bodies per quiz, pre-encoded from each quiz's answer key
+
+    Every quiz gets VARIANTS answer sheets, each answering a question right
+    with probability correct_ratio, and the score that sheet earns; a
+    submission picks a sheet and a time taken and joins the fragments
+    """
+
+    def __init__(self, correct_ratio: float, variants: int = VARIANTS, seed: Optional[int] = None):
+        self.correct_ratio = correct_ratio
+        self.variants = variants
+        self._rng = random.Random(seed)
+        self._quizzes: Dict[str, Tuple[BodyTemplate, List[Tuple[bytes, bytes]], List[bytes]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._quizzes)
+
+    def __contains__(self, quiz_id) -> bool:
+        return quiz_id in self._quizzes
+
+    def add(self, quiz: Dict) -> bool:
+        """Precompute the bodies of a quiz with questions (create or with-questions response)"""
+        quiz_id = quiz.get("id")
+        key = answer_key(quiz)
+        if not quiz_id or not key:
+            return False
+        template = BodyTemplate({"quizId": quiz_id, "score": Slot("score"),
+                                 "timeTakenSeconds": Slot("time"), "answers": Slot("answers")})
+        rng = self._rng
+        sheets = []
+        for _ in range(self.variants):
+            answers, earned = [], 0.0
+            for question_id, points, right, wrong in key:
+                if right is not None and rng.random() < self.correct_ratio:
+                    given, awarded = right, points
+                else:
+                    given, awarded = rng.choice(wrong) if wrong else ("Wrong", 0.0)
+                earned += awarded
+                answers.append({"questionId": question_id, "givenAnswer": given})
+            maximum = sum(points for _, points, _, _ in key)
+            sheets.append((encode(round(earned / maximum * 100, 2)), encode(answers)))
+        times = [encode(seconds) for seconds in range(60, min(600, len(key) * 60) + 1)]
+        self._quizzes[quiz_id] = (template, sheets, times)
+        return True
+
+    def add_body(self, body: bytes) -> bool:
+        """Precompute from an undecoded response body; false when it holds no questions"""
+        try:
+            quiz = json.loads(body)
+        except ValueError:
+            return False
+        return isinstance(quiz, dict) and self.add(quiz)
+
+    def body(self, quiz_id: str, rng=random) -> Optional[bytes]:
+        """A submission for a known quiz, None for one never added"""
+        entry = self._quizzes.get(quiz_id)
+        if entry is None:
+            return None
+        template, sheets, times = entry
+        score, answers = rng.choice(sheets)
+        return template.fill(score, rng.choice(times), answers)
+
+
+class QuizPool:
+    """Create-quiz bodies encoded up front, titled uniquely at send time"""
+
+    def __init__(self, payloads: Iterable[Dict]):
+        self._templates: List[Tuple[BodyTemplate, bytes]] = []
+        for payload in payloads:
+            # The title stays open so a random suffix and the closing quote can be joined on
+            title = encode(payload["title"] + " ")[:-1]
+            self._templates.append((BodyTemplate({**payload, "title": Slot("title")}), title))
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def body(self, rng=random) -> bytes:
+        template, title = rng.choice(self._templates)
+        return template.fill(b"%s%04x\"" % (title, rng.getrandbits(16)))
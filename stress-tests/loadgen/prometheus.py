@@ -0,0 +1,158 @@
+"""
+Prometheus exposition endpoint for the load generator
+Serves the client-side view of a run (request counters, latency
+histograms, responses by status code, arrival rates) in the Prometheus
+text format from a background HTTP server thread
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from loadgen.histogram import UNIT_NS, Histogram, bucket_bounds
+from loadgen.metrics import Snapshot
+
+DEFAULT_PORT = 9464
+# Prometheus client defaults, so client and server histograms line up in Grafana
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (help text, value callable)
+MetricFunctions = Dict[str, Tuple[str, Callable[[], float]]]
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class RateMeter:
+    """Per-second rate of a monotonically increasing counter between calls"""
+
+    def __init__(self, counter: Callable[[], float]):
+        self.counter = counter
+        self._last = (time.monotonic(), counter())
+        self._rate = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> float:
+        with self._lock:
+            now, value = time.monotonic(), self.counter()
+            last_at, last_value = self._last
+            if now - last_at >= 0.5:
+                self._rate = max(value - last_value, 0) / (now - last_at)
+                self._last = (now, value)
+            return self._rate
+
+
+def histogram_lines(name: str, labels: str, histogram: Histogram, buckets: Sequence[float]) -> List[str]:
+    """Cumulative le-buckets for one histogram (an HDR bucket counts towards the first le its upper edge fits)"""
+    limits_ns = [b * 1e9 for b in buckets]
+    cumulative = [0] * len(buckets)
+    for index, n in histogram.nonzero():
+        high_ns = bucket_bounds(index)[1] * UNIT_NS
+        for i, limit in enumerate(limits_ns):
+            if high_ns <= limit:
+                cumulative[i] += n
+                break
+    lines, running = [], 0
+    for bound, n in zip(buckets, cumulative):
+        running += n
+        lines.append(f'{name}_bucket{{{labels},le="{_number(bound)}"}} {running}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total_ns / 1e9}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+class PrometheusExporter:
+    """Background /metrics endpoint rendering a snapshot source on every scrape"""
+
+    def __init__(self, source: Callable[[], Snapshot], operations: Dict[str, str], port: int = DEFAULT_PORT,
+                 host: str = "0.0.0.0", gauges: MetricFunctions = None, counters: MetricFunctions = None,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        # operations maps histogram names to their "<prefix>_fail" counters
+        self.source = source
+        self.operations = operations
+        self.gauges = gauges or {}
+        self.counters = counters or {}
+        self.buckets = buckets
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="prometheus-exporter", daemon=True)
+
+    def start(self) -> "PrometheusExporter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def render(self) -> str:
+        snapshot = self.source()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, (help_text, value) in self.gauges.items():
+            family(name, "gauge", help_text)
+            lines.append(f"{name} {_number(value())}")
+        for name, (help_text, value) in self.counters.items():
+            family(name, "counter", help_text)
+            lines.append(f"{name} {_number(value())}")
+
+        family("loadgen_requests_total", "counter", "Requests completed by the load generator")
+        for operation in snapshot.operations():
+            lines.append(f'loadgen_requests_total{{operation="{_label(operation)}"}} {snapshot.histograms[operation].count}')
+
+        family("loadgen_request_errors_total", "counter", "Requests the load generator counted as failed")
+        for operation, prefix in self.operations.items():
+            lines.append(f'loadgen_request_errors_total{{operation="{_label(operation)}"}} '
+                         f'{snapshot.counters.get(f"{prefix}_fail", 0)}')
+
+        family("loadgen_responses_total", "counter", "Responses by HTTP status code (status 0: no response)")
+        for (operation, status), n in sorted(snapshot.statuses.items()):
+            lines.append(f'loadgen_responses_total{{operation="{_label(operation)}",status="{status}"}} {n}')
+
+        family("loadgen_response_bytes_total", "counter", "Response body bytes received")
+        for operation, n in sorted(snapshot.received.items()):
+            lines.append(f'loadgen_response_bytes_total{{operation="{_label(operation)}"}} {n}')
+
+        family("loadgen_in_flight_requests", "gauge", "Requests currently waiting for a response")
+        for operation, n in sorted(snapshot.in_flight.items()):
+            lines.append(f'loadgen_in_flight_requests{{operation="{_label(operation)}"}} {n}')
+
+        for name, histograms, help_text in (
+            ("loadgen_request_duration_seconds", snapshot.histograms, "Client-observed response time"),
+            ("loadgen_request_duration_corrected_seconds", snapshot.corrected,
+             "Response time from the intended send time (coordinated omission corrected)"),
+        ):
+            family(name, "histogram", help_text)
+            for operation in sorted(histograms):
+                lines.extend(histogram_lines(name, f'operation="{_label(operation)}"', histograms[operation], self.buckets))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,321 @@
+"""
+Replay of recorded traffic
+Re-issues one or more captures (e.g. the main process's and every
+worker's) against a gateway at their original inter-arrival times, N times
+faster, or as fast as dependencies and --max-in-flight allow. Tokens and
+IDs a captured response handed out are swapped for the ones the replayed
+response returns, so a replay against a fresh backend follows the same
+user journeys; requests wait for the replayed request that created what
+they use. Usernames get a suffix so a replay does not collide with the
+accounts of the captured run
+
+Usage:  python -m loadgen.replay results/run.qhc [results/run.worker*.qhc] --gateway http://localhost:8080 --speed 2
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import re
+import secrets
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+
+from loadgen import client, engine, scheduler
+from loadgen.capture import GUID, NO_ACTOR, Exchange, open_capture
+from loadgen.histogram import Histogram
+from loadgen.metrics import MetricsStore
+
+DEFAULT_GATEWAY = "http://localhost:8080"
+DEFAULT_MAX_IN_FLIGHT = 1000
+REORDER_WINDOW = 30.0  # Seconds; captures are written in completion order, at most a client timeout apart
+_TOKEN = re.compile(rb"[A-Za-z0-9_.@-]+")
+
+
+def log(message, level="INFO"):
+    """Simple logging"""
+    colors = {
+        "INFO": "\033[0;36m",
+        "SUCCESS": "\033[0;32m",
+        "ERROR": "\033[0;31m",
+        "WARNING": "\033[1;33m",
+    }
+    color = colors.get(level, "")
+    reset = "\033[0m"
+    print(f"{color}[{level}]{reset} {message}")
+
+
+def operation_name(exchange: Exchange) -> str:
+    return exchange.operation or f"{exchange.method} {exchange.route}"
+
+
+def issue_order(paths: List[str], window: float = REORDER_WINDOW) -> Iterator[Tuple[float, int, Exchange]]:
+    """(issue time, source index, exchange) of every capture in issue order, streamed
+
+    Each file is in completion order, so an exchange can only be preceded
+    in its file by ones issued up to a response time later; holding back
+    everything issued within window of the newest completion restores order
+    """
+    def completions(source: int, started_at: float, exchanges: Iterator[Exchange]):
+        for exchange in exchanges:
+            issued = started_at + exchange.offset_ns / 1e9
+            yield issued + exchange.latency_ns / 1e9, issued, source, exchange
+
+    streams = []
+    for source, path in enumerate(paths):
+        started_at, exchanges = open_capture(path)
+        streams.append(completions(source, started_at, exchanges))
+    held: List[Tuple[float, int, int, Exchange]] = []
+    sequence = 0
+    for completed, issued, source, exchange in heapq.merge(*streams, key=lambda item: item[0]):
+        heapq.heappush(held, (issued, sequence, source, exchange))
+        sequence += 1
+        while held[0][0] <= completed - window:
+            issued, _, source, exchange = heapq.heappop(held)
+            yield issued, source, exchange
+    while held:
+        issued, _, source, exchange = heapq.heappop(held)
+        yield issued, source, exchange
+
+
+class Replayer:
+    """Re-issues captured exchanges, remapping the tokens and IDs replayed responses hand out"""
+
+    def __init__(self, session: aiohttp.ClientSession, gateway: str, suffix: str, metrics: MetricsStore):
+        self.session = session
+        self.gateway = gateway.rstrip("/")
+        self.suffix = suffix.encode("utf-8")
+        self.metrics = metrics
+        self.captured: Dict[str, Histogram] = {}
+        self.captured_errors: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.skipped: Dict[str, int] = defaultdict(int)
+        self.unmatched = 0  # Responses that created a different number of IDs than captured
+        self._tokens: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._ids: Dict[bytes, asyncio.Future] = {}
+        self._identities = set()
+
+    def expect(self, source: int, exchange: Exchange) -> Tuple[List[Tuple[int, asyncio.Future]], Optional[asyncio.Future]]:
+        """Register what exchange hands out before anything issued later can ask for it
+
+        Returns the futures exchange has to resolve: the IDs its response
+        creates (by position in the response) and the token it grants
+        """
+        loop = asyncio.get_running_loop()
+        token = None
+        if exchange.grants != NO_ACTOR:
+            token = self._tokens[source, exchange.grants] = loop.create_future()
+        created = []
+        sent = exchange.path.encode("utf-8") + exchange.body
+        for index, guid in enumerate(exchange.created):
+            guid = guid.encode("ascii")
+            # IDs the request itself carries already existed; the rest are new
+            if guid not in self._ids and guid not in sent:
+                self._ids[guid] = loop.create_future()
+                created.append((index, self._ids[guid]))
+        if exchange.identity:
+            self._identities.add(exchange.identity.encode("utf-8"))
+        return created, token
+
+    def record_captured(self, exchange: Exchange):
+        operation = operation_name(exchange)
+        if exchange.status == 0 or exchange.status >= 400:
+            self.captured_errors[operation] += 1
+        if exchange.status:
+            histogram = self.captured.get(operation)
+            if histogram is None:
+                histogram = self.captured[operation] = Histogram()
+            histogram.record(exchange.latency_ns)
+
+    async def _remap_ids(self, data: bytes) -> Optional[bytes]:
+        """data with every captured ID replaced by its replayed one, None if a creator failed"""
+        mapping = {}
+        for guid in set(GUID.findall(data)):
+            future = self._ids.get(guid)
+            if future is None:
+                continue  # Existed before the capture, used as is
+            replayed = await future
+            if replayed is None:
+                return None
+            mapping[guid] = replayed
+        if not mapping:
+            return data
+        return GUID.sub(lambda match: mapping.get(match.group(0), match.group(0)), data)
+
+    def _ready(self, source: int, exchange: Exchange) -> bool:
+        """Whether every token and ID exchange uses has already been replayed"""
+        futures = [self._tokens.get((source, exchange.actor))]
+        futures += [self._ids.get(guid) for guid in GUID.findall(exchange.path.encode("utf-8") + exchange.body)]
+        return all(future is None or future.done() for future in futures)
+
+    def _rename(self, body: bytes) -> bytes:
+        if not self.suffix or not self._identities:
+            return body
+
+        def rename(match):
+            word = match.group(0)
+            name, at, domain = word.partition(b"@")
+            return name + self.suffix + at + domain if name in self._identities else word
+        return _TOKEN.sub(rename, body)
+
+    async def send(self, source: int, exchange: Exchange, intended_ns: int,
+                   created: List[Tuple[int, asyncio.Future]], token_future: Optional[asyncio.Future]):
+        operation = operation_name(exchange)
+        replayed_ids: List[bytes] = []
+        replayed_token = None
+        try:
+            if not self._ready(source, exchange):
+                intended_ns = 0
+            headers = {}
+            if exchange.actor != NO_ACTOR:
+                granted = self._tokens.get((source, exchange.actor))
+                token = await granted if granted is not None else None
+                if token is None:
+                    self.skipped[operation] += 1  # Its token was never (re)issued
+                    return
+                headers["Authorization"] = f"Bearer {token}"
+            path = await self._remap_ids(exchange.path.encode("utf-8"))
+            body = await self._remap_ids(exchange.body) if exchange.body else b""
+            if path is None or body is None:
+                self.skipped[operation] += 1
+                return
+            if exchange.route.endswith(("/register", "/login")):
+                body = self._rename(body)
+            if exchange.content_type and body:
+                headers["Content-Type"] = exchange.content_type
+            self.metrics.begin(operation)
+            started_ns = time.perf_counter_ns()
+            if not intended_ns:
+                # Waited for what it depends on: latency counts from when that was ready
+                intended_ns = started_ns
+            status, response = 0, b""
+            try:
+                async with self.session.request(exchange.method, self.gateway + path.decode("utf-8"),
+                                                data=body or None, headers=headers) as reply:
+                    status, response = reply.status, await reply.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            finished_ns = time.perf_counter_ns()
+            self.metrics.record(operation, finished_ns - started_ns, finished_ns - intended_ns, len(response), status)
+            self.metrics.end(operation)
+            if status == 0 or status >= 400:
+                self.errors[operation] += 1
+            elif response and (created or token_future):
+                replayed_ids = GUID.findall(response)
+                if len(replayed_ids) != len(exchange.created):
+                    self.unmatched += 1
+                if token_future:
+                    try:
+                        data = json.loads(response)
+                        replayed_token = data.get("token") or data.get("Token")
+                    except (ValueError, AttributeError):
+                        pass
+        finally:
+            # Dependants always get an answer; None makes them count as skipped
+            for index, future in created:
+                future.set_result(replayed_ids[index] if index < len(replayed_ids) else None)
+            if token_future is not None and not token_future.done():
+                token_future.set_result(replayed_token)
+
+
+async def replay(paths: List[str], gateway: str, speed: float = 1.0, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 suffix: str = "", window: float = REORDER_WINDOW) -> Tuple[Replayer, scheduler.ScheduleReport]:
+    """Replay captures in issue order; speed 0 issues as fast as possible"""
+    metrics = MetricsStore()
+    http_pool = client.AsyncSessionPool(pool_size=max_in_flight)
+    replayer = Replayer(http_pool.session, gateway, suffix, metrics)
+    report = scheduler.ScheduleReport(0.0)
+    capacity = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async def issue(source: int, exchange: Exchange, intended_ns: int, expected):
+        try:
+            await replayer.send(source, exchange, intended_ns, *expected)
+        finally:
+            capacity.release()
+
+    first = None
+    span = 0.0
+    start_ns = time.perf_counter_ns()
+    report.started_at = time.time()
+    try:
+        for issued, source, exchange in issue_order(paths, window):
+            if first is None:
+                first = issued
+            span = issued - first
+            replayer.record_captured(exchange)
+            intended_ns = start_ns + int(span / speed * 1e9) if speed > 0 else time.perf_counter_ns()
+            delay_ns = intended_ns - time.perf_counter_ns()
+            if delay_ns > 0:
+                await asyncio.sleep(delay_ns / 1e9)
+            await capacity.acquire()
+            report.record_lag(max(time.perf_counter_ns() - intended_ns, 0) / 1e9)
+            expected = replayer.expect(source, exchange)
+            task = asyncio.create_task(issue(source, exchange, intended_ns, expected))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        report.elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await http_pool.close()
+    if speed > 0 and span > 0:
+        report.intended_rate = report.issued / (span / speed)
+    else:
+        report.intended_rate = report.issued_rate
+    return replayer, report
+
+
+def print_report(replayer: Replayer, report: scheduler.ScheduleReport):
+    """Captured against replayed latency and errors per operation"""
+    snapshot = replayer.metrics.snapshot()
+    print("\n" + "=" * 104)
+    print(f"  {'operation':32s} {'requests':>8s} {'errors':>13s} "
+          f"{'p50 ms':>15s} {'p95 ms':>15s} {'p99 ms':>15s}")
+    print(f"  {'':32s} {'':>8s} {'capt/replay':>13s} {'capt/replay':>15s} {'capt/replay':>15s} {'capt/replay':>15s}")
+    print("=" * 104)
+    for operation in sorted(set(replayer.captured) | set(snapshot.histograms)):
+        captured = replayer.captured.get(operation, Histogram())
+        replayed = snapshot.corrected.get(operation, Histogram())
+        cells = [f"{captured.percentile(q) * 1000:7.1f}/{replayed.percentile(q) * 1000:<7.1f}" for q in (50, 95, 99)]
+        errors = f"{replayer.captured_errors[operation]}/{replayer.errors[operation]}"
+        print(f"  {operation[:32]:32s} {replayed.count:8d} {errors:>13s} {cells[0]:>15s} {cells[1]:>15s} {cells[2]:>15s}")
+    print("=" * 104)
+    print("  Replayed latency counts from the intended send time (coordinated omission corrected)")
+    skipped = sum(replayer.skipped.values())
+    if skipped:
+        log(f"{skipped} requests skipped: the replayed request they depend on failed", "WARNING")
+    if replayer.unmatched:
+        log(f"{replayer.unmatched} responses created a different number of IDs than captured", "WARNING")
+    log(f"Schedule: {report.summary()}", "SUCCESS" if not skipped else "WARNING")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured QuizHub traffic")
+    parser.add_argument("captures", nargs="+", help="Capture files written by stress-test.py --capture")
+    parser.add_argument("--gateway", default=DEFAULT_GATEWAY, help=f"Target gateway (default: {DEFAULT_GATEWAY})")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Time scale: 1 keeps the captured inter-arrival times, 2 is twice as fast, "
+                             "0 is as fast as possible (default: 1)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f"Maximum concurrent requests (default: {DEFAULT_MAX_IN_FLIGHT})")
+    parser.add_argument("--suffix", default=None,
+                        help="Appended to captured usernames so they can register again (default: random, "
+                             "'' to keep them)")
+    parser.add_argument("--reorder-window", type=float, default=REORDER_WINDOW,
+                        help=f"Longest captured response time in seconds (default: {REORDER_WINDOW:.0f})")
+    args = parser.parse_args()
+    suffix = f"_r{secrets.token_hex(3)}" if args.suffix is None else args.suffix
+    speed = "as fast as possible" if args.speed <= 0 else f"{args.speed:g}x"
+    log(f"Replaying {', '.join(args.captures)} against {args.gateway} at {speed}"
+        + (f" (usernames suffixed with {suffix})" if suffix else ""))
+    replayer, report = engine.run(lambda: replay(args.captures, args.gateway, args.speed, args.max_in_flight,
+                                                 suffix, args.reorder_window))
+    print_report(replayer, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Scenario runner
+Sets up the test data a scenario declares (users, admins, quizzes), runs
+its stages in order on the asyncio engine and reports every stage and the
+whole run. The gateway comes from --gateway, else $GATEWAY_URL, else the
+scenario file
+
+Usage:  python -m loadgen.runner scenarios/stress-test.json [--gateway http://localhost:8080]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loadgen import actions, capture, client, engine, manifest, scheduler, slo, teardown, tokens
+from loadgen.histogram import Histogram
+from loadgen.metrics import MetricsStore, Snapshot, format_latency
+from loadgen.monitor import Monitor
+from loadgen.scenario import Scenario, ScenarioError, Stage, gateway_for, load_scenario
+from loadgen.timeseries import TimeSeriesWriter
+
+DEFAULT_GATEWAY = "http://localhost:8080"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+EXISTING_QUIZ_PAGES = 5  # Pages of existing quizzes used when the scenario creates none
+
+
+def log(message, level="INFO"):
+    """Thread-safe logging"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    colors = {
+        "INFO": "\033[0;36m",
+        "SUCCESS": "\033[0;32m",
+        "ERROR": "\033[0;31m",
+        "WARNING": "\033[1;33m",
+    }
+    color = colors.get(level, "")
+    reset = "\033[0m"
+    print(f"{color}[{timestamp}] [{level}]{reset} {message}")
+
+
+async def gather_limited(coros, concurrency: int) -> List:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(guarded(coro) for coro in coros))
+
+
+async def set_up(ctx: actions.Context, scenario: Scenario):
+    """Register the users, promote the admins and create the quizzes"""
+    setup = scenario.setup
+    log(f"Setup: registering {setup.users} users...", "INFO")
+    registered = await gather_limited((actions.register(ctx) for _ in range(setup.users)), setup.concurrency)
+    ctx.users = [user for user in registered if user]
+    log(f"✓ Registered {len(ctx.users)} users", "SUCCESS" if len(ctx.users) == setup.users else "WARNING")
+    if setup.admins:
+        promoted = await gather_limited((actions.promote(ctx, user) for user in ctx.users[:setup.admins]),
+                                        setup.concurrency)
+        log(f"✓ Promoted {sum(promoted)} users to Admin", "SUCCESS" if all(promoted) else "WARNING")
+    admins = [user for user in ctx.users if user.get("role") == "Admin"]
+    if setup.quizzes and admins:
+        await gather_limited((actions.create_quiz(ctx, admins[i % len(admins)]) for i in range(setup.quizzes)),
+                             setup.concurrency)
+        log(f"✓ Created {len(ctx.quiz_ids)} quizzes", "SUCCESS" if len(ctx.quiz_ids) == setup.quizzes else "WARNING")
+    elif not setup.quizzes and ctx.users:
+        for page in range(1, EXISTING_QUIZ_PAGES + 1):
+            status, body = await ctx.call("get_quizzes", "GET", f"/api/quizzes?page={page}&pageSize=100",
+                                          ctx.users[0]["token"])
+            data = actions.parse_json(body) if status == 200 else []
+            items = data.get("quizzes", data.get("items", [])) if isinstance(data, dict) else data
+            ctx.quiz_ids.extend(quiz["id"] for quiz in items if quiz.get("id"))
+            if len(items) < 100:
+                break
+        log(f"✓ Using {len(ctx.quiz_ids)} existing quizzes", "SUCCESS" if ctx.quiz_ids else "WARNING")
+
+
+def mix_steps(stage: Stage, rng: random.Random, admin: bool) -> Iterator[Tuple[str, int]]:
+    """(action, think time in ms after it) drawn independently from the stage's mix"""
+    done = 0
+    while stage.actions is None or done < stage.actions:
+        yield stage.mix.pick(rng, admin), stage.think_time.sample(rng)
+        done += 1
+
+
+async def run_session(ctx: actions.Context, stage: Stage, user: Dict, rng: random.Random,
+                      deadline: Optional[float] = None):
+    """Actions of one virtual user session, with think time between them"""
+    admin = user.get("role") == "Admin"
+    if stage.behaviour:
+        # Closed-model users start a new session when the model exits
+        steps = stage.behaviour.walk(rng, admin, stage.actions, restart=not stage.open)
+    else:
+        steps = mix_steps(stage, rng, admin)
+    think_ms = 0
+    for name, next_think_ms in steps:
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        if think_ms:
+            await asyncio.sleep(think_ms / 1000)
+        try:
+            await actions.ACTIONS[name](ctx, user)
+        except Exception as e:
+            ctx.metrics.incr("action_errors")
+            log(f"{name} failed: {e}", "ERROR")
+        think_ms = next_think_ms
+
+
+async def run_stage(ctx: actions.Context, stage: Stage, rng: random.Random) -> Optional[scheduler.ScheduleReport]:
+    """Drive one stage; returns the arrival schedule report of an open stage"""
+    if stage.open:
+        async def arrival():
+            await run_session(ctx, stage, rng.choice(ctx.users), rng)
+
+        return await scheduler.run_open_model(stage.profile(), arrival, poisson=stage.poisson,
+                                              seed=rng.randrange(1 << 31), max_in_flight=stage.concurrency)
+    started = time.monotonic()
+    deadline = started + stage.duration if stage.duration else None
+
+    async def virtual_user(index: int):
+        if stage.kind == "ramp-up":
+            # Users join evenly over the stage
+            await asyncio.sleep(index * stage.duration / stage.users)
+        await run_session(ctx, stage, ctx.users[index % len(ctx.users)], rng, deadline)
+
+    await engine.run_virtual_users(virtual_user, ((i,) for i in range(stage.users)), stage.concurrency,
+                                   keep_results=False)
+    return None
+
+
+def stage_delta(before: Snapshot, after: Snapshot) -> Snapshot:
+    """What happened between two snapshots"""
+    delta = Snapshot()
+    empty = Histogram()
+    for name, value in after.counters.items():
+        delta.counters[name] = value - before.counters.get(name, 0)
+    for key, value in after.statuses.items():
+        delta.statuses[key] = value - before.statuses.get(key, 0)
+    for target, later, earlier in ((delta.histograms, after.histograms, before.histograms),
+                                   (delta.corrected, after.corrected, before.corrected)):
+        for operation, histogram in later.items():
+            change = histogram.delta(earlier.get(operation, empty))
+            if change.count:
+                target[operation] = change
+    return delta
+
+
+def print_stage_report(name: str, snapshot: Snapshot, seconds: float):
+    """Throughput, errors and corrected percentiles per operation"""
+    errors = slo.error_counts(snapshot)
+    print(f"\n  {name} ({seconds:.1f}s)")
+    print(f"  {'operation':15s} {'count':>7s} {'req/s':>8s} {'errors':>7s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'max ms':>8s}")
+    for operation in snapshot.operations():
+        histogram = snapshot.corrected[operation]
+        print(f"  {operation:15s} {histogram.count:7d} {histogram.count / seconds if seconds else 0:8.1f} "
+              f"{errors.get(operation, 0):7d} {histogram.percentile(50) * 1000:8.1f} "
+              f"{histogram.percentile(95) * 1000:8.1f} {histogram.percentile(99) * 1000:8.1f} "
+              f"{histogram.max_ns / 1e6:8.1f}")
+
+
+def print_metrics(snapshot: Snapshot, connections: client.ConnectionStats):
+    """Final metrics over every stage"""
+    counters = snapshot.counters
+    print("\n" + "=" * 70)
+    print("                    SCENARIO RESULTS")
+    print("=" * 70)
+    print("\n📊 Operation Metrics:")
+    for operation, prefix in actions.OPERATION_COUNTERS.items():
+        succeeded, failed = counters.get(f"{prefix}_success", 0), counters.get(f"{prefix}_fail", 0)
+        if succeeded or failed:
+            print(f"  {operation:15s}  ✓ {succeeded:6d}  ✗ {failed:6d}")
+    print("\n⏱️  Response Times:")
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.histograms[operation])}")
+    print("\n📐 Corrected for coordinated omission (from intended send time):")
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.corrected[operation])}")
+    total_success = sum(v for k, v in counters.items() if k.endswith("_success"))
+    total = total_success + sum(v for k, v in counters.items() if k.endswith("_fail"))
+    if total:
+        print(f"\n✅ Overall Success Rate: {total_success / total * 100:.2f}%")
+    print(f"🔌 Connections: {connections.summary()}")
+    print("\n" + "=" * 70)
+
+
+async def run_scenario(scenario: Scenario, gateway: str, args: argparse.Namespace) -> Snapshot:
+    """Set up, run every stage and tear down; returns the metrics of the stages"""
+    metrics = MetricsStore()
+    rng = random.Random(args.seed)
+    run_manifest = None
+    if scenario.setup.teardown:
+        run_manifest = manifest.Manifest(
+            os.path.join(RESULTS_DIR, f"scenario-{datetime.now():%Y%m%d-%H%M%S}.manifest"), gateway,
+            scenario=scenario.name)
+    recorder = None
+    if args.capture:
+        os.makedirs(os.path.dirname(os.path.abspath(args.capture)), exist_ok=True)
+        recorder = capture.TrafficRecorder(args.capture)
+    http_pool = client.AsyncSessionPool(pool_size=max(stage.concurrency for stage in scenario.stages),
+                                        trace_configs=[recorder.trace_config()] if recorder else None)
+    ctx = actions.Context(http_pool.session, gateway, metrics, run_manifest,
+                          corpus_seed=args.seed if args.seed is not None else random.randrange(1 << 31),
+                          recorder=recorder)
+    monitor = None
+    if args.timeseries:
+        os.makedirs(os.path.dirname(os.path.abspath(args.timeseries)), exist_ok=True)
+        monitor = Monitor(metrics.snapshot, interval=1.0)
+        monitor.add_listener(TimeSeriesWriter(args.timeseries, actions.OPERATION_COUNTERS))
+    refresher = None
+    try:
+        await set_up(ctx, scenario)
+        if not ctx.users:
+            log("No users registered successfully. Exiting.", "ERROR")
+            return metrics.snapshot()
+        setup_done = metrics.snapshot()
+        if monitor:
+            monitor.start()
+        # Tokens are renewed in the background before they expire; logins in a stage are the mix's "login"
+        refresher = tokens.RefreshScheduler(ctx.tokens, lambda user: actions.relogin(ctx, user)).start()
+        before = setup_done
+        for i, stage in enumerate(scenario.stages, 1):
+            log(f"\nStage {i}/{len(scenario.stages)}: {stage.describe()}", "INFO")
+            started = time.monotonic()
+            report = await run_stage(ctx, stage, rng)
+            after = metrics.snapshot()
+            delta = stage_delta(before, after)
+            print_stage_report(stage.name, delta, time.monotonic() - started)
+            verdicts = slo.evaluate(scenario.objectives, delta)
+            if verdicts:
+                missed = [verdict for verdict in verdicts if not verdict.met]
+                log(f"{'✗' if missed else '✓'} SLO: {len(verdicts) - len(missed)}/{len(verdicts)} objectives met"
+                    + "".join(f"\n    {verdict}" for verdict in missed), "WARNING" if missed else "SUCCESS")
+            if report:
+                log(f"✓ Schedule: {report.summary()}", "SUCCESS" if not report.late else "WARNING")
+            before = after
+        result = stage_delta(setup_done, metrics.snapshot())
+    finally:
+        if refresher:
+            await refresher.stop()
+            if refresher.refreshed or refresher.failed:
+                log(f"✓ Tokens: {refresher.summary()}", "SUCCESS" if not refresher.failed else "WARNING")
+        await http_pool.close()
+        if recorder:
+            recorder.close()
+            log(f"🎞  {recorder.writer.count} requests captured to {recorder.path}", "INFO")
+        if monitor:
+            monitor.stop()
+            log(f"📈 Per-second time series written to {args.timeseries}", "INFO")
+    print_metrics(result, http_pool.stats())
+    if run_manifest:
+        run_manifest.close()
+        await teardown.teardown(run_manifest.path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a declarative QuizHub load scenario")
+    parser.add_argument("scenario", help="Scenario file (see stress-tests/scenarios)")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL, the scenario's, or {DEFAULT_GATEWAY})")
+    parser.add_argument("--seed", type=int, help="Seed for action choices, think times and arrivals")
+    parser.add_argument("--timeseries", metavar="PATH",
+                        help="Write per-second results of the stages (e.g. results/scenario.qts)")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="Record every request for loadgen.replay or loadgen.behaviour fit (e.g. results/run.qhc)")
+    args = parser.parse_args()
+    try:
+        scenario = load_scenario(args.scenario)
+    except (OSError, ScenarioError) as e:
+        log(str(e), "ERROR")
+        raise SystemExit(2)
+    gateway = gateway_for(args.gateway, scenario, DEFAULT_GATEWAY)
+    print(f"\nScenario: {scenario.name}")
+    if scenario.description:
+        print(f"  {scenario.description}")
+    print(f"  Gateway URL: {gateway}")
+    setup = scenario.setup
+    print(f"  Setup: {setup.users} users, {setup.admins} admins, {setup.quizzes or 'existing'} quizzes\n")
+    engine.run(lambda: run_scenario(scenario, gateway, args))
+
+
+if __name__ == "__main__":
+    main()
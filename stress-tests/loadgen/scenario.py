@@ -0,0 +1,334 @@
+"""
+Declarative load scenarios
+A scenario file (JSON) declares the test data to set up and a list of
+stages run one after another. A stage either drives an arrival rate (open
+model: "rate", optionally ramping from "start_rate") or keeps a number of
+virtual users busy (closed model: "users"); both pick actions from a
+weighted mix and pause for a think time between the actions of a session,
+or walk a Markov behaviour model ("behaviour", a model file relative to
+the scenario or "default") with its own think times. Optional service
+level objectives ("slo") are judged on every stage and bound the capacity
+search. Files are validated up front, with the path of the offending field
+in every error
+
+Check a file:  python -m loadgen.scenario scenarios/capacity-sweep.json
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from loadgen import actions, behaviour, scheduler, slo
+from loadgen.corpus import Distribution, parse_distribution
+
+STAGE_KINDS = ("ramp-up", "steady", "spike", "soak")
+DEFAULT_THINK_TIME = "const:0"  # Milliseconds between the actions of a session
+DEFAULT_CONCURRENCY = 1000
+BUILTIN_BEHAVIOUR = "default"  # "behaviour" value naming loadgen.behaviour.DEFAULT_MODEL
+
+
+class ScenarioError(ValueError):
+    """A scenario file that cannot be run; the message names the offending field"""
+
+
+class Mix:
+    """Weighted choice of actions"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.names = list(weights)
+        self._cumulative = list(itertools.accumulate(weights.values()))
+        # Users without the Admin role draw from the mix without the admin actions
+        self._user_names = [name for name in self.names if name not in actions.ADMIN_ACTIONS]
+        self._user_cumulative = list(itertools.accumulate(weights[name] for name in self._user_names))
+
+    def pick(self, rng: random.Random, admin: bool = False) -> Optional[str]:
+        names, cumulative = (self.names, self._cumulative) if admin else (self._user_names, self._user_cumulative)
+        if not cumulative or cumulative[-1] <= 0:
+            return None
+        return names[bisect.bisect_right(cumulative, rng.random() * cumulative[-1])]
+
+    def share(self, names) -> float:
+        """Fraction of the picks that land on one of names"""
+        total = sum(self.weights.values())
+        return sum(self.weights.get(name, 0) for name in names) / total if total else 0.0
+
+    def __repr__(self) -> str:
+        total = sum(self.weights.values())
+        return ", ".join(f"{name} {weight / total:.0%}" for name, weight in self.weights.items())
+
+
+class Stage:
+    """One phase of a scenario"""
+
+    def __init__(self, name: str, kind: str, duration: Optional[float], rate: Optional[float],
+                 start_rate: float, poisson: bool, users: Optional[int], actions: Optional[int],
+                 concurrency: int, mix: Optional[Mix], think_time: Distribution,
+                 behaviour_path: Optional[str] = None, model: Optional[behaviour.BehaviourModel] = None):
+        self.name = name
+        self.kind = kind
+        self.duration = duration  # Seconds; closed stages without one run until every user is done
+        self.rate = rate  # Sessions started per second (open model)
+        self.start_rate = start_rate
+        self.poisson = poisson
+        self.users = users  # Concurrent virtual users (closed model)
+        self.actions = actions  # Actions per session; closed stages without one loop until the duration ends
+        self.concurrency = concurrency
+        self.mix = mix
+        self.think_time = think_time
+        self.behaviour_path = behaviour_path
+        self.behaviour = model  # Replaces the mix and think time when set
+
+    @property
+    def open(self) -> bool:
+        return self.rate is not None
+
+    def profile(self):
+        """Arrival rate profile of an open stage"""
+        if self.kind == "ramp-up":
+            return scheduler.RampRate(self.start_rate, self.rate, self.duration)
+        return scheduler.ConstantRate(self.rate, self.duration)
+
+    def describe(self) -> str:
+        if self.open:
+            rate = f"{self.start_rate:g} -> {self.rate:g}" if self.kind == "ramp-up" else f"{self.rate:g}"
+            load = f"{rate} sessions/s for {self.duration:g}s" + (" (Poisson)" if self.poisson else "")
+        else:
+            load = f"{self.users} users" + (" ramping up" if self.kind == "ramp-up" else "")
+            if self.duration:
+                load += f" for {self.duration:g}s"
+        per_session = f"{self.actions} actions" if self.actions else "actions"
+        if self.behaviour:
+            return f"{self.name} [{self.kind}]: {load}, {per_session} per session; behaviour: {self.behaviour_path}"
+        return (f"{self.name} [{self.kind}]: {load}, {per_session} per session, "
+                f"think {self.think_time!r}ms; mix: {self.mix!r}")
+
+
+class Setup:
+    """Test data created before the first stage"""
+
+    def __init__(self, users: int, admins: int, quizzes: int, concurrency: int, teardown: bool):
+        self.users = users
+        self.admins = admins
+        self.quizzes = quizzes  # 0 uses the quizzes already on the gateway
+        self.concurrency = concurrency
+        self.teardown = teardown
+
+
+class Scenario:
+    def __init__(self, name: str, description: str, gateway: Optional[str], setup: Setup, stages: List[Stage],
+                 objectives: Optional[List[slo.Objective]] = None):
+        self.name = name
+        self.description = description
+        self.gateway = gateway
+        self.setup = setup
+        self.stages = stages
+        self.objectives = objectives or []
+
+    @property
+    def duration(self) -> float:
+        return sum(stage.duration or 0 for stage in self.stages)
+
+
+def _fields(data: Any, where: str, allowed: Dict[str, type], required=()) -> Dict:
+    if not isinstance(data, dict):
+        raise ScenarioError(f"{where}: expected an object")
+    unknown = sorted(set(data) - set(allowed))
+    if unknown:
+        raise ScenarioError(f"{where}: unknown field{'s' if len(unknown) > 1 else ''} {', '.join(unknown)} "
+                            f"(expected {', '.join(allowed)})")
+    for name in required:
+        if name not in data:
+            raise ScenarioError(f"{where}: missing {name}")
+    for name, value in data.items():
+        expected = allowed[name]
+        if expected is float and isinstance(value, int) and not isinstance(value, bool):
+            continue
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ScenarioError(f"{where}.{name}: expected {expected.__name__}, got {json.dumps(value)}")
+    return data
+
+
+def _positive(value, where: str, zero: bool = False):
+    if value is not None and (value < 0 or (value == 0 and not zero)):
+        raise ScenarioError(f"{where}: must be {'>= 0' if zero else '> 0'}, got {value}")
+    return value
+
+
+def _mix(data: Any, where: str, admins: int) -> Mix:
+    unknown = sorted(set(data) - set(actions.ACTIONS)) if isinstance(data, dict) else []
+    if unknown:
+        raise ScenarioError(f"{where}: unknown action {', '.join(unknown)} (actions: {', '.join(actions.ACTIONS)})")
+    weights = _fields(data, where, {name: float for name in actions.ACTIONS})
+    if not weights:
+        raise ScenarioError(f"{where}: empty mix, name at least one of {', '.join(actions.ACTIONS)}")
+    for name, weight in weights.items():
+        _positive(weight, f"{where}.{name}", zero=True)
+        if name in actions.ADMIN_ACTIONS and weight and not admins:
+            raise ScenarioError(f"{where}.{name}: admin-only action, but setup.admins is 0")
+    if not sum(weight for name, weight in weights.items() if name not in actions.ADMIN_ACTIONS):
+        raise ScenarioError(f"{where}: regular users would have no action (only admin actions are weighted)")
+    return Mix({name: float(weight) for name, weight in weights.items()})
+
+
+def _think_time(spec: Any, where: str) -> Distribution:
+    if not isinstance(spec, str):
+        raise ScenarioError(f"{where}: expected a distribution such as \"uniform:50:200\" (milliseconds)")
+    try:
+        return parse_distribution(spec, low=0)
+    except ValueError as e:
+        raise ScenarioError(f"{where}: {e}") from None
+
+
+STAGE_FIELDS = {"name": str, "kind": str, "duration": float, "rate": float, "start_rate": float,
+                "poisson": bool, "users": int, "actions": int, "concurrency": int, "mix": dict,
+                "think_time": str, "behaviour": str}
+DEFAULT_FIELDS = {"mix": dict, "think_time": str, "behaviour": str, "actions": int, "concurrency": int}
+
+
+def _behaviour(path: str, where: str, base: str) -> behaviour.BehaviourModel:
+    if path == BUILTIN_BEHAVIOUR:
+        return behaviour.default_model()
+    try:
+        return behaviour.load_model(os.path.join(base, path))
+    except OSError as e:
+        raise ScenarioError(f"{where}: cannot read {path} ({e.strerror})") from None
+    except behaviour.ModelError as e:
+        raise ScenarioError(f"{where}: {e}") from None
+
+
+def _objectives(specs: List, where: str) -> List[slo.Objective]:
+    objectives = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, str):
+            raise ScenarioError(f"{where}[{i}]: expected an objective such as \"submit_result:p99<500ms\"")
+        try:
+            objectives.append(slo.parse_objective(spec))
+        except slo.SloError as e:
+            raise ScenarioError(f"{where}[{i}]: {e}") from None
+    return objectives
+
+
+def _stage(data: Any, where: str, defaults: Dict, setup: Setup, base: str) -> Stage:
+    data = _fields(data, where, STAGE_FIELDS)
+    merged = {**defaults, **data}
+    kind = merged.get("kind", "steady")
+    if kind not in STAGE_KINDS:
+        raise ScenarioError(f"{where}.kind: {json.dumps(kind)} is not one of {', '.join(STAGE_KINDS)}")
+    rate, users = merged.get("rate"), merged.get("users")
+    if (rate is None) == (users is None):
+        raise ScenarioError(f"{where}: give either rate (open model) or users (closed model)")
+    duration = _positive(merged.get("duration"), f"{where}.duration")
+    _positive(rate, f"{where}.rate")
+    _positive(users, f"{where}.users")
+    start_rate = _positive(merged.get("start_rate", 0.0), f"{where}.start_rate", zero=True)
+    if "start_rate" in data and kind != "ramp-up":
+        raise ScenarioError(f"{where}.start_rate: only ramp-up stages ramp")
+    if rate is not None and duration is None:
+        raise ScenarioError(f"{where}: open-model stages need a duration")
+    if users is not None:
+        if "poisson" in data:
+            raise ScenarioError(f"{where}.poisson: only open-model (rate) stages have arrivals")
+        if duration is None and not merged.get("actions"):
+            raise ScenarioError(f"{where}: closed-model stages need a duration or actions per user")
+        if kind == "ramp-up" and duration is None:
+            raise ScenarioError(f"{where}: a ramp-up stage starts its users over its duration, which is missing")
+    # A stage's own mix overrides a default behaviour model and the other way round
+    behaviour_path = merged.get("behaviour") if "mix" not in data or "behaviour" in data else None
+    if behaviour_path is not None:
+        for name in ("mix", "think_time"):
+            if name in data:
+                raise ScenarioError(f"{where}.{name}: a behaviour model brings its own actions and think times")
+    elif "mix" not in merged:
+        raise ScenarioError(f"{where}: no mix or behaviour (set one here or in defaults)")
+    return Stage(
+        name=merged.get("name", f"stage {where.rpartition('[')[2].rstrip(']')}"),
+        kind=kind,
+        duration=float(duration) if duration is not None else None,
+        rate=float(rate) if rate is not None else None,
+        start_rate=float(start_rate),
+        poisson=merged.get("poisson", False),
+        users=users,
+        # Open-model sessions run one mix action, or walk the behaviour model until it exits
+        actions=_positive(merged.get("actions", 1 if rate is not None and behaviour_path is None else None),
+                          f"{where}.actions"),
+        concurrency=_positive(merged.get("concurrency", setup.concurrency), f"{where}.concurrency"),
+        mix=_mix(merged["mix"], f"{where}.mix", setup.admins) if behaviour_path is None else None,
+        think_time=_think_time(merged.get("think_time", DEFAULT_THINK_TIME), f"{where}.think_time"),
+        behaviour_path=behaviour_path,
+        model=_behaviour(behaviour_path, f"{where}.behaviour", base) if behaviour_path is not None else None,
+    )
+
+
+def parse_scenario(data: Any, source: str = "scenario") -> Scenario:
+    """Validate a decoded scenario document"""
+    data = _fields(data, source, {"name": str, "description": str, "gateway": str, "setup": dict,
+                                  "defaults": dict, "slo": list, "stages": list}, required=("stages",))
+    raw = _fields(data.get("setup", {}), f"{source}.setup",
+                  {"users": int, "admins": int, "quizzes": int, "concurrency": int, "teardown": bool})
+    setup = Setup(
+        users=_positive(raw.get("users", 1), f"{source}.setup.users"),
+        admins=_positive(raw.get("admins", 0), f"{source}.setup.admins", zero=True),
+        quizzes=_positive(raw.get("quizzes", 0), f"{source}.setup.quizzes", zero=True),
+        concurrency=_positive(raw.get("concurrency", DEFAULT_CONCURRENCY), f"{source}.setup.concurrency"),
+        teardown=raw.get("teardown", False),
+    )
+    if setup.admins > setup.users:
+        raise ScenarioError(f"{source}.setup.admins: {setup.admins} admins out of {setup.users} users")
+    if setup.quizzes and not setup.admins:
+        raise ScenarioError(f"{source}.setup.quizzes: creating quizzes needs setup.admins >= 1")
+    defaults = _fields(data.get("defaults", {}), f"{source}.defaults", DEFAULT_FIELDS)
+    if not data["stages"]:
+        raise ScenarioError(f"{source}.stages: no stages")
+    base = os.path.dirname(os.path.abspath(source)) if os.path.exists(source) else os.getcwd()
+    stages = [_stage(stage, f"{source}.stages[{i}]", defaults, setup, base) for i, stage in enumerate(data["stages"])]
+    objectives = _objectives(data.get("slo", []), f"{source}.slo")
+    return Scenario(data.get("name", source), data.get("description", ""), data.get("gateway"), setup, stages,
+                    objectives)
+
+
+def load_scenario(path: str) -> Scenario:
+    """Read and validate a scenario file"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ScenarioError(f"{path}: not valid JSON ({e})") from None
+    return parse_scenario(data, path)
+
+
+def gateway_for(option: Optional[str], scenario: Optional[Scenario], default: str) -> str:
+    """--gateway, else $GATEWAY_URL, else the scenario's gateway, else the caller's default"""
+    return option or os.environ.get("GATEWAY_URL") or (scenario.gateway if scenario else None) or default
+
+
+def main():
+    """Validate scenario files and print their plan"""
+    parser = argparse.ArgumentParser(description="Validate scenario files")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+    failed = False
+    for path in args.paths:
+        try:
+            scenario = load_scenario(path)
+        except (OSError, ScenarioError) as e:
+            print(f"✗ {e}")
+            failed = True
+            continue
+        setup = scenario.setup
+        print(f"✓ {path}: {scenario.name} ({len(scenario.stages)} stages, {scenario.duration:g}s timed)")
+        print(f"    setup: {setup.users} users, {setup.admins} admins, "
+              f"{setup.quizzes or 'existing'} quizzes{', teardown' if setup.teardown else ''}")
+        for stage in scenario.stages:
+            print(f"    {stage.describe()}")
+        if scenario.objectives:
+            print(f"    slo: {', '.join(str(objective) for objective in scenario.objectives)}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Open-model arrival scheduling
+Requests are issued at a target rate no matter how long responses take,
+so overload shows up as latency and lag instead of lower throughput
+"""
+
+import asyncio
+import contextvars
+import math
+import random
+import time
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple
+
+
+# How late the current arrival was sent compared to its intended send time
+send_lag_ns = contextvars.ContextVar("send_lag_ns", default=0)
+
+
+def current_send_lag_ns() -> int:
+    """Send lag of the scheduled arrival the calling task belongs to (0 outside the scheduler)"""
+    return send_lag_ns.get()
+
+
+class ConstantRate:
+    """Fixed arrival rate for the whole duration"""
+
+    def __init__(self, rate: float, duration: float):
+        self.rate = rate
+        self.duration = duration
+        self.max_rate = rate
+
+    def rate_at(self, t: float) -> float:
+        return self.rate
+
+    def expected_arrivals(self) -> float:
+        return self.rate * self.duration
+
+    def times(self) -> Iterator[float]:
+        if self.rate <= 0:
+            return
+        n = 0
+        while True:
+            t = n / self.rate
+            if t >= self.duration:
+                return
+            yield t
+            n += 1
+
+
+class StepRate:
+    """Piecewise constant rate: [(seconds, rate), ...]"""
+
+    def __init__(self, steps: List[Tuple[float, float]]):
+        if not steps:
+            raise ValueError("StepRate needs at least one (seconds, rate) step")
+        self.steps = steps
+        self.duration = sum(seconds for seconds, _ in steps)
+        self.max_rate = max(rate for _, rate in steps)
+
+    def rate_at(self, t: float) -> float:
+        elapsed = 0.0
+        for seconds, rate in self.steps:
+            elapsed += seconds
+            if t < elapsed:
+                return rate
+        return 0.0
+
+    def expected_arrivals(self) -> float:
+        return sum(seconds * rate for seconds, rate in self.steps)
+
+    def times(self) -> Iterator[float]:
+        offset = 0.0
+        for seconds, rate in self.steps:
+            for t in ConstantRate(rate, seconds).times():
+                yield offset + t
+            offset += seconds
+
+
+class RampRate:
+    """Rate changing linearly from start_rate to end_rate over the duration"""
+
+    def __init__(self, start_rate: float, end_rate: float, duration: float):
+        self.start_rate = start_rate
+        self.end_rate = end_rate
+        self.duration = duration
+        self.max_rate = max(start_rate, end_rate)
+        self._slope = (end_rate - start_rate) / duration if duration > 0 else 0.0
+
+    def rate_at(self, t: float) -> float:
+        return self.start_rate + self._slope * t
+
+    def expected_arrivals(self) -> float:
+        return (self.start_rate + self.end_rate) / 2 * self.duration
+
+    def times(self) -> Iterator[float]:
+        # Invert the cumulative count start_rate*t + slope*t^2/2 = n
+        r0, k = self.start_rate, self._slope
+        n = 0
+        while True:
+            if abs(k) < 1e-12:
+                if r0 <= 0:
+                    return
+                t = n / r0
+            else:
+                disc = r0 * r0 + 2 * k * n
+                if disc < 0:
+                    return
+                t = (math.sqrt(disc) - r0) / k
+            if t >= self.duration:
+                return
+            yield t
+            n += 1
+
+
+def poisson_times(profile, seed: Optional[int] = None) -> Iterator[float]:
+    """Poisson arrivals following the profile's rate (thinning of a max-rate process)"""
+    if profile.max_rate <= 0:
+        return
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        t += rng.expovariate(profile.max_rate)
+        if t >= profile.duration:
+            return
+        if rng.random() * profile.max_rate <= profile.rate_at(t):
+            yield t
+
+
+def build_schedule(kind: str, rate: float, duration: float, start_rate: float = 0.0,
+                   steps: Optional[List[Tuple[float, float]]] = None):
+    """Build a rate profile by name: constant, ramp or step"""
+    if kind == "constant":
+        return ConstantRate(rate, duration)
+    if kind == "ramp":
+        return RampRate(start_rate, rate, duration)
+    if kind == "step":
+        return StepRate(steps or [(duration, rate)])
+    raise ValueError(f"Unknown arrival profile: {kind}")
+
+
+def parse_steps(spec: str) -> List[Tuple[float, float]]:
+    """Parse "30:10,30:20" into [(30.0, 10.0), (30.0, 20.0)] (seconds:rate pairs)"""
+    steps = []
+    for part in spec.split(","):
+        seconds, rate = part.split(":")
+        steps.append((float(seconds), float(rate)))
+    return steps
+
+
+class ScheduleReport:
+    """How closely the issued requests followed the intended schedule"""
+
+    def __init__(self, intended_rate: float):
+        self.intended_rate = intended_rate
+        self.started_at = 0.0  # Unix time the first arrival was due
+        self.issued = 0
+        self.elapsed = 0.0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.late = 0  # Issued more than LATE_THRESHOLD behind schedule
+
+    LATE_THRESHOLD = 0.010
+
+    def record_lag(self, lag: float):
+        self.issued += 1
+        self.lag_total += lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+        if lag > self.LATE_THRESHOLD:
+            self.late += 1
+
+    def merge(self, other: "ScheduleReport"):
+        """Combine reports from schedulers that ran side by side (other processes or hosts)"""
+        self.intended_rate += other.intended_rate
+        self.elapsed = max(self.elapsed, other.elapsed)
+        if other.started_at and (not self.started_at or other.started_at < self.started_at):
+            self.started_at = other.started_at
+        self.lag_total += other.lag_total
+        self.lag_max = max(self.lag_max, other.lag_max)
+        self.late += other.late
+        self.issued += other.issued
+        return self
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScheduleReport":
+        report = cls(data["intended_rate"])
+        report.__dict__.update(data)
+        return report
+
+    @property
+    def issued_rate(self) -> float:
+        return self.issued / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        avg_lag = self.lag_total / self.issued if self.issued else 0.0
+        late_pct = self.late / self.issued * 100 if self.issued else 0.0
+        return (f"intended {self.intended_rate:.1f} req/s, issued {self.issued_rate:.1f} req/s "
+                f"({self.issued} requests); send lag avg {avg_lag * 1000:.1f}ms, "
+                f"max {self.lag_max * 1000:.1f}ms, {late_pct:.1f}% > {self.LATE_THRESHOLD * 1000:.0f}ms late")
+
+
+async def run_open_model(profile, request: Callable[[], Awaitable], poisson: bool = False,
+                         seed: Optional[int] = None, max_in_flight: int = 10000,
+                         report: Optional[ScheduleReport] = None) -> ScheduleReport:
+    """Issue request() at the profile's arrival times without waiting for responses"""
+    # A caller-supplied report can be watched (e.g. by an exporter) while the schedule runs
+    times = poisson_times(profile, seed) if poisson else profile.times()
+    if report is None:
+        report = ScheduleReport(0.0)
+    report.intended_rate = profile.expected_arrivals() / profile.duration if profile.duration else 0.0
+    capacity = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async def issue(intended_ns: int):
+        # Requests made by this arrival add the lag to their latency, i.e. they
+        # are measured from the intended send time (coordinated omission correction)
+        send_lag_ns.set(max(time.perf_counter_ns() - intended_ns, 0))
+        try:
+            await request()
+        finally:
+            capacity.release()
+
+    start_ns = time.perf_counter_ns()
+    report.started_at = time.time()
+    for offset in times:
+        intended_ns = start_ns + int(offset * 1e9)
+        delay_ns = intended_ns - time.perf_counter_ns()
+        if delay_ns > 0:
+            await asyncio.sleep(delay_ns / 1e9)
+        # Hitting the in-flight cap delays the send, which shows up as lag
+        await capacity.acquire()
+        report.record_lag(max(time.perf_counter_ns() - intended_ns, 0) / 1e9)
+        task = asyncio.create_task(issue(intended_ns))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    report.elapsed = max((time.perf_counter_ns() - start_ns) / 1e9, profile.duration)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return report
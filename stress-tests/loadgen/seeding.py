@@ -0,0 +1,182 @@
+"""
+Concurrent bulk seeding pipeline
+Items are pulled lazily from an (async) iterable by a fixed set of workers, the
+number of requests in flight adapts to the backend (AIMD: grow while it
+keeps up, halve on 429/5xx) and failed attempts are retried with
+jittered exponential backoff
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+import aiohttp
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+DECREASE_COOLDOWN = 1.0  # Seconds between two multiplicative decreases
+LOGGED_ERRORS = 10  # Unexpected task errors logged per pipeline run, the rest are only counted
+SKIPPED = object()  # Task result for items that already exist
+_EXHAUSTED = object()
+
+
+class RetryableError(Exception):
+    """Raised by a seeding task when the request should be retried"""
+
+    def __init__(self, status: int = 0, retry_after: Optional[float] = None):
+        super().__init__(f"retryable response {status}" if status else "retryable error")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response: aiohttp.ClientResponse) -> Optional[float]:
+    """Retry-After header in seconds (only the delta-seconds form)"""
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveConcurrency:
+    """Limit on requests in flight that backs off when the backend is overloaded"""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.limit = float(min(initial, maximum))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def on_success(self):
+        # Additive increase: about +1 per limit's worth of successful requests
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+class SeedStats:
+    """Outcome counters for one pipeline run"""
+
+    def __init__(self, label: str, total: Optional[int] = None):
+        self.label = label
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + self.failed + self.skipped
+
+    @property
+    def rate(self) -> float:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def progress(self, concurrency: AdaptiveConcurrency) -> str:
+        rate = self.rate
+        if self.total:
+            remaining = (self.total - self.done) / rate if rate else 0
+            position = f"{self.done}/{self.total} ({self.done / self.total * 100:.0f}%)"
+            eta = f", ETA {int(remaining) // 60}m{int(remaining) % 60:02d}s"
+        else:
+            position, eta = str(self.done), ""
+        return (f"{self.label}: {position} at {rate:.1f}/s{eta}, {self.failed} failed, "
+                f"{self.skipped} skipped, {self.retries} retried, concurrency {int(concurrency.limit)}")
+
+
+async def run_pipeline(items: Union[Iterable[Any], AsyncIterable[Any]], task: Callable[[Any], Awaitable[Any]],
+                       stats: SeedStats, concurrency: AdaptiveConcurrency, on_result: Callable[[Any, Any], None] = None,
+                       max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                       progress: Callable[[str], None] = None, progress_interval: float = 2.0) -> SeedStats:
+    """Run task(item) for every item; falsy results and unexpected errors count as failed, SKIPPED as skipped,
+    RetryableError, client errors and timeouts are retried"""
+    if hasattr(items, "__aiter__"):
+        # Async generators can't be advanced by two workers at once
+        async_iterator = items.__aiter__()
+        pulling = asyncio.Lock()
+
+        async def next_item():
+            async with pulling:
+                return await anext(async_iterator, _EXHAUSTED)
+    else:
+        iterator = iter(items)
+
+        async def next_item():
+            return next(iterator, _EXHAUSTED)
+
+    unexpected = 0
+
+    def report_error(item: Any, error: Exception):
+        nonlocal unexpected
+        unexpected += 1
+        if not progress or unexpected > LOGGED_ERRORS:
+            return
+        progress(f"{stats.label}: {str(item)[:80]} failed: {type(error).__name__}: {error}"
+                 + (" (further errors are only counted)" if unexpected == LOGGED_ERRORS else ""))
+
+    async def worker():
+        while (item := await next_item()) is not _EXHAUSTED:
+            result = None
+            for attempt in range(max_attempts):
+                await concurrency.acquire()
+                try:
+                    result = await task(item)
+                    concurrency.on_success()
+                    break
+                except (RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    concurrency.on_overload()
+                    retry_after = getattr(e, "retry_after", None)
+                except Exception as e:
+                    # A bug or a malformed response fails this item, not the pipeline
+                    report_error(item, e)
+                    break
+                finally:
+                    await concurrency.release()
+                if attempt + 1 < max_attempts:
+                    stats.retries += 1
+                    delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+                    await asyncio.sleep(max(delay, retry_after or 0))
+            if result is SKIPPED:
+                stats.skipped += 1
+            elif result:
+                stats.succeeded += 1
+                if on_result:
+                    on_result(item, result)
+            else:
+                stats.failed += 1
+
+    async def report():
+        while True:
+            await asyncio.sleep(progress_interval)
+            progress(stats.progress(concurrency))
+
+    reporter = asyncio.create_task(report()) if progress else None
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency.maximum)))
+    finally:
+        if reporter:
+            reporter.cancel()
+        stats.finished = time.monotonic()
+    if progress:
+        progress(stats.progress(concurrency))
+    return stats
@@ -0,0 +1,130 @@
+"""
+Service level objectives
+An objective bounds one statistic of an operation over a measured window:
+a latency percentile ("submit_result:p99<500ms", measured from the
+intended send time so queueing in an overloaded run counts) or the error
+rate ("*:errors<0.1%", where "*" holds every operation to the bound on its
+own). Operations without samples in the window are not judged
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from loadgen import actions
+from loadgen.metrics import Snapshot
+
+ALL = "*"
+LATENCY_STATS = {"p50": 50, "p90": 90, "p95": 95, "p99": 99, "p99.9": 99.9, "max": 100, "mean": None}
+ERRORS = "errors"
+UNITS = {"us": 1e-6, "ms": 1e-3, "s": 1.0}
+
+_SPEC = re.compile(r"^\s*(?P<operation>[\w*]+)\s*:\s*(?P<stat>[\w.]+)\s*<\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>us|ms|s|%)?\s*$")
+
+
+class SloError(ValueError):
+    """An objective that cannot be parsed"""
+
+
+class Objective:
+    """operation:stat<limit, the limit in seconds for latencies and as a fraction for errors"""
+
+    def __init__(self, operation: str, stat: str, limit: float):
+        self.operation = operation
+        self.stat = stat
+        self.limit = limit
+
+    @property
+    def latency(self) -> bool:
+        return self.stat != ERRORS
+
+    def measure(self, snapshot: Snapshot, operation: str, errors: Dict[str, int]) -> Optional[float]:
+        """The statistic for one operation of the window, None when it has no samples"""
+        histogram = snapshot.corrected.get(operation)
+        if histogram is None or not histogram.count:
+            return None
+        if self.stat == ERRORS:
+            return errors.get(operation, 0) / histogram.count
+        if self.stat == "mean":
+            return histogram.mean_ns / 1e9
+        return histogram.percentile(LATENCY_STATS[self.stat])
+
+    def format_value(self, value: float) -> str:
+        return f"{value:.2%}" if self.stat == ERRORS else f"{value * 1000:.1f}ms"
+
+    def __str__(self) -> str:
+        limit = f"{self.limit * 100:g}%" if self.stat == ERRORS else f"{self.limit * 1000:g}ms"
+        return f"{self.operation}:{self.stat}<{limit}"
+
+
+class Verdict:
+    """One objective judged on one operation"""
+
+    def __init__(self, objective: Objective, operation: str, value: float):
+        self.objective = objective
+        self.operation = operation
+        self.value = value
+
+    @property
+    def met(self) -> bool:
+        return self.value < self.objective.limit
+
+    @property
+    def load(self) -> float:
+        """Measured value as a share of the limit (1.0 is on the limit)"""
+        return self.value / self.objective.limit if self.objective.limit else float("inf")
+
+    def to_dict(self) -> Dict:
+        return {"objective": str(self.objective), "operation": self.operation, "value": self.value,
+                "met": self.met}
+
+    def __str__(self) -> str:
+        mark = "✓" if self.met else "✗"
+        return (f"{mark} {self.operation} {self.objective.stat} {self.objective.format_value(self.value)} "
+                f"(limit {self.objective.format_value(self.objective.limit)})")
+
+
+def parse_objective(spec: str) -> Objective:
+    """Parse "OPERATION:STAT<LIMIT" such as "submit_result:p99<500ms" or "*:errors<0.1%" """
+    match = _SPEC.match(spec)
+    if not match:
+        raise SloError(f"Bad objective '{spec}', expected OPERATION:STAT<LIMIT such as submit_result:p99<500ms")
+    operation, stat, value, unit = match.group("operation", "stat", "value", "unit")
+    if operation != ALL and operation not in actions.OPERATION_COUNTERS:
+        raise SloError(f"Objective '{spec}': unknown operation {operation} "
+                       f"(operations: {', '.join(actions.OPERATION_COUNTERS)} or {ALL})")
+    if stat == ERRORS:
+        if unit not in (None, "%"):
+            raise SloError(f"Objective '{spec}': an error rate is a fraction or a percentage")
+        limit = float(value) / 100 if unit == "%" else float(value)
+    elif stat in LATENCY_STATS:
+        if unit == "%":
+            raise SloError(f"Objective '{spec}': a latency needs a time unit (us, ms or s)")
+        limit = float(value) * UNITS[unit or "ms"]
+    else:
+        raise SloError(f"Objective '{spec}': unknown statistic {stat} "
+                       f"(statistics: {', '.join(LATENCY_STATS)}, {ERRORS})")
+    if limit <= 0:
+        raise SloError(f"Objective '{spec}': the limit must be > 0")
+    return Objective(operation, stat, limit)
+
+
+def error_counts(snapshot: Snapshot) -> Dict[str, int]:
+    """Failed requests (no response or status >= 400) per operation"""
+    errors: Dict[str, int] = {}
+    for (operation, status), n in snapshot.statuses.items():
+        if status == 0 or status >= 400:
+            errors[operation] = errors.get(operation, 0) + n
+    return errors
+
+
+def evaluate(objectives: List[Objective], snapshot: Snapshot) -> List[Verdict]:
+    """Every objective judged on every operation it covers that has samples in the window"""
+    errors = error_counts(snapshot)
+    verdicts = []
+    for objective in objectives:
+        operations = snapshot.operations() if objective.operation == ALL else [objective.operation]
+        for operation in operations:
+            value = objective.measure(snapshot, operation, errors)
+            if value is not None:
+                verdicts.append(Verdict(objective, operation, value))
+    return verdicts
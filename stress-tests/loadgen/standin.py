@@ -0,0 +1,761 @@
+"""
+In-process QuizHub stand-in server
+A small HTTP/1.1 server on a bare asyncio protocol that answers the routes
+the stress scripts use from in-memory state, shaped like the real services'
+responses; quizzes carry a strong ETag and are answered 304 to a matching
+If-None-Match. Latency and error rates can be injected globally or per route,
+so the load tools can be exercised and benchmarked without a cluster; with
+no faults it serves tens of thousands of requests per second per core
+
+Run:  python -m loadgen.standin --port 8080 --latency uniform:2:10 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote
+
+from loadgen import corpus, engine
+
+DEFAULT_PORT = 8080
+MAX_HEAD = 64 * 1024
+LEADERBOARD_REFRESH = 1.0  # Seconds a rendered leaderboard is served before it is rebuilt
+TOKEN_TTL = 3600.0  # Token lifetime in seconds, as the UserService's JwtHelper issues them
+JWT_HEADER = base64.urlsafe_b64encode(b'{"alg":"none","typ":"JWT"}').rstrip(b"=").decode()
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized",
+    403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    411: "Length Required", 415: "Unsupported Media Type", 429: "Too Many Requests",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    """Raised by a handler to answer with an error status"""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.message = message or STATUS_TEXT.get(status, "")
+
+
+class Request:
+    """One parsed request as seen by a route handler"""
+
+    __slots__ = ("method", "path", "query_string", "headers", "body", "params", "_query")
+
+    def __init__(self, method: str, path: str, query_string: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.query_string = query_string
+        self.headers = headers
+        self.body = body
+        self.params: Tuple[str, ...] = ()
+        self._query = None
+
+    def query(self, name: str, default: int) -> int:
+        if self._query is None:
+            self._query = parse_qs(self.query_string)
+        try:
+            return int(self._query[name][0])
+        except (KeyError, ValueError):
+            return default
+
+    def json(self) -> Dict:
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, "Invalid JSON body")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Expected a JSON object")
+        return data
+
+    def form(self) -> Dict[str, str]:
+        """Text fields of a multipart/form-data body"""
+        content_type = self.headers.get("content-type", "")
+        if not content_type.startswith("multipart/form-data"):
+            raise HttpError(415)
+        boundary = content_type.partition("boundary=")[2].split(";")[0].strip().strip('"')
+        if not boundary:
+            raise HttpError(400, "Missing multipart boundary")
+        fields = {}
+        for part in self.body.split(b"--" + boundary.encode("latin-1"))[1:]:
+            head, _, value = part.partition(b"\r\n\r\n")
+            match = re.search(rb'name="([^"]*)"', head)
+            if match:
+                fields[match.group(1).decode("utf-8")] = value[:-2].decode("utf-8", "replace")
+        return fields
+
+
+class Faults:
+    """Injected latency (milliseconds, integer distribution) and error rate"""
+
+    def __init__(self, latency: str = "const:0", error_rate: float = 0.0, error_status: int = 503):
+        self.latency = corpus.parse_distribution(latency, low=0)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.none = self.latency.kind == "const" and not self.latency.params[0] and not error_rate
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency.sample(rng) / 1000.0
+
+    def error(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the current ETag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def grade(question: Dict, answer: str) -> Tuple[float, bool]:
+    """Points and correctness of one answer, as the ResultService GradingService awards them
+
+    Choice questions are answered with answer IDs (comma-separated for
+    multiple choice, which earns a share of the points per correct pick),
+    true/false and fill-in questions with the answer text
+    """
+    if not answer.strip():
+        return 0, False
+    options = question["answers"]
+    correct = [a for a in options if a["isCorrect"]]
+    kind = question["questionType"]
+    if kind == corpus.SINGLE:
+        is_correct = any(a["id"] == answer for a in correct)
+        return (question["points"] if is_correct else 0), is_correct
+    if kind == corpus.MULTIPLE:
+        if not correct:
+            return 0, False
+        picked = [given.strip() for given in answer.split(",")]
+        right = {a["id"] for a in correct}
+        known = {a["id"] for a in options}
+        hits = sum(1 for given in picked if given in right)
+        points = min(round(question["points"] / len(correct) * hits, 2), question["points"])
+        wrong = any(given in known and given not in right for given in picked)
+        return points, not wrong and right <= set(picked) and len(picked) == len(correct)
+    if kind == corpus.TRUE_FALSE:
+        is_correct = any(a["text"].lower() == answer.lower() for a in correct)
+    else:
+        is_correct = any(a["text"] == answer if question["isCaseSensitive"] else a["text"].lower() == answer.lower()
+                         for a in correct)
+    return (question["points"] if is_correct else 0), is_correct
+
+
+class QuizHubState:
+    """In-memory users, quizzes and results behind the stand-in routes"""
+
+    def __init__(self, token_ttl: float = TOKEN_TTL):
+        self.token_ttl = token_ttl
+        self.users: Dict[str, Dict] = {}
+        self.passwords: Dict[str, str] = {}
+        self.logins: Dict[str, str] = {}  # lower-cased username and email -> user id
+        self.tokens: Dict[str, Tuple[str, float]] = {}  # token -> (user id, expires at)
+        self.quizzes: Dict[str, Dict] = {}
+        self.quiz_bodies: Dict[str, bytes] = {}  # Pre-encoded with-questions responses
+        self.quiz_etags: Dict[str, str] = {}  # Strong validators of quiz_bodies
+        self.by_title: List[Tuple[str, str]] = []  # Sorted (title, id), the services' listing order
+        self.by_category: Dict[str, List[Tuple[str, str]]] = {}
+        self.results: Dict[str, Dict] = {}
+        self.user_results: Dict[str, List[str]] = {}
+        # Best (score, time taken, completed at) per (user, quiz), what the leaderboards rank
+        self.best: Dict[Tuple[str, str], Tuple[float, int, str]] = {}
+        self.version = 0  # Bumped by every result, so cached leaderboards know they are stale
+        self._leaderboards: Dict[str, Tuple[float, int, bytes]] = {}
+
+    # Users
+
+    def authenticate(self, request: Request) -> Dict:
+        authorization = request.headers.get("authorization", "")
+        user_id, expires = self.tokens.get(authorization[7:], (None, 0.0))
+        if not authorization.startswith("Bearer ") or user_id not in self.users or expires < time.time():
+            raise HttpError(401)
+        return self.users[user_id]
+
+    def require_admin(self, request: Request) -> Dict:
+        user = self.authenticate(request)
+        if user["role"] not in ("Admin", "Teacher"):
+            raise HttpError(403)
+        return user
+
+    def _session(self, user: Dict) -> Dict:
+        # JWT-shaped, so clients can read the expiry like the UserService's tokens
+        expires = time.time() + self.token_ttl
+        claims = json.dumps({"sub": user["id"], "jti": uuid.uuid4().hex, "exp": int(expires)}).encode()
+        token = f"{JWT_HEADER}.{base64.urlsafe_b64encode(claims).rstrip(b'=').decode()}.standin"
+        self.tokens[token] = (user["id"], float(int(expires)))
+        return {"token": token, "user": user}
+
+    def register(self, request: Request):
+        form = request.form()
+        username, email, password = form.get("username", ""), form.get("email", ""), form.get("password", "")
+        if not 3 <= len(username) <= 50 or "@" not in email or len(password) < 8:
+            raise HttpError(400, "Invalid registration data")
+        if username.lower() in self.logins or email.lower() in self.logins:
+            raise HttpError(409, "User already exists")
+        # Like the UserService, every account starts as a User whatever the form says
+        user = {"id": str(uuid.uuid4()), "username": username, "email": email,
+                "firstName": form.get("firstName", ""), "lastName": form.get("lastName", ""),
+                "role": "User", "avatarImage": None}
+        self.users[user["id"]] = user
+        self.passwords[user["id"]] = password
+        self.logins[username.lower()] = self.logins[email.lower()] = user["id"]
+        return 200, self._session(user)
+
+    def login(self, request: Request):
+        data = request.json()
+        user_id = self.logins.get(str(data.get("usernameOrEmail", "")).lower())
+        if user_id is None or self.passwords.get(user_id) != data.get("password"):
+            raise HttpError(401, "Invalid username or password")
+        return 200, self._session(self.users[user_id])
+
+    def current_user(self, request: Request):
+        return 200, self.authenticate(request)
+
+    def list_users(self, request: Request):
+        self.authenticate(request)
+        return 200, list(self.users.values())
+
+    def get_user(self, request: Request):
+        self.authenticate(request)
+        user = self.users.get(request.params[0])
+        if user is None:
+            raise HttpError(404)
+        return 200, user
+
+    def promote(self, request: Request):
+        self.authenticate(request)
+        user = self.users.get(request.params[0])
+        if user is None:
+            raise HttpError(404)
+        user["role"] = "Admin"
+        return 200, user
+
+    def delete_user(self, request: Request):
+        self.authenticate(request)
+        user = self.users.pop(request.params[0], None)
+        if user is None:
+            raise HttpError(404)
+        self.logins.pop(user["username"].lower(), None)
+        self.logins.pop(user["email"].lower(), None)
+        return 200, "User deleted successfully."
+
+    # Quizzes
+
+    def _store_quiz(self, quiz: Dict):
+        self.quizzes[quiz["id"]] = quiz
+        body = self.quiz_bodies[quiz["id"]] = json.dumps(quiz).encode("utf-8")
+        self.quiz_etags[quiz["id"]] = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        key = (quiz["title"], quiz["id"])
+        bisect.insort(self.by_title, key)
+        bisect.insort(self.by_category.setdefault(quiz["category"].lower(), []), key)
+
+    def _unlist_quiz(self, quiz: Dict):
+        key = (quiz["title"], quiz["id"])
+        for listing in (self.by_title, self.by_category.get(quiz["category"].lower(), [])):
+            index = bisect.bisect_left(listing, key)
+            if index < len(listing) and listing[index] == key:
+                del listing[index]
+
+    def _quiz_from(self, data: Dict, quiz_id: str, owner: str) -> Dict:
+        questions = []
+        for order, question in enumerate(data.get("questions") or []):
+            questions.append({
+                "id": str(uuid.uuid4()), "text": question.get("text", ""),
+                "questionType": question.get("questionType", 0), "points": question.get("points", 1),
+                "isCaseSensitive": question.get("isCaseSensitive", False),
+                "explanation": question.get("explanation"), "order": order,
+                "answers": [{"id": str(uuid.uuid4()), "text": a.get("text", ""), "isCorrect": bool(a.get("isCorrect"))}
+                            for a in question.get("answers") or []],
+            })
+        if not data.get("title") or not data.get("category"):
+            raise HttpError(400, "Title and category are required")
+        return {"id": quiz_id, "title": data["title"], "description": data.get("description"),
+                "category": data["category"], "difficulty": data.get("difficulty", 1),
+                "timeLimitSeconds": data.get("timeLimitSeconds", 0), "createdByUserId": owner,
+                "questions": questions}
+
+    def _page(self, listing: List[Tuple[str, str]], request: Request):
+        page = max(request.query("page", 1), 1)
+        page_size = request.query("pageSize", 10)
+        if not 1 <= page_size <= 100:
+            page_size = 10
+        ids = [quiz_id for _, quiz_id in listing[(page - 1) * page_size:page * page_size]]
+        return 200, b"[" + b",".join(self.quiz_bodies[quiz_id] for quiz_id in ids) + b"]"
+
+    def list_quizzes(self, request: Request):
+        return self._page(self.by_title, request)
+
+    def quizzes_by_category(self, request: Request):
+        return self._page(self.by_category.get(request.params[0].lower(), []), request)
+
+    def get_quiz(self, request: Request):
+        body = self.quiz_bodies.get(request.params[0])
+        if body is None:
+            raise HttpError(404, "Quiz not found")
+        etag = self.quiz_etags[request.params[0]]
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return 304, b"", {"ETag": etag}
+        return 200, body, {"ETag": etag}
+
+    def create_quiz(self, request: Request):
+        user = self.require_admin(request)
+        quiz = self._quiz_from(request.json(), str(uuid.uuid4()), user["id"])
+        self._store_quiz(quiz)
+        return 201, self.quiz_bodies[quiz["id"]]
+
+    def update_quiz(self, request: Request):
+        user = self.require_admin(request)
+        old = self.quizzes.get(request.params[0])
+        if old is None:
+            raise HttpError(404, "Quiz not found")
+        data = request.json()
+        quiz = self._quiz_from(dict(old, **data), old["id"], old["createdByUserId"] or user["id"])
+        if not data.get("questions"):
+            quiz["questions"] = old["questions"]
+        self._unlist_quiz(old)
+        self._store_quiz(quiz)
+        return 200, self.quiz_bodies[quiz["id"]]
+
+    def delete_quiz(self, request: Request):
+        self.require_admin(request)
+        quiz = self.quizzes.pop(request.params[0], None)
+        if quiz is None:
+            raise HttpError(404, "Quiz not found")
+        del self.quiz_bodies[quiz["id"]]
+        del self.quiz_etags[quiz["id"]]
+        self._unlist_quiz(quiz)
+        return 204, b""
+
+    # Results
+
+    def submit_result(self, request: Request):
+        user = self.authenticate(request)
+        data = request.json()
+        quiz = self.quizzes.get(str(data.get("quizId")))
+        if quiz is None:
+            raise HttpError(404, "Quiz not found")
+        given = {str(a.get("questionId")): str(a.get("givenAnswer", "")) for a in data.get("answers") or []}
+        score, maximum, answers = 0.0, 0.0, []
+        for question in quiz["questions"]:
+            answer = given.get(question["id"], "")
+            points, is_correct = grade(question, answer)
+            maximum += question["points"]
+            score += points
+            answers.append({"id": str(uuid.uuid4()), "questionId": question["id"], "givenAnswer": answer,
+                            "pointsAwarded": points, "isCorrect": is_correct,
+                            "explanation": question["explanation"]})
+        time_taken = int(data.get("timeTakenSeconds") or data.get("timeTaken") or 0)
+        result = {"id": str(uuid.uuid4()), "userId": user["id"], "quizId": quiz["id"], "score": score,
+                  "maxPossibleScore": maximum, "percentageScore": score / maximum * 100 if maximum else 0,
+                  "timeTakenSeconds": time_taken, "completedAt": _now(), "answers": answers,
+                  "passed": maximum > 0 and score / maximum >= 0.5, "passingScore": 50.0}
+        self.results[result["id"]] = result
+        self.user_results.setdefault(user["id"], []).append(result["id"])
+        key = (user["id"], quiz["id"])
+        best = self.best.get(key)
+        if best is None or (score, -time_taken) > (best[0], -best[1]):
+            self.best[key] = (score, time_taken, result["completedAt"])
+            self.version += 1
+        return 201, result
+
+    def get_result(self, request: Request):
+        self.authenticate(request)
+        result = self.results.get(request.params[0])
+        if result is None:
+            raise HttpError(404)
+        return 200, result
+
+    def user_results_page(self, request: Request):
+        self.authenticate(request)
+        ids = self.user_results.get(request.params[0], [])[::-1]
+        page, page_size = max(request.query("page", 1), 1), request.query("pageSize", 10)
+        return 200, [self.results[i] for i in ids[(page - 1) * page_size:page * page_size]]
+
+    def user_stats(self, request: Request):
+        self.authenticate(request)
+        user_id = request.params[0]
+        results = [self.results[i] for i in self.user_results.get(user_id, [])]
+        scores = [r["score"] for r in results]
+        average_time = sum(r["timeTakenSeconds"] for r in results) / len(results) if results else 0
+        return 200, {"userId": user_id, "userName": self.users.get(user_id, {}).get("username", ""),
+                     "totalQuizzesTaken": len(results), "totalScore": sum(scores),
+                     "averageScore": sum(scores) / len(scores) if scores else 0,
+                     "bestScore": max(scores, default=0),
+                     "averageTimePerQuiz": time.strftime("%H:%M:%S", time.gmtime(average_time))}
+
+    def _entry(self, rank: int, user_id: str, score: float, time_taken: int, completed_at: str) -> Dict:
+        user = self.users.get(user_id, {})
+        return {"rank": rank, "userId": user_id, "userName": user.get("username", "Unknown"),
+                "userEmail": user.get("email"), "score": score, "timeTakenSeconds": time_taken,
+                "completedAt": completed_at}
+
+    def _cached(self, key: str, build: Callable[[], object]) -> bytes:
+        """Rendered leaderboard, rebuilt at most every LEADERBOARD_REFRESH seconds while results arrive"""
+        now = time.monotonic()
+        cached = self._leaderboards.get(key)
+        if cached and (cached[1] == self.version or now - cached[0] < LEADERBOARD_REFRESH):
+            return cached[2]
+        body = json.dumps(build()).encode("utf-8")
+        self._leaderboards[key] = (now, self.version, body)
+        return body
+
+    def _totals(self, top: int, category: Optional[str]) -> List[Dict]:
+        totals: Dict[str, List] = {}
+        for (user_id, quiz_id), (score, _, completed_at) in self.best.items():
+            if category is not None:
+                quiz = self.quizzes.get(quiz_id)
+                if quiz is None or quiz["category"].lower() != category:
+                    continue
+            total = totals.setdefault(user_id, [0.0, 0, completed_at])
+            total[0] += score
+            total[1] += 1
+            total[2] = max(total[2], completed_at)
+        ranked = heapq.nlargest(top, totals.items(), key=lambda item: item[1][0])
+        # Like the service, the global board reports the number of quizzes taken as the time
+        return [self._entry(rank, user_id, score, taken, completed_at)
+                for rank, (user_id, (score, taken, completed_at)) in enumerate(ranked, 1)]
+
+    def _top(self, request: Request) -> int:
+        top = request.query("top", 100)
+        return top if 1 <= top <= 1000 else 100
+
+    def global_leaderboard(self, request: Request):
+        top = self._top(request)
+        return 200, self._cached(f"global:{top}", lambda: self._totals(top, None))
+
+    def category_leaderboard(self, request: Request):
+        top, category = self._top(request), request.params[0].lower()
+        return 200, self._cached(f"category:{category}:{top}", lambda: self._totals(top, category))
+
+    def quiz_leaderboard(self, request: Request):
+        top, quiz_id = self._top(request), request.params[0]
+        quiz = self.quizzes.get(quiz_id)
+        if quiz is None:
+            raise HttpError(404, "Quiz not found")
+
+        def build():
+            scores = [(user_id, best) for (user_id, q), best in self.best.items() if q == quiz_id]
+            ranked = heapq.nsmallest(top, scores, key=lambda item: (-item[1][0], item[1][1]))
+            return {"quizId": quiz_id, "quizTitle": quiz["title"],
+                    "entries": [self._entry(rank, user_id, *best) for rank, (user_id, best) in enumerate(ranked, 1)]}
+
+        return 200, self._cached(f"quiz:{quiz_id}:{top}", build)
+
+    def stats(self, request: Request):
+        return 200, {"users": len(self.users), "quizzes": len(self.quizzes), "results": len(self.results)}
+
+
+_SEGMENT = "([^/]+)"
+
+
+class StandInServer:
+    """Routes, fault injection and the asyncio server around a QuizHubState"""
+
+    def __init__(self, faults: Faults = None, route_faults: Dict[str, Faults] = None, seed: Optional[int] = None,
+                 token_ttl: float = TOKEN_TTL):
+        self.state = QuizHubState(token_ttl)
+        self.faults = faults or Faults()
+        self.route_faults = route_faults or {}
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.injected_errors = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        s = self.state
+        # (name, method, path pattern, handler); {} matches one path segment
+        self.routes = [
+            ("register", "POST", "/api/users/register", s.register),
+            ("register", "POST", "/api/users/auth/register", s.register),
+            ("login", "POST", "/api/users/login", s.login),
+            ("login", "POST", "/api/users/auth/login", s.login),
+            ("current_user", "GET", "/api/users/auth/currentUser", s.current_user),
+            ("users", "GET", "/api/users", s.list_users),
+            ("user", "GET", "/api/users/{}", s.get_user),
+            ("promote", "PUT", "/api/users/{}/promote", s.promote),
+            ("delete_user", "DELETE", "/api/users/{}", s.delete_user),
+            ("quizzes", "GET", "/api/quizzes", s.list_quizzes),
+            ("quizzes_by_category", "GET", "/api/quizzes/category/{}", s.quizzes_by_category),
+            ("quiz", "GET", "/api/quizzes/{}", s.get_quiz),
+            ("quiz_with_questions", "GET", "/api/quizzes/{}/with-questions", s.get_quiz),
+            ("create_quiz", "POST", "/api/quizzes", s.create_quiz),
+            ("update_quiz", "PUT", "/api/quizzes/{}", s.update_quiz),
+            ("delete_quiz", "DELETE", "/api/quizzes/{}", s.delete_quiz),
+            ("submit_result", "POST", "/api/results", s.submit_result),
+            ("leaderboard_global", "GET", "/api/results/leaderboard/global", s.global_leaderboard),
+            ("leaderboard_quiz", "GET", "/api/results/leaderboard/quiz/{}", s.quiz_leaderboard),
+            ("leaderboard_category", "GET", "/api/results/leaderboard/category/{}", s.category_leaderboard),
+            ("user_stats", "GET", "/api/results/stats/{}", s.user_stats),
+            ("user_results", "GET", "/api/results/user/{}", s.user_results_page),
+            ("result", "GET", "/api/results/{}", s.get_result),
+            ("standin_stats", "GET", "/_standin/stats", s.stats),
+        ]
+        unknown = set(self.route_faults) - {name for name, *_ in self.routes}
+        if unknown:
+            raise ValueError(f"Unknown routes for faults: {', '.join(sorted(unknown))}")
+        # Static paths resolve with one dict lookup, the rest by segment count then regex
+        self._static: Dict[Tuple[str, str], Tuple] = {}
+        self._patterns: Dict[int, List[Tuple]] = {}
+        for name, method, path, handler in self.routes:
+            entry = (name, handler, self.route_faults.get(name, self.faults))
+            if "{}" not in path:
+                self._static[method, path] = entry
+            else:
+                pattern = re.compile("^" + re.escape(path).replace(r"\{\}", _SEGMENT) + "$")
+                self._patterns.setdefault(path.count("/"), []).append((method, pattern, entry))
+
+    def _match(self, method: str, path: str):
+        entry = self._static.get((method, path.rstrip("/") or "/"))
+        if entry:
+            return entry, ()
+        allowed = False
+        for route_method, pattern, entry in self._patterns.get(path.rstrip("/").count("/"), ()):
+            match = pattern.match(path.rstrip("/"))
+            if match:
+                if route_method == method:
+                    return entry, tuple(unquote(p) for p in match.groups())
+                allowed = True
+        raise HttpError(405 if allowed else 404)
+
+    def handle(self, method: str, target: str, headers: Dict[str, str],
+               body: bytes) -> Tuple[int, bytes, float, Optional[Dict[str, str]]]:
+        """Status, encoded body, injected delay in seconds and extra response headers for one request"""
+        self.requests += 1
+        path, _, query_string = target.partition("?")
+        delay, extra = 0.0, None
+        try:
+            (name, handler, faults), params = self._match(method, path)
+            if not faults.none:
+                delay = faults.delay(self.rng)
+                if faults.error(self.rng):
+                    self.injected_errors += 1
+                    raise HttpError(faults.error_status, "Injected error")
+            request = Request(method, path, query_string, headers, body)
+            request.params = params
+            status, payload, *rest = handler(request)
+            extra = rest[0] if rest else None
+        except HttpError as e:
+            status, payload = e.status, {"message": e.message}
+        except Exception as e:  # A stand-in bug must not take the connection down
+            status, payload = 500, {"message": f"{type(e).__name__}: {e}"}
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode("utf-8")
+        return status, payload, delay, extra
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> int:
+        """Start listening; returns the bound port (pass 0 for any free port)"""
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _Connection(self), host, port, backlog=4096)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def run_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Serve from a daemon thread with its own event loop, for synchronous callers; returns the port"""
+        started = threading.Event()
+        bound = []
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            bound.append(loop.run_until_complete(self.start(host, port)))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, name="quizhub-standin", daemon=True).start()
+        started.wait()
+        return bound[0]
+
+
+def _response(status: int, body: bytes, keep_alive: bool, headers: Optional[Dict[str, str]] = None) -> bytes:
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n")
+    if headers:
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    return (head + "\r\n").encode("latin-1") + body
+
+
+class _Connection(asyncio.Protocol):
+    """One keep-alive client connection; requests are answered in order"""
+
+    def __init__(self, server: StandInServer):
+        self.server = server
+        self.buffer = bytearray()
+        self.transport: Optional[asyncio.Transport] = None
+        self.waiting = False  # A delayed response is pending, later requests stay buffered
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        if not self.waiting:
+            self._process()
+
+    def _process(self):
+        buffer = self.buffer
+        while not self.waiting and self.transport and not self.transport.is_closing():
+            end = buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(buffer) > MAX_HEAD:
+                    self._send(431, b"", False)
+                return
+            lines = bytes(buffer[:end]).decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                self._send(400, b"", False)
+                return
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            start = end + 4
+            try:
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    decoded = _dechunk(buffer, start)
+                else:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(f"negative Content-Length {length}")
+                    decoded = None
+                    if len(buffer) >= start + length:
+                        decoded = bytes(buffer[start:start + length]), start + length
+            except ValueError:
+                # The body cannot be framed, so neither can anything after it
+                self._send(400, b"", False)
+                return
+            if decoded is None:
+                return
+            body, consumed = decoded
+            del buffer[:consumed]
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+            status, payload, delay, extra = self.server.handle(method, target, headers, body)
+            if delay > 0:
+                self.waiting = True
+                self.transport.pause_reading()
+                asyncio.get_running_loop().call_later(delay, self._send_delayed, status, payload, keep_alive,
+                                                      extra)
+                return
+            self._send(status, payload, keep_alive, extra)
+
+    def _send(self, status: int, body: bytes, keep_alive: bool, headers: Optional[Dict[str, str]] = None):
+        self.transport.write(_response(status, body, keep_alive, headers))
+        if not keep_alive:
+            self.transport.close()
+
+    def _send_delayed(self, status: int, body: bytes, keep_alive: bool, headers: Optional[Dict[str, str]] = None):
+        self.waiting = False
+        if self.transport.is_closing():
+            return
+        self._send(status, body, keep_alive, headers)
+        if keep_alive:
+            self.transport.resume_reading()
+            self._process()
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+
+def _dechunk(buffer: bytearray, start: int) -> Optional[Tuple[bytes, int]]:
+    """Decoded chunked body and bytes consumed, None while incomplete; ValueError on a bad chunk size"""
+    body, position = bytearray(), start
+    while True:
+        line_end = buffer.find(b"\r\n", position)
+        if line_end < 0:
+            return None
+        size = int(bytes(buffer[position:line_end]).split(b";")[0], 16)
+        if size < 0:
+            raise ValueError(f"negative chunk size {size}")
+        chunk_start = line_end + 2
+        if size == 0:
+            trailer_end = buffer.find(b"\r\n\r\n", line_end)
+            if trailer_end < 0:
+                return None
+            return bytes(body), trailer_end + 4
+        if len(buffer) < chunk_start + size + 2:
+            return None
+        body += buffer[chunk_start:chunk_start + size]
+        position = chunk_start + size + 2
+
+
+def parse_route_faults(specs: List[str], default: Faults) -> Dict[str, Faults]:
+    """Parse "route=latency[,error_rate]" overrides, e.g. "leaderboard_global=uniform:50:200,0.05" """
+    route_faults = {}
+    for spec in specs:
+        name, _, rest = spec.partition("=")
+        latency, _, error_rate = rest.partition(",")
+        route_faults[name.strip()] = Faults(latency or "const:0", float(error_rate or 0), default.error_status)
+    return route_faults
+
+
+async def serve(args: argparse.Namespace):
+    faults = Faults(args.latency, args.error_rate, args.error_status)
+    server = StandInServer(faults, parse_route_faults(args.route, faults), args.seed, args.token_ttl)
+    port = await server.start(args.host, args.port)
+    print(f"QuizHub stand-in listening on http://{args.host}:{port} "
+          f"(latency {faults.latency} ms, error rate {faults.error_rate:g})", flush=True)
+    started, served = time.monotonic(), 0
+    try:
+        if args.report_interval <= 0:
+            await asyncio.Event().wait()  # Serve until interrupted, without throughput lines
+        while True:
+            await asyncio.sleep(args.report_interval)
+            now = time.monotonic()
+            rate = (server.requests - served) / (now - started)
+            started, served = now, server.requests
+            if rate:
+                print(f"  {rate:,.0f} req/s, {server.requests} requests, {server.injected_errors} injected errors, "
+                      f"{len(server.state.users)} users, {len(server.state.quizzes)} quizzes, "
+                      f"{len(server.state.results)} results", flush=True)
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an in-memory QuizHub stand-in for the load tools")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="const:0",
+                        help="Injected response latency in ms, e.g. const:5, uniform:2:20, normal:10:3")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503, help="Status of injected errors (default: 503)")
+    parser.add_argument("--route", action="append", default=[], metavar="NAME=LATENCY[,ERROR_RATE]",
+                        help="Per-route faults, e.g. leaderboard_global=uniform:50:200,0.05 (repeatable)")
+    parser.add_argument("--seed", type=int, help="Seed for the injected faults")
+    parser.add_argument("--token-ttl", type=float, default=TOKEN_TTL,
+                        help=f"Seconds issued tokens stay valid (default: {TOKEN_TTL:g})")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Seconds between throughput lines, 0 for none (default: 5)")
+    args = parser.parse_args()
+    try:
+        engine.run(lambda: serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
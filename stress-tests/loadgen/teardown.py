@@ -0,0 +1,124 @@
+"""
+Parallel teardown of a stress run's test data
+Reads a run manifest and deletes its quizzes, then its users, through the
+seeding pipeline (adaptive parallelism, retries on 429/5xx). Entities that
+are already gone count as skipped, so teardown can safely be run again
+
+Usage:  python -m loadgen.teardown results/<run>.manifest [--concurrency 32]
+"""
+
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from loadgen import client, cleanup, engine, seeding
+from loadgen.manifest import QUIZ, RESULT, USER, read_manifest
+
+DEFAULT_CONCURRENCY = 32
+
+
+def log(message, level="INFO"):
+    """Simple logging"""
+    colors = {
+        "INFO": "\033[0;36m",
+        "SUCCESS": "\033[0;32m",
+        "ERROR": "\033[0;31m",
+        "WARNING": "\033[1;33m",
+    }
+    color = colors.get(level, "")
+    reset = "\033[0m"
+    print(f"{color}[{level}]{reset} {message}")
+
+
+async def login(session: aiohttp.ClientSession, gateway: str, username: str, password: str) -> Optional[str]:
+    """Bearer token for username, None if the login is refused"""
+    async with session.post(f"{gateway}/api/users/login",
+                            json={"usernameOrEmail": username, "password": password}) as response:
+        if response.status != 200:
+            return None
+        data = await response.json(content_type=None)
+        return data.get("token") or data.get("Token")
+
+
+async def admin_token(session: aiohttp.ClientSession, gateway: str, users: List[Dict],
+                      username: Optional[str], password: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Token of the given account, else of the first admin the run created that can still log in,
+    and the manifest ID of that admin (None for an outside account)"""
+    if username:
+        return await login(session, gateway, username, password), None
+    for user in users:
+        if user.get("role") == "Admin" and user.get("password"):
+            token = await login(session, gateway, user["username"], user["password"])
+            if token:
+                return token, user["id"]
+    return None, None
+
+
+async def delete_all(session: aiohttp.ClientSession, urls: List[str], token: str, label: str,
+                     concurrency: int, max_attempts: int) -> seeding.SeedStats:
+    """DELETE every url in parallel and report progress"""
+    headers = {"Authorization": f"Bearer {token}"}
+    return await seeding.run_pipeline(
+        urls, lambda url: cleanup.delete_item(session, url, headers), seeding.SeedStats(label, len(urls)),
+        seeding.AdaptiveConcurrency(max(concurrency // 4, 1), concurrency),
+        max_attempts=max_attempts, progress=log)
+
+
+async def teardown(path: str, concurrency: int = DEFAULT_CONCURRENCY, username: Optional[str] = None,
+                   password: Optional[str] = None, max_attempts: int = 5) -> Dict[str, seeding.SeedStats]:
+    """Delete everything a manifest lists; returns the stats per entity kind"""
+    header, entities = read_manifest(path)
+    gateway = header["gateway"]
+    log(f"Tearing down {path}: {len(entities[USER])} users, {len(entities[QUIZ])} quizzes, "
+        f"{len(entities[RESULT])} results on {gateway}")
+    http_pool = client.AsyncSessionPool(pool_size=concurrency)
+    session = http_pool.session
+    stats: Dict[str, seeding.SeedStats] = {}
+    try:
+        token, acting_id = await admin_token(session, gateway, entities[USER], username, password)
+        if not token:
+            log("No admin account could log in (pass --username/--password)", "ERROR")
+            return stats
+        # Quizzes first: deleting them needs the Admin role of a user deleted below
+        stats[QUIZ] = await delete_all(
+            session, [f"{gateway}/api/quizzes/{q['id']}" for q in entities[QUIZ]], token,
+            "Quizzes", concurrency, max_attempts)
+        # The acting admin goes last, its token may stop working once its account is gone
+        urls = [f"{gateway}/api/users/{u['id']}" for u in entities[USER] if u["id"] != acting_id]
+        stats[USER] = await delete_all(session, urls, token, "Users", concurrency, max_attempts)
+        if any(u["id"] == acting_id for u in entities[USER]):
+            last = await delete_all(session, [f"{gateway}/api/users/{acting_id}"], token,
+                                    "Acting admin", 1, max_attempts)
+            for counter in ("succeeded", "failed", "skipped", "retries"):
+                setattr(stats[USER], counter, getattr(stats[USER], counter) + getattr(last, counter))
+    finally:
+        await http_pool.close()
+    if entities[RESULT]:
+        # ResultService has no delete endpoint; results of deleted quizzes drop out of the leaderboards
+        log(f"{len(entities[RESULT])} results kept (the API cannot delete results)", "WARNING")
+    for kind_stats in stats.values():
+        log(f"✓ {kind_stats.label}: {kind_stats.succeeded} deleted, {kind_stats.skipped} already gone, "
+            f"{kind_stats.failed} failed in {kind_stats.finished - kind_stats.started:.1f}s "
+            f"({kind_stats.rate:.1f}/s, {kind_stats.retries} retries)",
+            "SUCCESS" if not kind_stats.failed else "WARNING")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete the users and quizzes a stress run created")
+    parser.add_argument("manifest")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum deletes in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--username", help="Admin account to delete with (default: an admin the run created)")
+    parser.add_argument("--password")
+    parser.add_argument("--max-attempts", type=int, default=5,
+                        help="Attempts per delete on 429/5xx or connection errors (default: 5)")
+    args = parser.parse_args()
+    stats = engine.run(lambda: teardown(args.manifest, args.concurrency, args.username, args.password,
+                                        args.max_attempts))
+    raise SystemExit(1 if not stats or any(s.failed for s in stats.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
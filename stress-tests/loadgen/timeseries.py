@@ -0,0 +1,138 @@
+"""
+Per-second time-series export
+Every monitor interval is written as one record per operation (count,
+errors, response bytes, latency histogram) to a length-prefixed binary
+file. Records are streamed through a small write buffer, so memory stays
+flat however long the run is
+
+Dump a file as CSV:  python -m loadgen.timeseries results/<run>.qts
+"""
+
+import argparse
+import csv
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, NamedTuple
+
+from loadgen.histogram import Histogram
+from loadgen.monitor import Interval
+
+MAGIC = b"QHTS"
+VERSION = 1
+BUFFER_SIZE = 64 * 1024
+FLUSH_EVERY = 10  # Intervals between flushes to disk
+
+_FILE_HEADER = struct.Struct("<4sHd")  # magic, version, run start (unix time)
+_LENGTH = struct.Struct("<I")
+_OPERATION = struct.Struct("<BH")  # kind, operation id; followed by the utf-8 name
+_SAMPLE = struct.Struct("<BdfHIIQ")  # kind, started_at, seconds, operation id, count, errors, bytes
+KIND_OPERATION = 1
+KIND_SAMPLE = 2
+
+
+class Sample(NamedTuple):
+    started_at: float
+    seconds: float
+    operation: str
+    count: int
+    errors: int
+    received: int
+    histogram: Histogram
+
+
+class TimeSeriesWriter:
+    """Monitor listener appending one sample per operation per interval"""
+
+    def __init__(self, path: str, operations: Dict[str, str], flush_every: int = FLUSH_EVERY):
+        # operations maps histogram names to their "<prefix>_fail" counters
+        self.path = path
+        self.operations = operations
+        self.flush_every = flush_every
+        self._ids: Dict[str, int] = {}
+        self._intervals = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "wb", buffering=BUFFER_SIZE)
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, time.time()))
+
+    def _write(self, payload: bytes):
+        self._file.write(_LENGTH.pack(len(payload)))
+        self._file.write(payload)
+
+    def _operation_id(self, operation: str) -> int:
+        op_id = self._ids.get(operation)
+        if op_id is None:
+            op_id = self._ids[operation] = len(self._ids)
+            self._write(_OPERATION.pack(KIND_OPERATION, op_id) + operation.encode("utf-8"))
+        return op_id
+
+    def __call__(self, interval: Interval):
+        failed = {op: interval.counters.get(f"{prefix}_fail", 0) for op, prefix in self.operations.items()}
+        empty = Histogram()
+        for operation in sorted(set(interval.histograms) | {op for op, n in failed.items() if n}):
+            histogram = interval.histograms.get(operation, empty)
+            header = _SAMPLE.pack(KIND_SAMPLE, interval.started_at, interval.seconds,
+                                  self._operation_id(operation), histogram.count,
+                                  failed.get(operation, 0), interval.received.get(operation, 0))
+            self._write(header + histogram.to_bytes())
+        self._intervals += 1
+        if self._intervals % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_samples(stream: BinaryIO) -> Iterator[Sample]:
+    """Samples in file order, up to a record torn by a crash"""
+    header = stream.read(_FILE_HEADER.size)
+    if len(header) < _FILE_HEADER.size:
+        raise ValueError("Not a QuizHub time-series file")
+    magic, version, _ = _FILE_HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a QuizHub time-series file")
+    names: Dict[int, str] = {}
+    while True:
+        prefix = stream.read(_LENGTH.size)
+        if len(prefix) < _LENGTH.size:
+            return
+        length = _LENGTH.unpack(prefix)[0]
+        payload = stream.read(length)
+        if not length or len(payload) < length:
+            return  # Truncated by a crash
+        if payload[0] == KIND_OPERATION:
+            _, op_id = _OPERATION.unpack_from(payload)
+            names[op_id] = payload[_OPERATION.size:].decode("utf-8")
+        elif payload[0] == KIND_SAMPLE:
+            _, started_at, seconds, op_id, count, errors, received = _SAMPLE.unpack_from(payload)
+            histogram = Histogram.from_bytes(payload[_SAMPLE.size:])
+            yield Sample(started_at, seconds, names[op_id], count, errors, received, histogram)
+
+
+def main():
+    """Print a time-series file as CSV"""
+    parser = argparse.ArgumentParser(description="Dump a stress test time-series file as CSV")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["time", "operation", "count", "rps", "errors", "bytes",
+                     "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    with open(args.path, "rb") as stream:
+        for sample in read_samples(stream):
+            h = sample.histogram
+            writer.writerow([
+                datetime.fromtimestamp(sample.started_at).isoformat(timespec="milliseconds"),
+                sample.operation, sample.count,
+                f"{sample.count / sample.seconds:.1f}" if sample.seconds else "0.0",
+                sample.errors, sample.received,
+                f"{h.percentile_ns(50) / 1e6:.2f}", f"{h.percentile_ns(95) / 1e6:.2f}",
+                f"{h.percentile_ns(99) / 1e6:.2f}", f"{h.max_ns / 1e6:.2f}",
+            ])
+
+
+if __name__ == "__main__":
+    main()
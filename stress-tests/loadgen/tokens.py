@@ -0,0 +1,259 @@
+"""
+JWT token cache
+Tokens are kept per user together with their expiry (the JWT "exp"
+claim), so a virtual user logs in only when it has no usable token. A
+refresh scheduler logs users in again shortly before their tokens expire,
+spread over a window so tokens issued together are not renewed in one
+burst, and a login storm re-logs a chosen share of users at once when
+auth load is what is being tested
+"""
+
+import asyncio
+import base64
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+REFRESH_MARGIN = 120.0  # Seconds before expiry a token stops being used
+REFRESH_SPREAD = 600.0  # Proactive refreshes are spread over this many seconds before the margin
+REFRESH_CONCURRENCY = 50  # Background logins in flight at once
+IDLE_POLL = 1.0  # Seconds the scheduler sleeps when nothing is due
+
+# Logs a user in again, returning the new token (None on failure)
+Login = Callable[[Dict], Awaitable[Optional[str]]]
+
+
+def token_expiry(token: Optional[str]) -> Optional[float]:
+    """Epoch seconds of the token's "exp" claim, None for tokens without one"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenCache:
+    """Users' tokens by username, with their expiry
+
+    Entries are the users' own dicts: storing a token sets user["token"],
+    so requests keep reading the token from the user as before
+    """
+
+    def __init__(self, margin: float = REFRESH_MARGIN, spread: float = REFRESH_SPREAD,
+                 path: Optional[str] = None, seed: Optional[int] = None):
+        self.margin = margin
+        self.spread = spread
+        self.path = path  # Where persisted entries (the admin account) are kept between runs
+        self._users: Dict[str, Dict] = {}
+        self._usable_until: Dict[str, Optional[float]] = {}
+        self._tokens: Dict[str, str] = {}  # Token last stored per user, so storing it again is a no-op
+        self._due: List[Tuple[float, str, str]] = []  # (refresh at, username, token)
+        self._persisted: Dict[str, Dict] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.hits = 0
+        self.logins = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._persisted = json.load(f)
+            except (OSError, ValueError):
+                self._persisted = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def put(self, user: Dict, token: Optional[str] = None):
+        """Store a user's token (user["token"] when not given) and schedule its refresh"""
+        if token is not None:
+            user["token"] = token
+        token = user.get("token")
+        expiry = token_expiry(token)
+        with self._lock:
+            if self._tokens.get(user["username"]) == token and self._users.get(user["username"]) is user:
+                return
+            self._users[user["username"]] = user
+            self._tokens[user["username"]] = token
+            if expiry is None or not token:
+                self._usable_until[user["username"]] = None
+                return
+            # Short-lived tokens keep at least half their lifetime usable
+            lifetime = max(expiry - time.time(), 0.0)
+            usable_until = expiry - min(self.margin, lifetime / 4)
+            self._usable_until[user["username"]] = usable_until
+            # Tokens issued together are refreshed at spread-out times before they stop being used
+            refresh_at = usable_until - self._rng.uniform(0, min(self.spread, lifetime / 4))
+            heapq.heappush(self._due, (refresh_at, user["username"], token))
+
+    def valid(self, user: Dict) -> bool:
+        """Whether the user has a token that is not about to expire"""
+        if not user.get("token"):
+            return False
+        if user["username"] not in self._usable_until:
+            self.put(user)
+        usable_until = self._usable_until[user["username"]]
+        return usable_until is None or usable_until > time.time()
+
+    def invalidate(self, user: Dict):
+        """Forget a user's token (rejected by the gateway, or dropped for a login storm)"""
+        with self._lock:
+            self._usable_until[user["username"]] = 0.0
+
+    async def ensure(self, user: Dict, login: Login) -> bool:
+        """Make sure the user holds a usable token, logging in at most once for concurrent callers"""
+        if self.valid(user):
+            self.hits += 1
+            return True
+        pending = self._pending.get(user["username"])
+        if pending is None:
+            pending = asyncio.get_running_loop().create_future()
+            self._pending[user["username"]] = pending
+            try:
+                token = await login(user)
+                self.logins += 1
+                if token:
+                    self.put(user, token)
+                pending.set_result(bool(token))
+            except Exception:
+                pending.set_result(False)
+                raise
+            finally:
+                del self._pending[user["username"]]
+        return await pending
+
+    def ensure_sync(self, user: Dict, login: Callable[[Dict], Optional[str]]) -> bool:
+        """ensure() for threaded callers"""
+        if self.valid(user):
+            self.hits += 1
+            return True
+        token = login(user)
+        self.logins += 1
+        if token:
+            self.put(user, token)
+        return bool(token)
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._due[0][0] if self._due else None
+
+    def pop_due(self, now: float) -> List[Dict]:
+        """Users whose token should be refreshed by now, skipping tokens replaced since"""
+        due = []
+        with self._lock:
+            while self._due and self._due[0][0] <= now:
+                _, username, token = heapq.heappop(self._due)
+                user = self._users.get(username)
+                if user is not None and user.get("token") == token:
+                    due.append(user)
+        return due
+
+    # Persisted accounts
+
+    def recall(self, key: str) -> Optional[Dict]:
+        """A persisted user (e.g. "<gateway> admin") whose token is still usable"""
+        user = self._persisted.get(key)
+        return user if user and self.valid(user) else None
+
+    def remember(self, key: str, user: Dict):
+        """Persist a user (without its password) and its token to the cache file"""
+        self._persisted[key] = {name: value for name, value in user.items() if name != "password"}
+        self._save()
+
+    def forget(self, key: str):
+        if self._persisted.pop(key, None) is not None:
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self._persisted, f, indent=2)
+        try:
+            os.chmod(self.path, 0o600)  # Tokens are credentials
+        except OSError:
+            pass
+
+
+class RefreshScheduler:
+    """Logs users in again in the background before their tokens expire"""
+
+    def __init__(self, cache: TokenCache, login: Login, concurrency: int = REFRESH_CONCURRENCY):
+        self.cache = cache
+        self.login = login
+        self.refreshed = 0
+        self.failed = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._refreshes: set = set()
+
+    def start(self) -> "RefreshScheduler":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            for task in list(self._refreshes):
+                task.cancel()
+            await asyncio.gather(self._task, *self._refreshes, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            due = self.cache.next_due()
+            now = time.time()
+            if due is None or due > now:
+                await asyncio.sleep(IDLE_POLL if due is None else min(due - now, IDLE_POLL))
+                continue
+            for user in self.cache.pop_due(now):
+                task = asyncio.create_task(self._refresh(user))
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+
+    async def _refresh(self, user: Dict):
+        async with self._semaphore:
+            token = await self.login(user)
+        if token:
+            self.cache.put(user, token)
+            self.refreshed += 1
+        else:
+            self.failed += 1
+
+    def summary(self) -> str:
+        return f"{self.refreshed} tokens refreshed before expiry, {self.failed} refreshes failed"
+
+
+def parse_storm(spec: str) -> Tuple[float, float]:
+    """Parse a login storm "FRACTION[@SECONDS]" into (fraction of users, seconds into the run)"""
+    fraction, _, at = spec.partition("@")
+    try:
+        share, seconds = float(fraction), float(at or 0)
+    except ValueError:
+        raise ValueError(f"Bad login storm '{spec}', expected FRACTION[@SECONDS] such as 0.5@30") from None
+    if not 0 < share <= 1 or seconds < 0:
+        raise ValueError(f"Bad login storm '{spec}': fraction must be in (0, 1] and seconds >= 0")
+    return share, seconds
+
+
+async def login_storm(cache: TokenCache, users: List[Dict], login: Login, fraction: float,
+                      concurrency: int, rng=random) -> Tuple[int, int]:
+    """Log a share of the users in again all at once; returns (succeeded, attempted)"""
+    chosen = rng.sample(users, max(1, round(len(users) * fraction))) if users else []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def relogin(user: Dict) -> bool:
+        async with semaphore:
+            token = await login(user)
+        if token:
+            cache.put(user, token)
+        return bool(token)
+
+    outcomes = await asyncio.gather(*(relogin(user) for user in chosen))
+    return sum(outcomes), len(chosen)
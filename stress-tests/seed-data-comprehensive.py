@@ -6,16 +6,25 @@ Creates realistic quiz data with diverse question types, categories, and user su
 Includes: Single, Multiple, TrueFalse, and FillIn question types
 """
 
-import requests
+import aiohttp
+import argparse
+import itertools
 import json
 import time
 import random
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Tuple
+
+from loadgen import client, corpus, engine, seeding
 
 # Configuration
 GATEWAY_URL = "http://quizhub.172.189.52.147.nip.io"
 ADMIN_EMAIL = "admin@quizhub.com"
 ADMIN_PASSWORD = "Admin123Pass!"
+MAX_CONCURRENCY = 32  # Requests in flight at most; lowered automatically on 429/5xx
+PER_ITEM_LOG_LIMIT = 100  # Log every item only for small runs, otherwise just progress
+
+http_pool: client.AsyncSessionPool = None
+session: aiohttp.ClientSession = None
 
 # Question Types
 SINGLE = 0      # Single choice (one correct answer)
@@ -775,7 +784,7 @@ def log(message, level="INFO"):
     reset = "\033[0m"
     print(f"{color}[{level}]{reset} {message}")
 
-def login_admin() -> str:
+async def login_admin() -> str:
     """Login as admin and return token"""
     payload = {
         "usernameOrEmail": ADMIN_EMAIL,
@@ -783,55 +792,50 @@ def login_admin() -> str:
     }
     
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/users/login",
             json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get("token")
-            log(f"✓ Logged in as admin", "SUCCESS")
-            return token
-        else:
-            log(f"Admin login failed: {response.status_code}", "ERROR")
-            return ""
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
+            if response.status == 200:
+                data = await response.json(content_type=None)
+                token = data.get("token")
+                log(f"✓ Logged in as admin", "SUCCESS")
+                return token
+            else:
+                log(f"Admin login failed: {response.status}", "ERROR")
+                return ""
     except Exception as e:
         log(f"Admin login error: {str(e)}", "ERROR")
         return ""
 
-def register_user(username: str, email: str, firstName: str, lastName: str, password: str = "User123Pass!") -> Tuple[bool, Dict]:
-    """Register a new user"""
+async def register_user(username: str, email: str, firstName: str, lastName: str, password: str = "User123Pass!"):
+    """Register a new user (seeding.SKIPPED if it already exists)"""
     payload = {
-        "username": (None, username),
-        "email": (None, email),
-        "password": (None, password),
-        "firstName": (None, firstName),
-        "lastName": (None, lastName)
+        "username": username,
+        "email": email,
+        "password": password,
+        "firstName": firstName,
+        "lastName": lastName
     }
     
-    try:
-        response = requests.post(
-            f"{GATEWAY_URL}/api/users/register",
-            files=payload,
-            timeout=10
-        )
-        
-        if response.status_code in [200, 201]:
-            data = response.json()
-            return True, {"token": data.get("token"), "user": data.get("user")}
-        elif response.status_code == 409:
-            return False, {}
+    async with session.post(
+        f"{GATEWAY_URL}/api/users/register",
+        data=client.multipart_form(payload),
+        timeout=aiohttp.ClientTimeout(total=10)
+    ) as response:
+        if response.status in [200, 201]:
+            data = await response.json(content_type=None)
+            return {"token": data.get("token"), "user": data.get("user")}
+        elif response.status == 409:
+            return seeding.SKIPPED
+        elif response.status in seeding.RETRY_STATUSES:
+            raise seeding.RetryableError(response.status, seeding.retry_after_seconds(response))
         else:
-            log(f"User registration failed: {response.status_code}", "ERROR")
-            return False, {}
-    except Exception as e:
-        log(f"User registration error: {str(e)}", "ERROR")
-        return False, {}
+            log(f"User registration failed: {response.status}", "ERROR")
+            return {}
 
-def create_quiz(token: str, template: Dict) -> str:
+async def create_quiz(token: str, template: Dict) -> str:
     """Create a quiz from template with proper question types"""
     questions = []
     for q in template["questions"]:
@@ -853,73 +857,102 @@ def create_quiz(token: str, template: Dict) -> str:
         "questions": questions
     }
     
-    try:
-        response = requests.post(
-            f"{GATEWAY_URL}/api/quizzes",
-            json=quiz_data,
-            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-            timeout=30
-        )
-        
-        if response.status_code in [200, 201]:
-            data = response.json()
+    async with session.post(
+        f"{GATEWAY_URL}/api/quizzes",
+        json=quiz_data,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=aiohttp.ClientTimeout(total=30)
+    ) as response:
+        if response.status in [200, 201]:
+            data = await response.json(content_type=None)
             quiz_id = data.get("id") or data.get("Id")
             return quiz_id
+        elif response.status in seeding.RETRY_STATUSES:
+            raise seeding.RetryableError(response.status, seeding.retry_after_seconds(response))
         else:
-            log(f"Quiz creation failed: {response.status_code} - {response.text[:200]}", "ERROR")
+            text = await response.text()
+            log(f"Quiz creation failed: {response.status} - {text[:200]}", "ERROR")
             return ""
-    except Exception as e:
-        log(f"Quiz creation error: {str(e)}", "ERROR")
-        return ""
 
-def main():
+def quiz_templates(copies: int) -> Iterator[Dict]:
+    """Every template copies times, later copies get a numbered title"""
+    for copy in range(copies):
+        for template in QUIZ_TEMPLATES:
+            yield template if copy == 0 else dict(template, title=f"{template['title']} #{copy + 1}")
+
+def user_profiles(count: int) -> Iterator[Dict]:
+    """USERS first, then numbered variants of them until count profiles"""
+    for i in range(count):
+        user = USERS[i % len(USERS)]
+        round_number = i // len(USERS) + 1
+        if round_number == 1:
+            yield user
+        else:
+            local, domain = user["email"].split("@")
+            yield dict(user, username=f"{user['username']}_{round_number}",
+                       email=f"{local}{round_number}@{domain}")
+
+def concurrency_limit(args: argparse.Namespace) -> seeding.AdaptiveConcurrency:
+    """Start at a quarter of the maximum and let the backend's responses set the pace"""
+    return seeding.AdaptiveConcurrency(max(args.concurrency // 4, 1), args.concurrency)
+
+async def seed(args: argparse.Namespace):
+    global http_pool, session
     print("=" * 70)
     print("         QuizHub Comprehensive Data Seeding Script")
     print("=" * 70)
     print()
     
-    # Step 1: Admin login
-    log("Step 1: Logging in as admin...")
-    admin_token = login_admin()
-    if not admin_token:
-        log("Failed to login as admin. Exiting.", "ERROR")
-        return
-    
-    # Step 2: Create quizzes
-    log(f"\nStep 2: Creating {len(QUIZ_TEMPLATES)} comprehensive quizzes with diverse question types...")
+    http_pool = client.AsyncSessionPool(pool_size=args.concurrency)
+    session = http_pool.session
     created_quiz_ids = []
-    
-    for i, template in enumerate(QUIZ_TEMPLATES, 1):
-        quiz_id = create_quiz(admin_token, template)
-        if quiz_id:
-            created_quiz_ids.append(quiz_id)
-            log(f"  [{i}/{len(QUIZ_TEMPLATES)}] ✓ Created: {template['title']}", "SUCCESS")
-        else:
-            log(f"  [{i}/{len(QUIZ_TEMPLATES)}] ✗ Failed: {template['title']}", "ERROR")
-        time.sleep(0.5)
-    
-    log(f"\n✓ Successfully created {len(created_quiz_ids)} quizzes", "SUCCESS")
-    
-    # Step 3: Register users
-    log(f"\nStep 3: Creating {len(USERS)} diverse users...")
     registered_users = []
-    
-    for user in USERS:
-        success, data = register_user(
-            user["username"],
-            user["email"],
-            user["firstName"],
-            user["lastName"]
-        )
+    try:
+        # Step 1: Admin login
+        log("Step 1: Logging in as admin...")
+        admin_token = await login_admin()
+        if not admin_token:
+            log("Failed to login as admin. Exiting.", "ERROR")
+            return
+        
+        # Step 2: Create quizzes
+        total_quizzes = len(QUIZ_TEMPLATES) * args.quiz_copies + args.synthetic
+        templates = itertools.chain(
+            quiz_templates(args.quiz_copies),
+            corpus.generate_quizzes(args.synthetic, args.corpus_seed, corpus.config_from_args(args)))
+        log(f"\nStep 2: Creating {total_quizzes} comprehensive quizzes with diverse question types...")
+        
+        def quiz_created(template, quiz_id):
+            created_quiz_ids.append(quiz_id)
+            if total_quizzes <= PER_ITEM_LOG_LIMIT:
+                log(f"  ✓ Created: {template['title']}", "SUCCESS")
+        
+        quiz_stats = await seeding.run_pipeline(
+            templates, lambda template: create_quiz(admin_token, template),
+            seeding.SeedStats("Quizzes", total_quizzes), concurrency_limit(args),
+            on_result=quiz_created, max_attempts=args.max_attempts, progress=log)
         
-        if success:
+        log(f"\n✓ Successfully created {len(created_quiz_ids)} quizzes", "SUCCESS")
+        
+        # Step 3: Register users
+        log(f"\nStep 3: Creating {args.users} diverse users...")
+        
+        def user_registered(user, data):
             registered_users.append(data)
-            log(f"  ✓ Registered: {user['username']}", "SUCCESS")
-        else:
-            log(f"  ⚠ Skipped (may exist): {user['username']}", "WARNING")
-        time.sleep(0.3)
-    
-    log(f"\n✓ Have {len(registered_users)} users ready", "SUCCESS")
+            if args.users <= PER_ITEM_LOG_LIMIT:
+                log(f"  ✓ Registered: {user['username']}", "SUCCESS")
+        
+        user_stats = await seeding.run_pipeline(
+            user_profiles(args.users),
+            lambda user: register_user(user["username"], user["email"], user["firstName"], user["lastName"]),
+            seeding.SeedStats("Users", args.users), concurrency_limit(args),
+            on_result=user_registered, max_attempts=args.max_attempts, progress=log)
+        if user_stats.skipped:
+            log(f"  ⚠ Skipped {user_stats.skipped} users (may exist)", "WARNING")
+        
+        log(f"\n✓ Have {len(registered_users)} users ready", "SUCCESS")
+    finally:
+        await http_pool.close()
     
     # Summary
     print()
@@ -928,11 +961,30 @@ def main():
     print("=" * 70)
     print()
     print(f"📊 Summary:")
-    print(f"   • Quizzes created: {len(created_quiz_ids)}")
-    print(f"   • Users registered: {len(registered_users)}")
+    print(f"   • Quizzes created: {len(created_quiz_ids)} ({quiz_stats.rate:.1f}/s, {quiz_stats.retries} retries)")
+    print(f"   • Users registered: {len(registered_users)} ({user_stats.rate:.1f}/s, {user_stats.retries} retries)")
     print(f"   • Question types used: Single, Multiple, True/False, Fill-in")
     print()
     print(f"🌐 Access your seeded data at: {GATEWAY_URL}")
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed QuizHub with quizzes and users")
+    parser.add_argument("--quiz-copies", type=int, default=1,
+                        help=f"Create every template this many times ({len(QUIZ_TEMPLATES)} quizzes per copy)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Also create this many generated quizzes from the synthetic corpus")
+    corpus.add_arguments(parser)
+    parser.add_argument("--users", type=int, default=len(USERS),
+                        help=f"Users to register (default: {len(USERS)})")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"Maximum requests in flight (default: {MAX_CONCURRENCY})")
+    parser.add_argument("--max-attempts", type=int, default=5,
+                        help="Attempts per item on 429/5xx or connection errors (default: 5)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    engine.run(lambda: seed(args))
+
 if __name__ == "__main__":
     main()
@@ -3,18 +3,26 @@
 """
 QuizHub Data Seeding Script
 Creates realistic quiz data with diverse questions, categories, and user submissions
+Completed work is checkpointed to a local journal, so an interrupted run
+can simply be started again and continues where it stopped
 """
 
 import requests
+import argparse
 import json
+import os
 import time
 import random
 from typing import List, Dict, Tuple
 
+from loadgen import journal
+
 # Configuration
 GATEWAY_URL = "http://quizhub.172.189.52.147.nip.io"
 ADMIN_EMAIL = "admin@quizhub.com"
 ADMIN_PASSWORD = "Admin123Pass!"
+USER_PASSWORD = "Test123Pass!"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
 
 # Quiz templates with diverse questions
 QUIZ_TEMPLATES = [
@@ -313,6 +321,31 @@ def register_user(username: str, email: str, password: str) -> Tuple[bool, Dict]
     except Exception as e:
         return False, {}
 
+def login_user(username: str, password: str) -> Tuple[bool, Dict]:
+    """Login an existing user"""
+    payload = {
+        "usernameOrEmail": username,
+        "password": password
+    }
+    
+    try:
+        response = requests.post(
+            f"{GATEWAY_URL}/api/users/auth/login",
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            token = data.get("token") or data.get("Token")
+            user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
+            return True, {"username": username, "token": token, "id": user_id}
+        else:
+            return False, {}
+    except Exception as e:
+        return False, {}
+
 def create_quiz(token: str, template: Dict) -> str:
     """Create a quiz from template"""
     questions = []
@@ -417,11 +450,28 @@ def submit_quiz_result(token: str, quiz_id: str, quiz_data: Dict, accuracy: floa
     except:
         return False
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed QuizHub with quizzes, users and quiz submissions")
+    parser.add_argument("--journal", default=journal.default_path(RESULTS_DIR, "seed-data", GATEWAY_URL),
+                        help="Checkpoint journal of completed work; a rerun skips what it records")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard the journal and seed everything again")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("\n" + "="*70)
     print("         QuizHub Data Seeding Script")
     print("="*70 + "\n")
     
+    if args.fresh and os.path.exists(args.journal):
+        os.remove(args.journal)
+    with journal.Journal(args.journal) as checkpoint:
+        if checkpoint.replayed:
+            log(f"Resuming from {args.journal} ({checkpoint.replayed} completed items)")
+        seed(checkpoint)
+
+def seed(checkpoint: journal.Journal):
     # Login as admin
     log("Step 1: Logging in as admin...")
     admin_token = login_admin()
@@ -432,15 +482,25 @@ def main():
     # Create quizzes
     log(f"\nStep 2: Creating {len(QUIZ_TEMPLATES)} diverse quizzes...")
     quiz_ids = []
+    resumed_quizzes = 0
     for i, template in enumerate(QUIZ_TEMPLATES, 1):
+        key = journal.template_hash(template)
+        quiz_id = checkpoint.get("quiz", key)
+        if quiz_id:
+            quiz_ids.append(quiz_id)
+            resumed_quizzes += 1
+            continue
         quiz_id = create_quiz(admin_token, template)
         if quiz_id:
+            checkpoint.record("quiz", key, quiz_id)
             quiz_ids.append(quiz_id)
             log(f"  [{i}/{len(QUIZ_TEMPLATES)}] ✓ Created: {template['title']}", "SUCCESS")
             time.sleep(0.5)  # Small delay between creations
         else:
             log(f"  [{i}/{len(QUIZ_TEMPLATES)}] ✗ Failed: {template['title']}", "ERROR")
     
+    if resumed_quizzes:
+        log(f"  ↷ {resumed_quizzes} quizzes already created in an earlier run")
     log(f"\n✓ Successfully created {len(quiz_ids)} quizzes", "SUCCESS")
     
     # Create diverse users
@@ -455,25 +515,47 @@ def main():
     users = []
     for username in user_names:
         email = f"{username}@test.com"
-        password = "Test123Pass!"
+        password = USER_PASSWORD
+        if ("user", username) in checkpoint:
+            # Registered in an earlier run; only a fresh token is needed
+            success, user_data = login_user(username, password)
+            if success:
+                users.append(user_data)
+            else:
+                log(f"  ✗ Login failed for journaled user: {username}", "ERROR")
+            continue
         success, user_data = register_user(username, email, password)
         if success:
-            users.append(user_data)
             log(f"  ✓ Registered: {username}", "SUCCESS")
             time.sleep(0.3)
         else:
-            log(f"  ⚠ Skipped (may exist): {username}", "WARNING")
+            # The account may exist from a run without a journal
+            success, user_data = login_user(username, password)
+            if success:
+                log(f"  ↷ Already registered: {username}", "INFO")
+            else:
+                log(f"  ✗ Failed: {username}", "ERROR")
+        if success:
+            checkpoint.record("user", username, user_data["id"])
+            users.append(user_data)
     
     log(f"\n✓ Have {len(users)} users ready", "SUCCESS")
     
     # Generate realistic quiz submissions
     log(f"\nStep 4: Generating realistic quiz submissions...")
     submission_count = 0
+    resumed_submissions = 0
     
     for user in users:
-        # Each user takes 3-8 random quizzes
-        num_quizzes = random.randint(3, 8)
-        user_quiz_ids = random.sample(quiz_ids, min(num_quizzes, len(quiz_ids)))
+        # Each user takes 3-8 random quizzes, counting the ones taken in an earlier run
+        num_quizzes = checkpoint.get("plan", user["username"])
+        if num_quizzes is None:
+            num_quizzes = random.randint(3, 8)
+            checkpoint.record("plan", user["username"], num_quizzes)
+        taken = [q for q in quiz_ids if ("result", f"{user['username']}/{q}") in checkpoint]
+        resumed_submissions += len(taken)
+        remaining = [q for q in quiz_ids if q not in taken]
+        user_quiz_ids = random.sample(remaining, min(max(num_quizzes - len(taken), 0), len(remaining)))
         
         for quiz_id in user_quiz_ids:
             # Get quiz data
@@ -492,20 +574,23 @@ def main():
             
             # Submit quiz
             if submit_quiz_result(user["token"], quiz_id, quiz_data, accuracy):
+                checkpoint.record("result", f"{user['username']}/{quiz_id}", int(accuracy*100))
                 submission_count += 1
                 log(f"  ✓ {user['username']} completed quiz (accuracy: {int(accuracy*100)}%)", "SUCCESS")
             
             time.sleep(0.3)  # Small delay between submissions
     
+    if resumed_submissions:
+        log(f"  ↷ {resumed_submissions} submissions already made in an earlier run")
     log(f"\n✓ Generated {submission_count} quiz submissions", "SUCCESS")
     
     print("\n" + "="*70)
     print("              Data Seeding Complete!")
     print("="*70)
     print(f"\n📊 Summary:")
-    print(f"   • Quizzes created: {len(quiz_ids)}")
+    print(f"   • Quizzes created: {len(quiz_ids) - resumed_quizzes} (+{resumed_quizzes} from earlier runs)")
     print(f"   • Users registered: {len(users)}")
-    print(f"   • Quiz submissions: {submission_count}")
+    print(f"   • Quiz submissions: {submission_count} (+{resumed_submissions} from earlier runs)")
     print(f"\n🌐 Access your seeded data at: {GATEWAY_URL}\n")
 
 if __name__ == "__main__":
@@ -5,22 +5,25 @@ QuizHub Stress Test - User Activities Only
 Tests realistic user behavior: register, login, view quizzes, view leaderboards
 """
 
-import requests
+import argparse
 import json
 import time
 import random
 import string
 import concurrent.futures
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import sys
-from collections import defaultdict
-import threading
 
-# Configuration
+from loadgen import client
+from loadgen.metrics import MetricsStore, format_latency
+from loadgen.scenario import ScenarioError, gateway_for, load_scenario
+
+# Configuration (defaults: --gateway or $GATEWAY_URL and --scenario override them)
 GATEWAY_URL = "http://quizhub.local"
 NUM_USERS = 50
 MAX_WORKERS = 10
+POOL_SIZE_PER_HOST = 10  # Keep-alive connections per worker session
 QUIZZES_PER_USER = 5
 LEADERBOARDS_PER_USER = 3
 
@@ -30,21 +33,11 @@ CATEGORIES = [
     "Literature", "Sports", "Music", "Art", "General Knowledge"
 ]
 
-# Metrics
-metrics = {
-    "register_success": 0,
-    "register_fail": 0,
-    "login_success": 0,
-    "login_fail": 0,
-    "quiz_fetch_success": 0,
-    "quiz_fetch_fail": 0,
-    "leaderboard_success": 0,
-    "leaderboard_fail": 0,
-    "response_times": defaultdict(list),
-}
-metrics_lock = threading.Lock()
+# Metrics (per-thread recorders, merged for reporting)
+metrics = MetricsStore()
 
 # Data storage
+http_pool = client.SessionPool(pool_size=POOL_SIZE_PER_HOST)
 users = []
 
 
@@ -68,17 +61,13 @@ def log(message, level="INFO"):
 
 
 def update_metric(metric_name, value=1):
-    """Thread-safe metric update"""
-    with metrics_lock:
-        if metric_name in metrics:
-            if isinstance(metrics[metric_name], int):
-                metrics[metric_name] += value
+    """Count an outcome on the calling thread's recorder"""
+    metrics.incr(metric_name, value)
 
 
 def record_response_time(operation, duration):
     """Record response time for an operation"""
-    with metrics_lock:
-        metrics["response_times"][operation].append(duration)
+    metrics.record(operation, int(duration * 1e9))
 
 
 def register_user() -> Tuple[bool, Dict]:
@@ -98,7 +87,7 @@ def register_user() -> Tuple[bool, Dict]:
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/users/auth/register",
             files=payload,
             timeout=30
@@ -139,7 +128,7 @@ def login_user(username: str, password: str) -> Tuple[bool, str]:
     
     start_time = time.time()
     try:
-        response = requests.post(
+        response = http_pool.session().post(
             f"{GATEWAY_URL}/api/users/auth/login",
             json=payload,
             timeout=30
@@ -166,7 +155,7 @@ def get_quizzes(page: int = 1) -> bool:
     """Get list of quizzes"""
     start_time = time.time()
     try:
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes?page={page}&pageSize=10",
             timeout=30
         )
@@ -190,7 +179,7 @@ def get_quiz_by_category(category: str) -> bool:
     """Get quizzes by category"""
     start_time = time.time()
     try:
-        response = requests.get(
+        response = http_pool.session().get(
             f"{GATEWAY_URL}/api/quizzes/category/{category}?page=1&pageSize=10",
             timeout=30
         )
@@ -219,7 +208,7 @@ def access_leaderboard(category: str = None) -> bool:
         else:
             url = f"{GATEWAY_URL}/api/results/leaderboard/global?top=10"
         
-        response = requests.get(url, timeout=30)
+        response = http_pool.session().get(url, timeout=30)
         duration = time.time() - start_time
         record_response_time("leaderboard", duration)
         
@@ -270,29 +259,26 @@ def user_simulation(user_data: Dict):
 
 def print_metrics():
     """Print final metrics"""
+    snapshot = metrics.snapshot()
+    counters = snapshot.counters
     print("\n" + "="*70)
     print("                    STRESS TEST RESULTS")
     print("="*70)
     
     print("\n📊 Operation Metrics:")
-    print(f"  Registration:    ✓ {metrics['register_success']:4d}  ✗ {metrics['register_fail']:4d}")
-    print(f"  Login:           ✓ {metrics['login_success']:4d}  ✗ {metrics['login_fail']:4d}")
-    print(f"  Quiz Fetch:      ✓ {metrics['quiz_fetch_success']:4d}  ✗ {metrics['quiz_fetch_fail']:4d}")
-    print(f"  Leaderboard:     ✓ {metrics['leaderboard_success']:4d}  ✗ {metrics['leaderboard_fail']:4d}")
+    print(f"  Registration:    ✓ {counters['register_success']:4d}  ✗ {counters['register_fail']:4d}")
+    print(f"  Login:           ✓ {counters['login_success']:4d}  ✗ {counters['login_fail']:4d}")
+    print(f"  Quiz Fetch:      ✓ {counters['quiz_fetch_success']:4d}  ✗ {counters['quiz_fetch_fail']:4d}")
+    print(f"  Leaderboard:     ✓ {counters['leaderboard_success']:4d}  ✗ {counters['leaderboard_fail']:4d}")
     
-    print("\n⏱️  Response Times (avg):")
-    for operation, times in metrics["response_times"].items():
-        if times:
-            avg_time = sum(times) / len(times)
-            min_time = min(times)
-            max_time = max(times)
-            p95_time = sorted(times)[int(len(times) * 0.95)] if len(times) > 1 else max_time
-            print(f"  {operation:15s}: avg={avg_time:6.3f}s  min={min_time:.3f}s  max={max_time:.3f}s  p95={p95_time:.3f}s")
+    print("\n⏱️  Response Times:")
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.histograms[operation])}")
     
-    total_success = (metrics['register_success'] + metrics['login_success'] + 
-                    metrics['quiz_fetch_success'] + metrics['leaderboard_success'])
-    total_fail = (metrics['register_fail'] + metrics['login_fail'] + 
-                 metrics['quiz_fetch_fail'] + metrics['leaderboard_fail'])
+    total_success = (counters['register_success'] + counters['login_success'] + 
+                    counters['quiz_fetch_success'] + counters['leaderboard_success'])
+    total_fail = (counters['register_fail'] + counters['login_fail'] + 
+                 counters['quiz_fetch_fail'] + counters['leaderboard_fail'])
     total = total_success + total_fail
     
     if total > 0:
@@ -301,12 +287,40 @@ def print_metrics():
     
     total_requests = total
     print(f"📈 Total Requests: {total_requests}")
+    print(f"🔌 Connections: {http_pool.stats().summary()}")
     
     print("\n" + "="*70)
 
 
+def configure(argv: Optional[List[str]] = None):
+    """Apply --gateway (or $GATEWAY_URL) and the sizes of a --scenario file to the configuration"""
+    global GATEWAY_URL, NUM_USERS, MAX_WORKERS, QUIZZES_PER_USER, LEADERBOARDS_PER_USER
+    parser = argparse.ArgumentParser(description="QuizHub user activity stress test")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL, the scenario's, or {GATEWAY_URL})")
+    parser.add_argument("--scenario", metavar="PATH",
+                        help="Take users, workers and quiz and leaderboard views from a scenario file "
+                             "(e.g. scenarios/users.json)")
+    args = parser.parse_args(argv)
+    try:
+        scenario = load_scenario(args.scenario) if args.scenario else None
+    except (OSError, ScenarioError) as e:
+        parser.error(str(e))
+    GATEWAY_URL = gateway_for(args.gateway, scenario, GATEWAY_URL)
+    if scenario is None:
+        return
+    NUM_USERS = scenario.setup.users
+    MAX_WORKERS = scenario.setup.concurrency
+    # Views per session: the first stage's actions split by its mix
+    stage = next((stage for stage in scenario.stages if stage.actions and stage.mix), None)
+    if stage:
+        QUIZZES_PER_USER = round(stage.actions * stage.mix.share(["browse_quizzes"]))
+        LEADERBOARDS_PER_USER = round(stage.actions * stage.mix.share(["global_leaderboard",
+                                                                         "category_leaderboard"]))
+
+
 def main():
     """Main stress test execution"""
+    configure()
     print("\n╔══════════════════════════════════════════════════════════════╗")
     print("║      QuizHub Stress Test - User Activities (Realistic)      ║")
     print("╚══════════════════════════════════════════════════════════════╝\n")
@@ -316,7 +330,8 @@ def main():
     print(f"  Users: {NUM_USERS}")
     print(f"  Quiz views per user: {QUIZZES_PER_USER}")
     print(f"  Leaderboard views per user: {LEADERBOARDS_PER_USER}")
-    print(f"  Max concurrent workers: {MAX_WORKERS}\n")
+    print(f"  Max concurrent workers: {MAX_WORKERS}")
+    print(f"  Connection pool per host: {POOL_SIZE_PER_HOST}\n")
     
     start_time = time.time()
     
@@ -349,8 +364,9 @@ def main():
     print_metrics()
     print(f"\n⏰ Total execution time: {elapsed_time:.2f} seconds")
     
-    total_requests = (metrics['register_success'] + metrics['login_success'] + 
-                     metrics['quiz_fetch_success'] + metrics['leaderboard_success'])
+    counters = metrics.snapshot().counters
+    total_requests = (counters['register_success'] + counters['login_success'] + 
+                     counters['quiz_fetch_success'] + counters['leaderboard_success'])
     if elapsed_time > 0:
         rps = total_requests / elapsed_time
         print(f"⚡ Requests per second: {rps:.2f}")
@@ -3,27 +3,48 @@
 """
 QuizHub Stress Test - Python Version with Rich Output
 Concurrent load testing with detailed metrics and real-time dashboard
+Virtual users are asyncio coroutines driven by the loadgen engine
+
+Requires: pip install aiohttp (uvloop optional)
 """
 
-import requests
+import aiohttp
+import argparse
+import asyncio
 import json
+import os
+import socket
 import time
 import random
 import string
-import concurrent.futures
+import threading
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import sys
-from collections import defaultdict
-import threading
 
-# Configuration
+from loadgen import (capture, client, corpus, distributed, engine, httpcache, manifest, multiproc, payloads, scheduler,
+                     teardown, tokens)
+from loadgen.dashboard import Dashboard
+from loadgen.monitor import Monitor
+from loadgen.prometheus import PrometheusExporter, RateMeter
+from loadgen.timeseries import TimeSeriesWriter
+from loadgen.metrics import MetricsStore, Snapshot, format_latency
+from loadgen.scenario import ScenarioError, gateway_for, load_scenario
+
+# Configuration (defaults: --gateway or $GATEWAY_URL and --scenario override them)
 # Azure/Cloud URL: http://quizhub.172.189.52.147.nip.io
 GATEWAY_URL = "http://localhost:8080"
 NUM_USERS = 1000
 NUM_QUIZZES = 200
 NUM_SUBMISSIONS_PER_USER = 30
-MAX_WORKERS = 100
+MAX_IN_FLIGHT = 1000  # Concurrent virtual users
+CORRECT_RATIO = 0.75  # Share of questions answered correctly in submissions
+POOL_SIZE_PER_HOST = 1000  # Keep-alive connections kept open to the gateway
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+TOKEN_CACHE = os.path.join(RESULTS_DIR, "tokens.json")  # Admin token kept between runs
+ADMIN_EMAIL = "admin@quizhub.com"  # Admin account shared by every run, also used for teardown
+ADMIN_PASSWORD = "Admin123Pass!"
+WORKER_REPORT_INTERVAL = 1.0  # Seconds between the live snapshots worker processes send this one
 
 # Categories
 CATEGORIES = [
@@ -31,27 +52,36 @@ CATEGORIES = [
     "Literature", "Sports", "Music", "Art", "General Knowledge"
 ]
 
-# Metrics
-metrics = {
-    "register_success": 0,
-    "register_fail": 0,
-    "login_success": 0,
-    "login_fail": 0,
-    "quiz_create_success": 0,
-    "quiz_create_fail": 0,
-    "quiz_fetch_success": 0,
-    "quiz_fetch_fail": 0,
-    "result_submit_success": 0,
-    "result_submit_fail": 0,
-    "leaderboard_success": 0,
-    "leaderboard_fail": 0,
-    "response_times": defaultdict(list),
+# Metrics (per-thread recorders, merged for reporting)
+metrics = MetricsStore()
+
+# Response-time operation -> "<prefix>_success" / "<prefix>_fail" counters
+OPERATION_COUNTERS = {
+    "register": "register",
+    "login": "login",
+    "create_quiz": "quiz_create",
+    "get_quiz": "quiz_fetch",
+    "submit_result": "result_submit",
+    "leaderboard": "leaderboard",
 }
-metrics_lock = threading.Lock()
 
 # Data storage
 users = []
 quizzes = []
+quiz_corpus = corpus.generate_quizzes()  # Synthetic quizzes, reseeded from the command line
+submissions = payloads.SubmissionPool(CORRECT_RATIO)  # Pre-encoded result bodies per quiz
+token_cache = tokens.TokenCache(path=TOKEN_CACHE)  # Every user's token and its expiry
+http_pool: client.AsyncSessionPool = None
+session: aiohttp.ClientSession = None
+remote_connections = client.ConnectionStats()  # Reported back by worker processes
+coordinator: distributed.Coordinator = None
+worker_snapshots: Dict[int, Snapshot] = {}  # Latest live snapshot of each worker process
+worker_lock = threading.Lock()  # Guards swapping the live worker snapshots for the final ones
+open_profile = None  # Arrival rate profile of the running open-model phase
+open_schedule = scheduler.ScheduleReport(0.0)
+recorder: Optional[capture.TrafficRecorder] = None  # Set by --capture
+quiz_caches: Optional[httpcache.CacheGroup] = None  # Browser caches of quizzes, set by --quiz-cache
+run_manifest: Optional[manifest.Manifest] = None  # Every created user, quiz and result, for --teardown
 
 
 def generate_random_string(length=8):
@@ -74,349 +104,462 @@ def log(message, level="INFO"):
 
 
 def update_metric(metric_name, value=1):
-    """Thread-safe metric update"""
-    with metrics_lock:
-        if metric_name in metrics:
-            if isinstance(metrics[metric_name], int):
-                metrics[metric_name] += value
-            elif isinstance(metrics[metric_name], dict):
-                # For response times
-                pass
+    """Count an outcome on the calling thread's recorder"""
+    metrics.incr(metric_name, value)
+
+
+def start_request(operation):
+    """Mark an operation as in flight and return its start time"""
+    metrics.begin(operation)
+    return time.perf_counter_ns()
+
+
+def record_response_time(operation, start_ns, status=0, body=b""):
+    """Record raw and coordinated-omission-corrected response time for an operation"""
+    duration_ns = time.perf_counter_ns() - start_ns
+    # Corrected latency counts from the intended send time of the scheduled arrival
+    corrected_ns = duration_ns + scheduler.current_send_lag_ns()
+    metrics.record(operation, duration_ns, corrected_ns, len(body), status)
+    metrics.end(operation)
+    if recorder is not None:
+        recorder.complete(operation, status, body, duration_ns)
+
+
+def parse_json(body: bytes) -> Dict:
+    """Decoded JSON object of a response body, empty when it holds none"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def open_http_pool(args: argparse.Namespace) -> client.AsyncSessionPool:
+    """Shared keep-alive pool, capturing its traffic when --capture is given"""
+    global recorder
+    trace_configs = []
+    if args.capture:
+        os.makedirs(os.path.dirname(os.path.abspath(args.capture)), exist_ok=True)
+        recorder = capture.TrafficRecorder(args.capture)
+        trace_configs.append(recorder.trace_config())
+    return client.AsyncSessionPool(pool_size=POOL_SIZE_PER_HOST, trace_configs=trace_configs)
+
+
+def open_manifest(args: argparse.Namespace):
+    """Record the test data this process creates in --manifest"""
+    global run_manifest
+    run_manifest = manifest.Manifest(args.manifest, GATEWAY_URL, scenario="stress-test")
+
+
+def close_manifest():
+    global run_manifest
+    if run_manifest is not None:
+        run_manifest.close()
+        run_manifest = None
+
+
+async def tear_down(paths: List[str]):
+    """Delete the test data of this run's manifests (this process's and its workers')"""
+    log("\n🧹 Phase 5: Deleting test data...", "INFO")
+    for path in paths:
+        await teardown.teardown(path, username=ADMIN_EMAIL, password=ADMIN_PASSWORD)
+        log(f"Manifest kept at {path} (rerun: python -m loadgen.teardown <manifest>)", "INFO")
+
+
+def close_capture():
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        log(f"🎞  {recorder.writer.count} requests captured to {recorder.path}", "INFO")
+        recorder = None
+
+
+def live_snapshot() -> Snapshot:
+    """Metrics so far, including the latest reports of worker processes and agents"""
+    with worker_lock:
+        snapshot = metrics.snapshot()
+        for worker in worker_snapshots.values():
+            snapshot.merge(worker)
+    if coordinator is not None:
+        snapshot.merge(coordinator.merged())
+    return snapshot
+
+
+def start_monitor(args: argparse.Namespace) -> Optional[Monitor]:
+    """Start per-second sampling for the live dashboard and the time-series file"""
+    if not args.dashboard and not args.timeseries:
+        return None
+    monitor = Monitor(live_snapshot, interval=1.0, window=args.window)
+    if args.dashboard:
+        Dashboard(monitor, OPERATION_COUNTERS)
+    if args.timeseries:
+        monitor.add_listener(TimeSeriesWriter(args.timeseries, OPERATION_COUNTERS))
+    return monitor.start()
+
+
+def intended_rate() -> float:
+    """Arrival rate the open-model schedule is aiming for right now"""
+    if open_profile is None or not open_schedule.started_at:
+        return 0.0
+    elapsed = time.time() - open_schedule.started_at
+    return open_profile.rate_at(elapsed) if elapsed < open_profile.duration else 0.0
 
 
-def record_response_time(operation, duration):
-    """Record response time for an operation"""
-    with metrics_lock:
-        metrics["response_times"][operation].append(duration)
+def start_exporter(args: argparse.Namespace) -> Optional[PrometheusExporter]:
+    """Serve /metrics for Prometheus when --metrics-port is set"""
+    if not args.metrics_port:
+        return None
+    issued = lambda: open_schedule.issued
+    exporter = PrometheusExporter(
+        live_snapshot, OPERATION_COUNTERS, port=args.metrics_port,
+        gauges={
+            "loadgen_intended_rate": ("Open-model target arrival rate (req/s)", intended_rate),
+            "loadgen_achieved_rate": ("Open-model arrivals issued per second since the last scrape",
+                                      RateMeter(issued)),
+        },
+        counters={"loadgen_arrivals_total": ("Open-model arrivals issued", issued)},
+    )
+    log(f"Serving Prometheus metrics on :{exporter.port}/metrics", "INFO")
+    return exporter.start()
 
 
-def register_user() -> Tuple[bool, Dict]:
+def stop_monitor(monitor: Optional[Monitor], args: argparse.Namespace):
+    if monitor is None:
+        return
+    monitor.stop()
+    if args.timeseries:
+        log(f"📈 Per-second time series written to {args.timeseries}", "INFO")
+
+
+async def register_user(username: Optional[str] = None) -> Tuple[bool, Dict]:
     """Register a new user"""
-    username = f"stress_{generate_random_string()}"
+    username = username or f"stress_{generate_random_string()}"
     email = f"{username}@stress-test.com"
     password = "StressTest123Pass"
     
-    # Use files parameter to force multipart/form-data
+    # Registration is bound from multipart/form-data
     payload = {
-        "username": (None, username),
-        "email": (None, email),
-        "password": (None, password),
-        "firstName": (None, "Stress"),
-        "lastName": (None, "Test")
+        "username": username,
+        "email": email,
+        "password": password,
+        "firstName": "Stress",
+        "lastName": "Test"
     }
     
-    start_time = time.time()
+    start_time = start_request("register")
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/users/register",
-            files=payload,
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("register", duration)
-        
-        if response.status_code in [200, 201]:
-            data = response.json()
-            token = data.get("token") or data.get("Token")
-            user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
-            
-            user_data = {
-                "username": username,
-                "email": email,
-                "password": password,
-                "token": token,
-                "id": user_id
-            }
-            update_metric("register_success")
-            return True, user_data
-        else:
-            log(f"Register failed: {response.status_code} - {response.text[:200]}", "ERROR")
-            update_metric("register_fail")
-            return False, {}
+            data=client.multipart_form(payload)
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("register", duration)
+        record_response_time("register", start_time)
         update_metric("register_fail")
         log(f"Register error: {str(e)}", "ERROR")
         return False, {}
+    record_response_time("register", start_time, response.status, body)
+    
+    data = parse_json(body) if response.status in [200, 201] else {}
+    if data:
+        token = data.get("token") or data.get("Token")
+        user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
+        
+        user_data = {
+            "username": username,
+            "email": email,
+            "password": password,
+            "token": token,
+            "id": user_id
+        }
+        if run_manifest is not None:
+            run_manifest.add(manifest.USER, user_id, username=username, password=password)
+        token_cache.put(user_data)
+        update_metric("register_success")
+        return True, user_data
+    else:
+        log(f"Register failed: {response.status} - {body[:200].decode(errors='replace')}", "ERROR")
+        update_metric("register_fail")
+        return False, {}
 
 
-def login_user(username: str, password: str) -> Tuple[bool, Dict]:
+async def login_user(username: str, password: str) -> Tuple[bool, Dict]:
     """Login existing user"""
     payload = {
         "usernameOrEmail": f"{username}@quizhub.com" if '@' not in username else username,
         "password": password
     }
     
-    start_time = time.time()
+    start_time = start_request("login")
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/users/login",
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("login", duration)
-        
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get("token") or data.get("Token")
-            user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
-            
-            user_data = {
-                "username": username,
-                "token": token,
-                "id": user_id
-            }
-            update_metric("login_success")
-            return True, user_data
-        else:
-            log(f"Login failed: {response.status_code} - {response.text[:200]}", "ERROR")
-            update_metric("login_fail")
-            return False, {}
+            json=payload
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("login", duration)
+        record_response_time("login", start_time)
         update_metric("login_fail")
         log(f"Login error: {str(e)}", "ERROR")
         return False, {}
+    record_response_time("login", start_time, response.status, body)
+    
+    data = parse_json(body) if response.status == 200 else {}
+    if data:
+        token = data.get("token") or data.get("Token")
+        user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
+        
+        user_data = {
+            "username": username,
+            "token": token,
+            "id": user_id
+        }
+        update_metric("login_success")
+        return True, user_data
+    else:
+        log(f"Login failed: {response.status} - {body[:200].decode(errors='replace')}", "ERROR")
+        update_metric("login_fail")
+        return False, {}
+
+
+async def relogin(user: Dict) -> Optional[str]:
+    """Log a known user in again for a fresh token"""
+    success, user_data = await login_user(user.get("email") or user["username"], user["password"])
+    return user_data.get("token") if success else None
 
 
-def promote_to_admin(user_id: str, token: str) -> bool:
+async def is_admin_token(token: str) -> bool:
+    """Whether the gateway still accepts a token as an Admin's"""
+    try:
+        async with session.get(
+            f"{GATEWAY_URL}/api/users/auth/currentUser",
+            headers={"Authorization": f"Bearer {token}"}
+        ) as response:
+            body = await response.read()
+        return response.status == 200 and json.loads(body).get("role") == "Admin"
+    except Exception:
+        return False
+
+
+async def promote_to_admin(user_id: str, token: str) -> bool:
     """Promote a user to admin"""
     try:
-        response = requests.put(
+        async with session.put(
             f"{GATEWAY_URL}/api/users/{user_id}/promote",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30
-        )
+            headers={"Authorization": f"Bearer {token}"}
+        ) as response:
+            body = await response.read()
         
-        if response.status_code == 200:
+        if response.status == 200:
             log(f"✓ User promoted to Admin", "SUCCESS")
             return True
         else:
-            log(f"Promote failed: {response.status_code} - {response.text[:200]}", "ERROR")
+            log(f"Promote failed: {response.status} - {body[:200].decode(errors='replace')}", "ERROR")
             return False
     except Exception as e:
         log(f"Promote error: {str(e)}", "ERROR")
         return False
 
 
-def register_admin_user() -> Tuple[bool, Dict]:
-    """Register a user and promote to admin, or login if exists"""
+async def register_admin_user() -> Tuple[bool, Dict]:
+    """Register a user and promote to admin, or login if exists (kept across runs, so not in the manifest)"""
     username = "admin"
-    email = "admin@quizhub.com"
-    password = "Admin123Pass!"
+    email = ADMIN_EMAIL
+    password = ADMIN_PASSWORD
+    cache_key = f"{GATEWAY_URL} {email}"
     
-    # First try to login in case admin already exists
-    login_success, user_data = login_user(email, password)
+    # A token cached by an earlier run saves the login while it is valid; a
+    # capture logs in anyway, a replay needs the exchange that issued the token
+    cached = token_cache.recall(cache_key) if recorder is None else None
+    if cached and await is_admin_token(cached["token"]):
+        cached["password"] = password
+        token_cache.put(cached)
+        log(f"✓ Reusing cached admin token: {username}", "SUCCESS")
+        return True, cached
+    
+    # Otherwise login in case admin already exists
+    login_success, user_data = await login_user(email, password)
     if login_success:
         log(f"✓ Logged in as existing admin: {username}", "SUCCESS")
-        user_data["isAdmin"] = True
+        user_data.update(email=email, password=password, isAdmin=True)
+        token_cache.put(user_data)
+        token_cache.remember(cache_key, user_data)
         return True, user_data
     
     # If login failed, try to register
-    # Use files parameter to force multipart/form-data
     payload = {
-        "username": (None, username),
-        "email": (None, email),
-        "password": (None, password),
-        "firstName": (None, "Admin"),
-        "lastName": (None, "User")
+        "username": username,
+        "email": email,
+        "password": password,
+        "firstName": "Admin",
+        "lastName": "User"
     }
     
-    start_time = time.time()
+    start_time = start_request("register")
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/users/register",
-            files=payload,
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("register", duration)
-        
-        if response.status_code in [200, 201]:
-            data = response.json()
-            token = data.get("token") or data.get("Token")
-            user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
-            
-            # Promote to admin
-            promoted = promote_to_admin(user_id, token)
-
-            # Re-login to get new token with Admin role
-            if promoted:
-                login_success, login_data = login_user(email, password)
-                if login_success:
-                    token = login_data.get("token")
-                    log(f"✓ Re-logged in to get admin token", "SUCCESS")
-
-            user_data = {
-                "username": username,
-                "email": email,
-                "password": password,
-                "token": token,
-                "id": user_id,
-                "isAdmin": promoted
-            }
-            update_metric("register_success")
-            log(f"✓ Admin user registered: {username}", "SUCCESS")
-            return True, user_data
-        else:
-            log(f"Admin register failed: {response.status_code} - {response.text[:200]}", "ERROR")
-            update_metric("register_fail")
-            return False, {}
+            data=client.multipart_form(payload)
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("register", duration)
+        record_response_time("register", start_time)
         update_metric("register_fail")
         log(f"Admin register error: {str(e)}", "ERROR")
         return False, {}
+    record_response_time("register", start_time, response.status, body)
+    
+    data = parse_json(body) if response.status in [200, 201] else {}
+    if data:
+        token = data.get("token") or data.get("Token")
+        user_id = data.get("user", {}).get("id") or data.get("User", {}).get("id")
+        
+        # Promote to admin
+        promoted = await promote_to_admin(user_id, token)
 
+        # Re-login to get new token with Admin role
+        if promoted:
+            login_success, login_data = await login_user(email, password)
+            if login_success:
+                token = login_data.get("token")
+                log(f"✓ Re-logged in to get admin token", "SUCCESS")
 
-def create_quiz(token: str) -> Tuple[bool, Dict]:
-    """Create a quiz"""
-    category = random.choice(CATEGORIES)
-    difficulty = random.randint(1, 3)
-    num_questions = random.randint(5, 10)
-    
-    questions = []
-    for i in range(num_questions):
-        answers = [
-            {"text": "Correct Answer", "isCorrect": True},
-            {"text": "Wrong Answer 1", "isCorrect": False},
-            {"text": "Wrong Answer 2", "isCorrect": False},
-            {"text": "Wrong Answer 3", "isCorrect": False}
-        ]
-        
-        question = {
-            "text": f"Question {i+1} about {category}?",
-            "questionType": 0,
-            "answers": answers
+        user_data = {
+            "username": username,
+            "email": email,
+            "password": password,
+            "token": token,
+            "id": user_id,
+            "isAdmin": promoted
         }
-        questions.append(question)
-    
-    payload = {
-        "title": f"Stress Test Quiz - {category} {generate_random_string(4)}",
-        "description": f"Automated stress test quiz for {category}",
-        "category": category,
-        "difficulty": difficulty,
-        "timeLimitSeconds": 600,
-        "questions": questions
-    }
-    
-    start_time = time.time()
+        token_cache.put(user_data)
+        if promoted:
+            token_cache.remember(cache_key, user_data)
+        update_metric("register_success")
+        log(f"✓ Admin user registered: {username}", "SUCCESS")
+        return True, user_data
+    else:
+        log(f"Admin register failed: {response.status} - {body[:200].decode(errors='replace')}", "ERROR")
+        update_metric("register_fail")
+        return False, {}
+
+
+def quiz_bodies(count: int) -> List[bytes]:
+    """Encode the next count corpus quizzes as create-quiz request bodies"""
+    bodies = []
+    for _ in range(count):
+        payload = corpus.quiz_payload(next(quiz_corpus))
+        payload["title"] = f"Stress Test Quiz - {payload['title']}"
+        bodies.append(payloads.encode(payload))
+    return bodies
+
+
+async def create_quiz(token: str, payload: bytes) -> Tuple[bool, Dict]:
+    """Create a quiz from a pre-encoded body"""
+    start_time = start_request("create_quiz")
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/quizzes",
-            json=payload,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("create_quiz", duration)
-        
-        if response.status_code in [200, 201]:
-            quiz_data = response.json()
-            update_metric("quiz_create_success")
-            return True, quiz_data
-        else:
-            log(f"Create quiz failed: {response.status_code} - {response.text[:200]}", "ERROR")
-            update_metric("quiz_create_fail")
-            return False, {}
+            data=payload,
+            headers={"Authorization": f"Bearer {token}", **payloads.JSON_HEADERS}
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("create_quiz", duration)
+        record_response_time("create_quiz", start_time)
         update_metric("quiz_create_fail")
         log(f"Create quiz error: {str(e)}", "ERROR")
         return False, {}
+    record_response_time("create_quiz", start_time, response.status, body)
+    
+    quiz_data = parse_json(body) if response.status in [200, 201] else {}
+    if quiz_data:
+        if run_manifest is not None:
+            run_manifest.add(manifest.QUIZ, quiz_data.get("id"))
+        update_metric("quiz_create_success")
+        return True, quiz_data
+    else:
+        log(f"Create quiz failed: {response.status} - {body[:200].decode(errors='replace')}", "ERROR")
+        update_metric("quiz_create_fail")
+        return False, {}
 
 
-def get_quiz_with_questions(quiz_id: str, token: str) -> Tuple[bool, Dict]:
-    """Get quiz with questions"""
-    start_time = time.time()
+async def get_quiz_with_questions(quiz_id: str, token: str,
+                                  cache: Optional[httpcache.ResponseCache] = None) -> Tuple[bool, bytes]:
+    """Get quiz with questions (the undecoded body), from the user's cache while it is fresh"""
+    entry = None
+    if cache is not None:
+        outcome, entry = cache.lookup(quiz_id)
+        update_metric(f"quiz_cache_{outcome}")
+        if outcome == httpcache.HIT:
+            return True, entry.body
+    
+    start_time = start_request("get_quiz")
     try:
-        response = requests.get(
+        async with session.get(
             f"{GATEWAY_URL}/api/quizzes/{quiz_id}/with-questions",
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("get_quiz", duration)
-        
-        if response.status_code == 200:
-            update_metric("quiz_fetch_success")
-            return True, response.json()
-        else:
-            update_metric("quiz_fetch_fail")
-            return False, {}
+            headers={"Authorization": f"Bearer {token}", **httpcache.conditional_headers(entry)}
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("get_quiz", duration)
+        record_response_time("get_quiz", start_time)
         update_metric("quiz_fetch_fail")
-        return False, {}
+        return False, b""
+    record_response_time("get_quiz", start_time, response.status, body)
+    
+    if response.status == 304 and entry is not None:
+        cache.revalidated(entry)
+        update_metric("quiz_cache_revalidated")
+        update_metric("quiz_fetch_success")
+        return True, entry.body
+    if response.status == 200:
+        if cache is not None:
+            evicted = cache.store(quiz_id, body, response.headers.get("ETag"))
+            if evicted:
+                update_metric("quiz_cache_evicted", evicted)
+        update_metric("quiz_fetch_success")
+        return True, body
+    else:
+        update_metric("quiz_fetch_fail")
+        return False, b""
 
 
-def submit_result(token: str, quiz_id: str, quiz_data: Dict) -> bool:
-    """Submit quiz result"""
-    questions = quiz_data.get("questions", [])
-    
-    # Generate answers
-    answers = []
-    for question in questions:
-        question_id = question.get("id")
-        question_answers = question.get("answers", [])
-        
-        # 75% chance of correct answer
-        if random.random() < 0.75 and question_answers:
-            correct_answer = next((a["text"] for a in question_answers if a.get("isCorrect")), None)
-            given_answer = correct_answer if correct_answer else "Wrong"
-        else:
-            given_answer = "Wrong Answer"
-        
-        answers.append({
-            "questionId": question_id,
-            "givenAnswer": given_answer
-        })
-    
-    # Calculate score
-    score = random.randint(60, 100)
-    time_taken = random.randint(60, 360)
-    
-    payload = {
-        "quizId": quiz_id,
-        "score": float(score),
-        "timeTakenSeconds": time_taken,
-        "answers": answers
-    }
+async def submit_result(token: str, quiz_id: str, quiz_body: bytes) -> bool:
+    """Submit a pre-encoded quiz result"""
+    payload = submissions.body(quiz_id)
+    if payload is None:
+        # Quizzes known only by id (agents) get their answer key from the first fetch
+        if not submissions.add_body(quiz_body):
+            return False
+        payload = submissions.body(quiz_id)
     
-    start_time = time.time()
+    start_time = start_request("submit_result")
     try:
-        response = requests.post(
+        async with session.post(
             f"{GATEWAY_URL}/api/results",
-            json=payload,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30
-        )
-        duration = time.time() - start_time
-        record_response_time("submit_result", duration)
-        
-        if response.status_code in [200, 201]:
-            update_metric("result_submit_success")
-            return True
-        else:
-            update_metric("result_submit_fail")
-            return False
+            data=payload,
+            headers={"Authorization": f"Bearer {token}", **payloads.JSON_HEADERS}
+        ) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("submit_result", duration)
+        record_response_time("submit_result", start_time)
+        update_metric("result_submit_fail")
+        return False
+    record_response_time("submit_result", start_time, response.status, body)
+    
+    if response.status in [200, 201]:
+        if run_manifest is not None:
+            # A result without a readable id cannot be torn down, and add skips it
+            run_manifest.add(manifest.RESULT, parse_json(body).get("id"), quiz=quiz_id)
+        update_metric("result_submit_success")
+        return True
+    else:
         update_metric("result_submit_fail")
         return False
 
 
-def access_leaderboard(category: str = None, token: str = None) -> bool:
+async def access_leaderboard(category: str = None, token: str = None) -> bool:
     """Access leaderboard"""
-    start_time = time.time()
+    start_time = start_request("leaderboard")
     try:
         if category:
             url = f"{GATEWAY_URL}/api/results/leaderboard/category/{category}?top=10"
@@ -424,86 +567,397 @@ def access_leaderboard(category: str = None, token: str = None) -> bool:
             url = f"{GATEWAY_URL}/api/results/leaderboard/global?top=10"
 
         headers = {"Authorization": f"Bearer {token}"} if token else {}
-        response = requests.get(url, headers=headers, timeout=30)
-        duration = time.time() - start_time
-        record_response_time("leaderboard", duration)
-        
-        if response.status_code == 200:
-            update_metric("leaderboard_success")
-            return True
-        else:
-            update_metric("leaderboard_fail")
-            return False
+        async with session.get(url, headers=headers) as response:
+            body = await response.read()
     except Exception as e:
-        duration = time.time() - start_time
-        record_response_time("leaderboard", duration)
+        record_response_time("leaderboard", start_time)
+        update_metric("leaderboard_fail")
+        return False
+    record_response_time("leaderboard", start_time, response.status, body)
+    
+    if response.status == 200:
+        update_metric("leaderboard_success")
+        return True
+    else:
         update_metric("leaderboard_fail")
         return False
 
 
-def user_simulation(user_data: Dict, quizzes_list: List[Dict]):
+async def user_simulation(user_data: Dict, quizzes_list: List[Dict]):
     """Simulate a single user's activity"""
-    token = user_data.get("token")
     username = user_data.get("username")
+    cache = quiz_caches.for_user(username) if quiz_caches is not None else None
     
     for i in range(NUM_SUBMISSIONS_PER_USER):
         if not quizzes_list:
             break
         
-        # Select random quiz
+        # Select random quiz; the token is read every time as the cache may have refreshed it
         quiz = random.choice(quizzes_list)
         quiz_id = quiz.get("id")
+        token = user_data.get("token")
         
         # Get quiz with questions
-        success, quiz_data = get_quiz_with_questions(quiz_id, token)
+        success, quiz_body = await get_quiz_with_questions(quiz_id, token, cache)
         if success:
             # Submit result
-            submit_result(token, quiz_id, quiz_data)
+            await submit_result(token, quiz_id, quiz_body)
         
         # Small delay between submissions
-        time.sleep(0.1)
+        await asyncio.sleep(0.1)
+
+
+async def quiz_attempt():
+    """One open-model arrival: a random user fetches and submits a random quiz"""
+    user = random.choice(users)
+    quiz = random.choice(quizzes)
+    token = user.get("token")
+    quiz_id = quiz.get("id")
+    cache = quiz_caches.for_user(user["username"]) if quiz_caches is not None else None
+    
+    success, quiz_body = await get_quiz_with_questions(quiz_id, token, cache)
+    if success:
+        await submit_result(token, quiz_id, quiz_body)
 
 
 def print_metrics():
     """Print final metrics"""
+    snapshot = metrics.snapshot()
+    counters = snapshot.counters
     print("\n" + "="*70)
     print("                    STRESS TEST RESULTS")
     print("="*70)
     
     print("\n📊 Operation Metrics:")
-    print(f"  Registration:    ✓ {metrics['register_success']:4d}  ✗ {metrics['register_fail']:4d}")
-    print(f"  Quiz Creation:   ✓ {metrics['quiz_create_success']:4d}  ✗ {metrics['quiz_create_fail']:4d}")
-    print(f"  Quiz Fetch:      ✓ {metrics['quiz_fetch_success']:4d}  ✗ {metrics['quiz_fetch_fail']:4d}")
-    print(f"  Result Submit:   ✓ {metrics['result_submit_success']:4d}  ✗ {metrics['result_submit_fail']:4d}")
-    print(f"  Leaderboard:     ✓ {metrics['leaderboard_success']:4d}  ✗ {metrics['leaderboard_fail']:4d}")
-    
-    print("\n⏱️  Response Times (avg):")
-    for operation, times in metrics["response_times"].items():
-        if times:
-            avg_time = sum(times) / len(times)
-            min_time = min(times)
-            max_time = max(times)
-            print(f"  {operation:15s}: {avg_time:6.3f}s  (min: {min_time:.3f}s, max: {max_time:.3f}s)")
-    
-    total_success = (metrics['register_success'] + metrics['quiz_create_success'] + 
-                    metrics['quiz_fetch_success'] + metrics['result_submit_success'] + 
-                    metrics['leaderboard_success'])
-    total_fail = (metrics['register_fail'] + metrics['quiz_create_fail'] + 
-                 metrics['quiz_fetch_fail'] + metrics['result_submit_fail'] + 
-                 metrics['leaderboard_fail'])
+    print(f"  Registration:    ✓ {counters['register_success']:4d}  ✗ {counters['register_fail']:4d}")
+    print(f"  Quiz Creation:   ✓ {counters['quiz_create_success']:4d}  ✗ {counters['quiz_create_fail']:4d}")
+    print(f"  Quiz Fetch:      ✓ {counters['quiz_fetch_success']:4d}  ✗ {counters['quiz_fetch_fail']:4d}")
+    print(f"  Result Submit:   ✓ {counters['result_submit_success']:4d}  ✗ {counters['result_submit_fail']:4d}")
+    print(f"  Leaderboard:     ✓ {counters['leaderboard_success']:4d}  ✗ {counters['leaderboard_fail']:4d}")
+    
+    quiz_cache = httpcache.summary(counters, "quiz_cache")
+    if quiz_cache:
+        print(f"\n🗄️  Quiz Cache: {quiz_cache}")
+    
+    print("\n⏱️  Response Times:")
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.histograms[operation])}")
+    
+    print("\n📐 Corrected for coordinated omission (from intended send time):")
+    for operation in snapshot.operations():
+        print(f"  {operation:15s}: {format_latency(snapshot.corrected[operation])}")
+    
+    total_success = (counters['register_success'] + counters['quiz_create_success'] + 
+                    counters['quiz_fetch_success'] + counters['result_submit_success'] + 
+                    counters['leaderboard_success'])
+    total_fail = (counters['register_fail'] + counters['quiz_create_fail'] + 
+                 counters['quiz_fetch_fail'] + counters['result_submit_fail'] + 
+                 counters['leaderboard_fail'])
     total = total_success + total_fail
     
     if total > 0:
         success_rate = (total_success / total) * 100
         print(f"\n✅ Overall Success Rate: {success_rate:.2f}%")
     
+    connections = remote_connections + (http_pool.stats() if http_pool else client.ConnectionStats())
+    if connections.requests_sent:
+        print(f"🔌 Connections: {connections.summary()}")
+    
     print("\n" + "="*70)
 
 
-def main():
+async def register_users(count: int, name_prefix: Optional[str] = None, first: int = 0):
+    """Phase 1: register count virtual users (named name_prefix + index when a user range is assigned)"""
+    log(f"\nPhase 1: Registering {count} users...", "INFO")
+    names = ((f"{name_prefix}{first + i}",) if name_prefix else () for i in range(count))
+    results = await engine.run_virtual_users(register_user, names, MAX_IN_FLIGHT)
+    users.extend(user_data for success, user_data in results if success)
+    log(f"✓ Registered {len(users)} users", "SUCCESS")
+
+
+async def create_quizzes(admin_token: str):
+    """Phase 2: create NUM_QUIZZES quizzes"""
+    log(f"\nPhase 2: Creating {NUM_QUIZZES} quizzes...", "INFO")
+    bodies = quiz_bodies(NUM_QUIZZES)
+    results = await engine.run_virtual_users(create_quiz, ((admin_token, body) for body in bodies), MAX_IN_FLIGHT)
+    quizzes.extend(quiz_data for success, quiz_data in results if success)
+    log(f"✓ Created {len(quizzes)} quizzes", "SUCCESS")
+
+
+def precompute_submissions():
+    """Build the answer keys and result bodies of every quiz whose questions are already known"""
+    added = sum(submissions.add(quiz) for quiz in quizzes if quiz.get("id") not in submissions)
+    if added:
+        log(f"✓ Pre-encoded result submissions for {added} quizzes", "SUCCESS")
+
+
+async def run_login_storm(storm: Tuple[float, float]):
+    """Log a share of the users in again, all at once, some seconds into phase 3"""
+    fraction, at = storm
+    await asyncio.sleep(at)
+    log(f"⚡ Login storm: {fraction:.0%} of {len(users)} users logging in again...", "WARNING")
+    succeeded, attempted = await tokens.login_storm(token_cache, users, relogin, fraction, MAX_IN_FLIGHT)
+    log(f"✓ Login storm: {succeeded}/{attempted} logins succeeded",
+        "SUCCESS" if succeeded == attempted else "WARNING")
+
+
+async def simulate_activity(args: argparse.Namespace) -> Optional[scheduler.ScheduleReport]:
+    """Phase 3: closed per-user loop, or open-model quiz attempts when --rate is set
+
+    Tokens are refreshed in the background before they expire, so logins
+    only happen in phase 3 when they are asked for with --login-storm.
+    With --quiz-cache, quizzes fetched earlier come from the user's cache
+    """
+    global quiz_caches
+    precompute_submissions()
+    if args.quiz_cache:
+        quiz_caches = httpcache.CacheGroup(args.quiz_cache, args.quiz_cache_size, args.quiz_cache_scope)
+    refresher = tokens.RefreshScheduler(token_cache, relogin).start()
+    storm = asyncio.create_task(run_login_storm(args.login_storm)) if args.login_storm else None
+    try:
+        report = await drive_activity(args)
+    finally:
+        await refresher.stop()
+        if storm:
+            storm.cancel()
+            await asyncio.gather(storm, return_exceptions=True)
+    if refresher.refreshed or refresher.failed:
+        log(f"✓ Tokens: {refresher.summary()}", "SUCCESS" if not refresher.failed else "WARNING")
+    return report
+
+
+async def drive_activity(args: argparse.Namespace) -> Optional[scheduler.ScheduleReport]:
+    """The users' quiz attempts of phase 3"""
+    global open_profile
+    report = None
+    if args.rate:
+        log(f"\nPhase 3: Issuing quiz attempts at {args.rate} req/s ({args.profile})...", "INFO")
+        open_profile = scheduler.build_schedule(args.profile, args.rate, args.duration,
+                                                start_rate=args.start_rate, steps=args.steps)
+        report = await scheduler.run_open_model(open_profile, quiz_attempt, poisson=args.poisson,
+                                                seed=args.seed, max_in_flight=MAX_IN_FLIGHT,
+                                                report=open_schedule)
+    else:
+        log(f"\nPhase 3: Simulating user activity (quiz submissions)...", "INFO")
+        await engine.run_virtual_users(user_simulation, ((user, quizzes) for user in users), MAX_IN_FLIGHT,
+                                       keep_results=False)
+    return report
+
+
+async def stream_snapshots(index: int):
+    """Send this worker's cumulative metrics to the parent process until cancelled"""
+    while True:
+        await asyncio.sleep(WORKER_REPORT_INTERVAL)
+        multiproc.report(index, metrics.snapshot().to_bytes())
+
+
+async def run_worker_share(args: argparse.Namespace, user_count: int,
+                           index: int = 0) -> Optional[scheduler.ScheduleReport]:
+    """Register and drive one worker process's share of virtual users"""
+    global http_pool, session
+    http_pool = open_http_pool(args)
+    session = http_pool.session
+    monitor = start_monitor(args)
+    open_manifest(args)
+    streamer = asyncio.create_task(stream_snapshots(index)) if multiproc.reporting() else None
+    try:
+        await register_users(user_count)
+        if not users:
+            return None
+        return await simulate_activity(args)
+    finally:
+        if streamer:
+            streamer.cancel()
+        await http_pool.close()
+        close_capture()
+        close_manifest()
+        stop_monitor(monitor, args)
+
+
+def process_worker(share: Dict) -> Tuple[bytes, Dict]:
+    """Worker process entry point, returns a metrics snapshot and connection/schedule stats"""
+    global metrics, users, quizzes
+    configure(share["args"])  # Spawned workers start from the module defaults
+    metrics = MetricsStore()
+    users, quizzes = [], share["quizzes"]
+    report = engine.run(lambda: run_worker_share(share["args"], share["users"], share["index"]))
+    return metrics.snapshot().to_bytes(), {
+        "connections": vars(http_pool.stats()),
+        "schedule": report.to_dict() if report else None,
+    }
+
+
+def worker_args(args: argparse.Namespace, processes: int, index: int) -> argparse.Namespace:
+    """Give each worker an equal slice of the arrival rate and its own time-series file and manifest"""
+    share = argparse.Namespace(**vars(args))
+    share.dashboard = False
+    share.teardown = False
+    root, ext = os.path.splitext(args.manifest)
+    share.manifest = f"{root}.worker{index + 1}{ext}"
+    if args.timeseries:
+        root, ext = os.path.splitext(args.timeseries)
+        share.timeseries = f"{root}.worker{index + 1}{ext}"
+    if args.capture:
+        root, ext = os.path.splitext(args.capture)
+        share.capture = f"{root}.worker{index + 1}{ext}"
+    if args.rate:
+        share.rate = args.rate / processes
+        share.start_rate = args.start_rate / processes
+        share.steps = [(seconds, rate / processes) for seconds, rate in args.steps] if args.steps else None
+        share.seed = None if args.seed is None else args.seed + index
+    return share
+
+
+def receive_worker_snapshot(index: int, data: bytes):
+    snapshot = Snapshot.from_bytes(data)
+    with worker_lock:
+        worker_snapshots[index] = snapshot
+
+
+async def run_in_processes(args: argparse.Namespace):
+    """Phases 1 and 3 in --processes worker processes, merged into this process's report
+
+    Workers stream their metrics while they run when this process has a
+    dashboard, a time-series file or a /metrics endpoint to feed, which then
+    covers every worker and replaces their own time-series files
+    """
+    live = bool(args.dashboard or args.timeseries or args.metrics_port)
+    shares = []
+    for i, count in enumerate(multiproc.split(NUM_USERS, args.processes)):
+        share_args = worker_args(args, args.processes, i)
+        if live:
+            share_args.timeseries = None
+        shares.append({"args": share_args, "users": count, "quizzes": list(quizzes), "index": i})
+    log(f"\nPhases 1+3: Running {NUM_USERS} users across {args.processes} processes...", "INFO")
+    outcomes = await asyncio.to_thread(multiproc.run_workers, process_worker, shares,
+                                       receive_worker_snapshot if live else None)
+    with worker_lock:
+        worker_snapshots.clear()
+        for snapshot_bytes, _ in outcomes:
+            metrics.absorb(Snapshot.from_bytes(snapshot_bytes))
+    absorb_worker_stats([stats for _, stats in outcomes])
+    log(f"✓ Completed quiz submissions", "SUCCESS")
+
+
+def absorb_worker_stats(worker_stats: List[Dict]):
+    """Add remote connection counters and merge the workers' schedule reports"""
+    global remote_connections
+    schedule = None
+    for stats in worker_stats:
+        remote_connections = remote_connections + client.ConnectionStats(**stats["connections"])
+        if stats["schedule"]:
+            report = scheduler.ScheduleReport.from_dict(stats["schedule"])
+            schedule = report if schedule is None else schedule.merge(report)
+    if schedule:
+        log(f"✓ Schedule: {schedule.summary()}", "SUCCESS")
+
+
+def log_progress(snapshot: Snapshot):
+    """Interval progress line from the agents' merged snapshots"""
+    requests_done = sum(h.count for h in snapshot.histograms.values())
+    failures = sum(value for name, value in snapshot.counters.items() if name.endswith("_fail"))
+    log(f"  ... {requests_done} requests, {failures} failures so far", "INFO")
+
+
+async def run_distributed(args: argparse.Namespace):
+    """Phases 1 and 3 on --agents remote agents, started together and merged into this report"""
+    global coordinator
+    host, port = distributed.parse_address(args.coordinator)
+    coordinator = distributed.Coordinator(host, port, args.agents, interval=args.report_interval)
+    log(f"\nWaiting for {args.agents} agents on {host}:{port}...", "INFO")
+    try:
+        await coordinator.wait_for_agents()
+        log(f"✓ Agents connected: {', '.join(agent.name for agent in coordinator.agents)}", "SUCCESS")
+        
+        # Every agent gets a disjoint range of user names and its slice of the arrival rate
+        name_prefix = f"stress_{generate_random_string(6)}_"
+        quiz_ids = [{"id": quiz.get("id")} for quiz in quizzes]
+        configs, first = [], 0
+        for i, count in enumerate(multiproc.split(NUM_USERS, args.agents)):
+            configs.append({
+                "gateway": GATEWAY_URL,
+                "submissions": NUM_SUBMISSIONS_PER_USER,
+                "args": vars(worker_args(args, args.agents, i)),
+                "users": {"prefix": name_prefix, "first": first, "count": count},
+                "quizzes": quiz_ids,
+                "interval": args.report_interval,
+            })
+            first += count
+        log(f"\nPhase 1: Agents registering {NUM_USERS} users...", "INFO")
+        await coordinator.configure(configs)
+        
+        await coordinator.start()
+        log(f"\nPhase 3: Agents started, reporting every {args.report_interval}s...", "INFO")
+        metrics.absorb(await coordinator.collect(on_progress=None if args.dashboard else log_progress))
+        
+        finished = [agent for agent in coordinator.agents if agent.result]
+        for agent in coordinator.agents:
+            if not agent.result:
+                log(f"Agent {agent.name} disconnected early, using its last snapshot", "WARNING")
+        absorb_worker_stats([agent.result for agent in finished])
+        if finished:
+            skew_ms = max(agent.result["start_late_ns"] + agent.rtt_ns // 2 for agent in finished) / 1e6
+            log(f"✓ Agents started within {skew_ms:.2f}ms of the agreed time", "SUCCESS")
+        log(f"✓ Completed quiz submissions", "SUCCESS")
+    finally:
+        await coordinator.close()
+        coordinator = None
+
+
+async def run_agent(args: argparse.Namespace):
+    """Agent mode: take configuration from a coordinator and run its share of users"""
+    global GATEWAY_URL, NUM_SUBMISSIONS_PER_USER, http_pool, session, quizzes
+    host, port = distributed.parse_address(args.agent, default_host="localhost")
+    agent = distributed.Agent(host, port, args.agent_name or f"{socket.gethostname()}-{os.getpid()}")
+    log(f"Connecting to coordinator at {host}:{port} as {agent.name}...", "INFO")
+    await agent.connect()
+    config = await agent.receive_config()
+    GATEWAY_URL = config["gateway"]
+    NUM_SUBMISSIONS_PER_USER = config["submissions"]
+    quizzes = config["quizzes"]
+    share_args = argparse.Namespace(**config["args"])
+    user_range = config["users"]
+    
+    http_pool = open_http_pool(args)
+    session = http_pool.session
+    report = None
+    monitor = start_monitor(args)
+    exporter = start_exporter(args)
+    open_manifest(args)
+    try:
+        await register_users(user_range["count"], user_range["prefix"], user_range["first"])
+        await agent.ready()
+        start_late_ns = await agent.wait_for_start()
+        log(f"Phase 3: Started ({start_late_ns / 1e6:.3f}ms after the agreed time)", "INFO")
+        reporter = asyncio.create_task(agent.report_every(config["interval"], metrics.snapshot))
+        try:
+            if users:
+                report = await simulate_activity(share_args)
+        finally:
+            reporter.cancel()
+    finally:
+        await http_pool.close()
+        close_capture()
+        close_manifest()
+        stop_monitor(monitor, args)
+        if exporter:
+            exporter.stop()
+    
+    await agent.finish(metrics.snapshot(), {
+        "connections": vars(http_pool.stats()),
+        "schedule": report.to_dict() if report else None,
+        "start_late_ns": start_late_ns,
+    })
+    if args.teardown:
+        await tear_down([args.manifest])
+    print_metrics()
+
+
+async def run_stress_test(args: argparse.Namespace):
     """Main stress test execution"""
+    global http_pool, session, quiz_corpus
     print("\n╔══════════════════════════════════════════════════════════════╗")
-    print("║        QuizHub Stress Test - Python (Concurrent)            ║")
+    print("║        QuizHub Stress Test - Python (Asyncio)               ║")
     print("╚══════════════════════════════════════════════════════════════╝\n")
     
     print(f"Configuration:")
@@ -511,74 +965,205 @@ def main():
     print(f"  Users: {NUM_USERS}")
     print(f"  Quizzes: {NUM_QUIZZES}")
     print(f"  Submissions per user: {NUM_SUBMISSIONS_PER_USER}")
-    print(f"  Max concurrent workers: {MAX_WORKERS}\n")
+    print(f"  Max in-flight virtual users: {MAX_IN_FLIGHT}")
+    print(f"  Connection pool per host: {POOL_SIZE_PER_HOST}")
+    print(f"  Processes: {args.processes}")
+    if args.coordinator:
+        print(f"  Coordinator: {args.coordinator} ({args.agents} agents)")
+    if args.rate:
+        arrivals = "Poisson" if args.poisson else "uniform"
+        print(f"  Open model: {args.profile} {args.rate} req/s for {args.duration}s ({arrivals} arrivals)")
+    if args.quiz_cache:
+        scope = "one shared cache" if args.quiz_cache_scope == "shared" else "one cache per user"
+        print(f"  Quiz cache: TTL {args.quiz_cache:g}s, {args.quiz_cache_size} quizzes, {scope}")
+    print()
     
     start_time = time.time()
+    corpus_seed = args.corpus_seed if args.corpus_seed is not None else random.randrange(1 << 31)
+    quiz_corpus = corpus.generate_quizzes(seed=corpus_seed, config=corpus.config_from_args(args))
+    http_pool = open_http_pool(args)
+    session = http_pool.session
+    monitor = start_monitor(args)
+    exporter = start_exporter(args)
+    open_manifest(args)
+    log(f"Recording created test data in {args.manifest}", "INFO")
     
-    # Phase 0: Register admin user
-    log("Phase 0: Registering admin user...", "INFO")
-    admin_success, admin_user = register_admin_user()
-    if admin_success:
-        users.append(admin_user)
-    else:
-        log("Failed to register admin user. Continuing anyway...", "WARNING")
-    
-    # Phase 1: Register users
-    log(f"\nPhase 1: Registering {NUM_USERS} users...", "INFO")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(register_user) for _ in range(NUM_USERS)]
-        for future in concurrent.futures.as_completed(futures):
-            success, user_data = future.result()
-            if success:
-                users.append(user_data)
-    
-    log(f"✓ Registered {len(users)} users", "SUCCESS")
-    
-    if not users:
-        log("No users registered successfully. Exiting.", "ERROR")
-        return
-    
-    # Phase 2: Create quizzes (use admin token if available)
-    log(f"\nPhase 2: Creating {NUM_QUIZZES} quizzes...", "INFO")
-    admin_token = admin_user["token"] if admin_success else users[0]["token"]
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(create_quiz, admin_token) for _ in range(NUM_QUIZZES)]
-        for future in concurrent.futures.as_completed(futures):
-            success, quiz_data = future.result()
-            if success:
-                quizzes.append(quiz_data)
-    
-    log(f"✓ Created {len(quizzes)} quizzes", "SUCCESS")
-    
-    if not quizzes:
-        log("No quizzes created successfully. Exiting.", "ERROR")
-        return
-    
-    # Phase 3: Simulate user activity
-    log(f"\nPhase 3: Simulating user activity (quiz submissions)...", "INFO")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(user_simulation, user, quizzes) for user in users]
-        concurrent.futures.wait(futures)
-    
-    log(f"✓ Completed quiz submissions", "SUCCESS")
-    
-    # Phase 4: Access leaderboards
-    log(f"\nPhase 4: Accessing leaderboards...", "INFO")
-    access_leaderboard(token=admin_token)  # Global
-    for category in CATEGORIES:
-        access_leaderboard(category, token=admin_token)
-    
-    log(f"✓ Accessed all leaderboards", "SUCCESS")
+    try:
+        # Phase 0: Register admin user
+        log("Phase 0: Registering admin user...", "INFO")
+        admin_success, admin_user = await register_admin_user()
+        if admin_success:
+            users.append(admin_user)
+        else:
+            log("Failed to register admin user. Continuing anyway...", "WARNING")
+        
+        if args.processes > 1 or args.coordinator:
+            # Workers and agents register their own users, so quizzes are created first
+            if not admin_success:
+                fallback_success, fallback_user = await register_user()
+                if not fallback_success:
+                    log("No user available to create quizzes. Exiting.", "ERROR")
+                    return
+                admin_user = fallback_user
+            admin_token = admin_user["token"]
+            await create_quizzes(admin_token)
+            if not quizzes:
+                log("No quizzes created successfully. Exiting.", "ERROR")
+                return
+            if args.coordinator:
+                await run_distributed(args)
+            else:
+                await run_in_processes(args)
+        else:
+            await register_users(NUM_USERS)
+            if not users:
+                log("No users registered successfully. Exiting.", "ERROR")
+                return
+            
+            # Use admin token if available
+            admin_token = admin_user["token"] if admin_success else users[0]["token"]
+            await create_quizzes(admin_token)
+            if not quizzes:
+                log("No quizzes created successfully. Exiting.", "ERROR")
+                return
+            
+            report = await simulate_activity(args)
+            if report:
+                log(f"✓ Schedule: {report.summary()}", "SUCCESS")
+            log(f"✓ Completed quiz submissions", "SUCCESS")
+        
+        # Phase 4: Access leaderboards
+        log(f"\nPhase 4: Accessing leaderboards...", "INFO")
+        await access_leaderboard(token=admin_token)  # Global
+        for category in CATEGORIES:
+            await access_leaderboard(category, token=admin_token)
+        
+        log(f"✓ Accessed all leaderboards", "SUCCESS")
+    finally:
+        await http_pool.close()
+        close_capture()
+        close_manifest()
+        stop_monitor(monitor, args)
+        if exporter:
+            exporter.stop()
     
     elapsed_time = time.time() - start_time
     
+    # Phase 5: Cleanup (worker processes record in their own manifests next to this one)
+    if args.teardown:
+        paths = [args.manifest]
+        if args.processes > 1:
+            paths += [worker_args(args, args.processes, i).manifest for i in range(args.processes)]
+        await tear_down([path for path in paths if os.path.exists(path)])
+    
     # Print results
     print_metrics()
     print(f"\n⏰ Total execution time: {elapsed_time:.2f} seconds")
     print(f"\n✅ Stress test completed successfully!\n")
 
 
+def parse_args() -> argparse.Namespace:
+    """Command line options (defaults keep the closed per-user loop)"""
+    parser = argparse.ArgumentParser(description="QuizHub asyncio stress test")
+    parser.add_argument("--gateway", help=f"Gateway URL (default: $GATEWAY_URL, the scenario's, or {GATEWAY_URL})")
+    parser.add_argument("--scenario", metavar="PATH",
+                        help="Take users, quizzes, concurrency and submissions per user from a scenario file "
+                             "(e.g. scenarios/stress-test.json)")
+    parser.add_argument("--rate", type=float,
+                        help="Open model: target quiz attempts per second in phase 3")
+    parser.add_argument("--profile", choices=["constant", "ramp", "step"], default="constant",
+                        help="Arrival rate profile (default: constant)")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Open model duration in seconds (default: 60)")
+    parser.add_argument("--start-rate", type=float, default=0.0,
+                        help="Ramp profile starting rate (ramps up to --rate)")
+    parser.add_argument("--steps", type=scheduler.parse_steps,
+                        help='Step profile as "seconds:rate,..." e.g. "30:10,30:50,30:100"')
+    parser.add_argument("--poisson", action="store_true",
+                        help="Poisson arrivals around the profile rate instead of uniform spacing")
+    parser.add_argument("--seed", type=int, help="Seed for Poisson arrivals")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes, each running its share of the users (default: 1)")
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT",
+                        help="Coordinate --agents agents listening on this address (e.g. 0.0.0.0:7878)")
+    parser.add_argument("--agents", type=int, default=1,
+                        help="Number of agents the coordinator waits for (default: 1)")
+    parser.add_argument("--agent", metavar="HOST:PORT",
+                        help="Run as an agent of the coordinator at this address")
+    parser.add_argument("--agent-name", help="Agent name shown by the coordinator (default: host-pid)")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Seconds between agent snapshot reports (default: 5)")
+    parser.add_argument("--dashboard", action="store_true",
+                        help="Show a live dashboard refreshed every second")
+    parser.add_argument("--window", type=int, default=10,
+                        help="Dashboard rolling window in seconds (default: 10)")
+    parser.add_argument("--timeseries", metavar="PATH",
+                        default=os.path.join(RESULTS_DIR, f"stress-test-{datetime.now():%Y%m%d-%H%M%S}.qts"),
+                        help="Per-second results file (default: results/stress-test-<time>.qts)")
+    parser.add_argument("--no-timeseries", dest="timeseries", action="store_const", const=None,
+                        help="Do not write the per-second results file")
+    parser.add_argument("--manifest", metavar="PATH",
+                        default=os.path.join(RESULTS_DIR, f"stress-test-{datetime.now():%Y%m%d-%H%M%S}.manifest"),
+                        help="Record of the created users, quizzes and results for loadgen.teardown "
+                             "(default: results/stress-test-<time>.manifest)")
+    parser.add_argument("--teardown", action="store_true",
+                        help="Delete the users, quizzes and results the run created when it is done "
+                             "(agents delete what they created themselves)")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="Record every request to a compressed capture for loadgen.replay (e.g. results/run.qhc)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve live Prometheus metrics on this port (e.g. 9464)")
+    parser.add_argument("--login-storm", type=tokens.parse_storm, metavar="FRACTION[@SECONDS]",
+                        help="Log this share of the users in again at once, SECONDS into phase 3 (e.g. 0.5@30); "
+                             "otherwise phase 3 only logs in to refresh expiring tokens")
+    parser.add_argument("--quiz-cache", type=float, metavar="TTL",
+                        help="Cache fetched quizzes like a browser for TTL seconds, revalidating with "
+                             "If-None-Match when the gateway sends ETags (default: refetch before every submit)")
+    parser.add_argument("--quiz-cache-size", type=int, default=httpcache.CACHE_SIZE,
+                        help=f"Quizzes kept per cache, least recently used evicted first "
+                             f"(default: {httpcache.CACHE_SIZE})")
+    parser.add_argument("--quiz-cache-scope", choices=httpcache.SCOPES, default="user",
+                        help="One cache per user (browser) or one shared by all users (caching proxy)")
+    corpus.add_arguments(parser, default_seed=None)
+    args = parser.parse_args()
+    if args.steps and not args.rate:
+        args.rate = max(rate for _, rate in args.steps)
+    if args.steps:
+        args.profile = "step"
+    return args
+
+
+def configure(args: argparse.Namespace):
+    """Apply --gateway (or $GATEWAY_URL) and the sizes of a --scenario file to the configuration"""
+    global GATEWAY_URL, NUM_USERS, NUM_QUIZZES, NUM_SUBMISSIONS_PER_USER, MAX_IN_FLIGHT
+    scenario = load_scenario(args.scenario) if args.scenario else None
+    GATEWAY_URL = gateway_for(args.gateway, scenario, GATEWAY_URL)
+    if scenario is None:
+        return
+    NUM_USERS = scenario.setup.users
+    NUM_QUIZZES = scenario.setup.quizzes
+    MAX_IN_FLIGHT = scenario.setup.concurrency
+    # Submissions per user: the take_quiz share of the first stage that takes quizzes
+    for stage in scenario.stages:
+        if stage.actions and stage.mix and stage.mix.share(["take_quiz"]):
+            NUM_SUBMISSIONS_PER_USER = round(stage.actions * stage.mix.share(["take_quiz"]))
+            break
+
+
+def main():
+    """Run the stress test on the asyncio engine"""
+    args = parse_args()
+    try:
+        configure(args)
+    except (OSError, ScenarioError) as e:
+        log(str(e), "ERROR")
+        raise SystemExit(2)
+    if args.agent:
+        engine.run(lambda: run_agent(args))
+    else:
+        engine.run(lambda: run_stress_test(args))
+
+
 if __name__ == "__main__":
     try:
         main()